@@ -0,0 +1,52 @@
+import os
+import sys
+import tempfile
+import timeit
+import numpy as np
+from trip_loader import TRIP_DTYPE, TRIP_FIELDS, load_trip, read_records
+
+# Trip files are repeated up to these fix counts, the speedup varies with the machine and the trip length
+BENCHMARK_FIX_COUNTS = (24_000, 300_000)
+BENCHMARK_REPEATS = 5
+
+
+def split_and_cast(file_path):
+    """The record by record parse load_trip used before chunked reads, kept as the baseline."""
+    records = read_records(file_path)
+    trip = np.empty(len(records), dtype=TRIP_DTYPE)
+    if not records:
+        return trip
+
+    fields = np.array([record.split(",") for record in records])
+    for column, name in enumerate(TRIP_FIELDS):
+        trip[name] = fields[:, column]
+    return trip
+
+
+def benchmark(trip_path, fix_count, repeats=BENCHMARK_REPEATS):
+    """
+    Time load_trip against split_and_cast on a trip file repeated to about fix_count fixes.
+
+    :param trip_path: Raw trip file.
+    :param fix_count: Number of fixes to benchmark on.
+    :param repeats: Best of this many runs is kept.
+    :return: Tuple (fixes, split_and_cast seconds, load_trip seconds).
+    """
+    records = read_records(trip_path)
+    copies = -(-fix_count // len(records))
+    with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as file:
+        file.write("|".join(records * copies) + "|")
+    try:
+        assert np.array_equal(load_trip(file.name), split_and_cast(file.name))
+        baseline = min(timeit.repeat(lambda: split_and_cast(file.name), number=1, repeat=repeats))
+        chunked = min(timeit.repeat(lambda: load_trip(file.name), number=1, repeat=repeats))
+    finally:
+        os.remove(file.name)
+    return len(records) * copies, baseline, chunked
+
+
+if __name__ == "__main__":
+    trip_path = sys.argv[1] if len(sys.argv) > 1 else "./JameyTrips/trial_16.txt"
+    for fix_count in BENCHMARK_FIX_COUNTS:
+        fixes, baseline, chunked = benchmark(trip_path, fix_count)
+        print(f"{fixes} fixes: split-and-cast {baseline:.3f}s, load_trip {chunked:.3f}s, {baseline / chunked:.1f}x")
@@ -0,0 +1,107 @@
+import numpy as np
+from road_segment_index import search_boxes
+
+CORRIDOR_BUFFER_METERS = 50 # Roads farther than this from the trip polyline are never fetched
+MAX_BBOXES_PER_QUERY = 50 # Union members per Overpass query
+
+
+def corridor_cells(lat, lon, cell_size, buffer_meters=CORRIDOR_BUFFER_METERS):
+    """
+    Cover a trip polyline buffered by buffer_meters with grid cells.
+
+    The polyline is sampled at half a cell between consecutive points, so gaps in
+    the GPS trace do not leave holes in the corridor.
+
+    :param lat, lon: Arrays of coordinates in travel order, e.g. a trip's column views.
+    :param cell_size: Cell edge in degrees.
+    :param buffer_meters: Buffer around the polyline in meters.
+    :return: Sorted list of (row, col) cells.
+    """
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    if not len(lat):
+        return []
+    step = cell_size / 2
+
+    # Each point is followed by steps - 1 samples towards the next one
+    delta_lat = np.append(np.diff(lat), 0.0)
+    delta_lon = np.append(np.diff(lon), 0.0)
+    steps = np.maximum(np.ceil(np.maximum(np.abs(delta_lat), np.abs(delta_lon)) / step).astype(np.int64), 1)
+    point_of_sample = np.repeat(np.arange(len(lat)), steps)
+    k = np.arange(len(point_of_sample)) - np.repeat(np.cumsum(steps) - steps, steps)
+    sample_steps = steps[point_of_sample]
+    sample_lat = lat[point_of_sample] + delta_lat[point_of_sample] * k / sample_steps
+    sample_lon = lon[point_of_sample] + delta_lon[point_of_sample] * k / sample_steps
+
+    # Consecutive samples mostly share the same cell range, expand each distinct range once
+    min_lon, min_lat, max_lon, max_lat = search_boxes(sample_lat, sample_lon, buffer_meters)
+    ranges = np.unique(np.column_stack((
+        np.floor(min_lat / cell_size), np.floor(max_lat / cell_size),
+        np.floor(min_lon / cell_size), np.floor(max_lon / cell_size),
+    )).astype(np.int64), axis=0)
+    cells = set()
+    for row_min, row_max, col_min, col_max in ranges.tolist():
+        cells.update((row, col) for row in range(row_min, row_max + 1) for col in range(col_min, col_max + 1))
+    return sorted(cells)
+
+
+def cells_to_rectangles(cells):
+    """
+    Merge grid cells into a small set of rectangles covering exactly those cells.
+
+    Runs of adjacent cells in a row become strips, and strips spanning the same
+    columns in consecutive rows are stacked into one rectangle.
+
+    :param cells: Iterable of (row, col) cells.
+    :return: List of (row_start, row_end, col_start, col_end) rectangles, ends inclusive.
+    """
+    strips = []  # (row, col_start, col_end)
+    for row, col in sorted(cells):
+        if strips and strips[-1][0] == row and strips[-1][2] == col - 1:
+            strips[-1] = (row, strips[-1][1], col)
+        else:
+            strips.append((row, col, col))
+
+    rectangles = []
+    open_rectangles = {}  # (col_start, col_end) -> rectangle still growing downwards
+    for row, col_start, col_end in strips:
+        rectangle = open_rectangles.get((col_start, col_end))
+        if rectangle is not None and rectangle[1] == row - 1:
+            rectangle[1] = row
+        else:
+            rectangle = [row, row, col_start, col_end]
+            rectangles.append(rectangle)
+            open_rectangles[(col_start, col_end)] = rectangle
+
+    return [tuple(rectangle) for rectangle in rectangles]
+
+
+def rectangle_cells(rectangle):
+    row_start, row_end, col_start, col_end = rectangle
+    return [(row, col) for row in range(row_start, row_end + 1) for col in range(col_start, col_end + 1)]
+
+
+def rectangle_bbox(rectangle, cell_size):
+    """:return: Tuple (lat_min, lon_min, lat_max, lon_max) of a rectangle of cells."""
+    row_start, row_end, col_start, col_end = rectangle
+    return row_start * cell_size, col_start * cell_size, (row_end + 1) * cell_size, (col_end + 1) * cell_size
+
+
+def chunk_rectangles(rectangles, chunk_size=MAX_BBOXES_PER_QUERY):
+    """Split rectangles into groups sent as one union query each."""
+    return [rectangles[i:i + chunk_size] for i in range(0, len(rectangles), chunk_size)]
+
+
+def road_segments_in_cells(cell_elements, cells):
+    """
+    Split corridor ways back out to the cells a group of points needs.
+
+    :param cell_elements: Dict (row, col) -> list of way elements.
+    :param cells: Cells to collect ways from.
+    :return: List of way elements without duplicates, in cell order.
+    """
+    road_segments = {}
+    for cell in cells:
+        for element in cell_elements.get(cell, []):
+            road_segments.setdefault(element["id"], element)
+    return list(road_segments.values())
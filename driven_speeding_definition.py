@@ -1,5 +1,12 @@
 import datetime
+import numpy as np
 from geopy.distance import geodesic
+from road_geometry import step_distances
+from trip_loader import load_speed_data
+
+SPEEDING_EXCESS_MPH = 11 # Speed over the limit that counts as speeding
+SPEEDING_MIN_DURATION_SECONDS = 5 # Time a speeding run has to last to be an event
+METERS_PER_MILE = 1609.344
 
 def parse_data(file_path):
     points = []
@@ -30,25 +37,131 @@ def driven_defined_speeding_events(points):
     for point in points:
         excess_speed = point['speed'] - point['limit']
         
-        if excess_speed >= 11 and point['limit'] > 0:
+        if excess_speed >= SPEEDING_EXCESS_MPH and point['limit'] > 0:
             if not current_event: # start of a new speeding event 
                 start_time = point['timestamp'] 
             current_event.append(point) 
         else:
             # If we were in a speeding event and now we're not, check if it met the 5s requirement
-            if current_event and start_time is not None and (current_event[-1]['timestamp'] - start_time) >= 5:
+            if current_event and start_time is not None and (current_event[-1]['timestamp'] - start_time) >= SPEEDING_MIN_DURATION_SECONDS:
                 speeding_events.append(current_event.copy()) 
                 speeding_event_counter += 1
             current_event = [] 
             start_time = None  
     
     # Final check in case the last event meets the requirement
-    if current_event and start_time is not None and (current_event[-1]['timestamp'] - start_time) >= 5:
+    if current_event and start_time is not None and (current_event[-1]['timestamp'] - start_time) >= SPEEDING_MIN_DURATION_SECONDS:
         speeding_events.append(current_event)
 
     return speeding_events, speeding_event_counter
 
 
+def speeding_event_bounds(speed, limit, timestamp):
+    """
+    Vectorized driven_defined_speeding_events over column arrays.
+
+    Each run of consecutive points at least 11 mph over a known limit is an event if its
+    last point is at least 5 seconds after its first. As in driven_defined_speeding_events,
+    a qualifying run that lasts to the end of the points is returned but not counted.
+
+    :param speed: Array of traveling speeds in mph.
+    :param limit: Array of speed limits in mph, 0 when unknown.
+    :param timestamp: Array of Unix timestamps in seconds.
+    :return: Array of event start indices, array of event end indices (inclusive), number of events counted.
+    """
+    speed = np.asarray(speed, dtype=np.float64)
+    limit = np.asarray(limit, dtype=np.float64)
+    timestamp = np.asarray(timestamp, dtype=np.int64)
+
+    speeding = ((speed - limit) >= SPEEDING_EXCESS_MPH) & (limit > 0)
+    # +1 where a run starts, -1 just past where it ends
+    edges = np.diff(np.concatenate(([False], speeding, [False])).astype(np.int8))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1) - 1
+
+    lasting = (timestamp[ends] - timestamp[starts]) >= SPEEDING_MIN_DURATION_SECONDS
+    starts, ends = starts[lasting], ends[lasting]
+    speeding_event_counter = int(np.count_nonzero(ends < len(speed) - 1))
+    return starts, ends, speeding_event_counter
+
+
+class StreamingSpeedingDetector:
+    """
+    Online driven_defined_speeding_events for live telemetry.
+
+    Points are fed in as they arrive and each event is emitted as soon as the point
+    ending it comes in. Only the open run is kept, as a few running aggregates rather
+    than its points, so memory stays constant however long the trip is.
+    """
+
+    def __init__(self):
+        self.speeding_event_counter = 0 # Events closed by a point under the threshold, as in driven_defined_speeding_events
+        self.event = None # Aggregates of the open speeding run
+
+    def add(self, point):
+        """
+        Feed the next point of the trip.
+
+        :param point: Dict with lat, long, speed, limit, road_type and timestamp, as returned by parse_data.
+        :return: Event summary if this point closed a speeding event, else None.
+        """
+        excess_speed = point['speed'] - point['limit']
+        closed_event = None
+
+        if excess_speed >= SPEEDING_EXCESS_MPH and point['limit'] > 0:
+            if self.event is None: # start of a new speeding event
+                self.event = {
+                    'start_time': point['timestamp'],
+                    'end_time': point['timestamp'],
+                    'road_type': point['road_type'],
+                    'start_location': (point['lat'], point['long']),
+                    'end_location': (point['lat'], point['long']),
+                    'points': 1,
+                    'distance': 0,
+                    'max_speed': point['speed'],
+                    'max_excess_speed': excess_speed,
+                }
+            else:
+                previous_location = self.event['end_location']
+                self.event['distance'] += geodesic(previous_location, (point['lat'], point['long'])).miles
+                self.event['end_time'] = point['timestamp']
+                self.event['end_location'] = (point['lat'], point['long'])
+                self.event['points'] += 1
+                self.event['max_speed'] = max(self.event['max_speed'], point['speed'])
+                self.event['max_excess_speed'] = max(self.event['max_excess_speed'], excess_speed)
+        else:
+            closed_event = self.close_event()
+            if closed_event:
+                self.speeding_event_counter += 1
+
+        return closed_event
+
+    def add_many(self, points):
+        """
+        Feed a batch of points in trip order.
+
+        :return: List of event summaries closed by the batch.
+        """
+        return [event for event in map(self.add, points) if event]
+
+    def close_event(self):
+        """End the open run, returning its summary if it lasted long enough to be an event."""
+        event, self.event = self.event, None
+        if event and (event['end_time'] - event['start_time']) >= SPEEDING_MIN_DURATION_SECONDS:
+            event['duration'] = event['end_time'] - event['start_time']
+            return event
+        return None
+
+    def finish(self):
+        """
+        End of trip, emits an event still open on the last point. Like the final check of
+        driven_defined_speeding_events, it is not added to speeding_event_counter.
+
+        :return: Event summary or None.
+        """
+        return self.close_event()
+
+
 def calculate_road_statistics(points, speeding_events):
     """Calculate statistics of speeding events by road type and return percentage of speeding events over total trip distance or time."""
     road_segments = {}
@@ -107,29 +220,98 @@ def calculate_road_statistics(points, speeding_events):
     return road_percentages, total_distance_travelled, speeding_distance, speeding_time, (minutes, seconds)
 
 
-file_path = "./speed_data.txt" 
-data_points = parse_data(file_path)
-speeding_events, speeding_event_count = driven_defined_speeding_events(data_points)
-road_percentages, trip_distance, speeding_distance, speeding_time, (trip_duration_minutes, trip_duration_seconds) = calculate_road_statistics(data_points, speeding_events)
+def trip_steps(lat, lon, timestamp):
+    """
+    Distance and time between each pair of consecutive points, computed once per trip and
+    shared by every statistic.
 
-for event in speeding_events:
-    print("Speeding Event Detected:")
-    print(f"Start Time: {datetime.datetime.fromtimestamp(event[0]['timestamp'])}")
-    print(f"End Time: {datetime.datetime.fromtimestamp(event[-1]['timestamp'])}")
-    print(f"Speeding Duration: {event[-1]['timestamp'] - event[0]['timestamp']} seconds")
-    print("Details:")
-    for point in event:
-        print(f"  Time: {datetime.datetime.fromtimestamp(point['timestamp'])}, Speed: {point['speed']} mph, Limit: {point['limit']} mph, Road Type: {point['road_type']}, Location: ({point['lat']}, {point['long']})")
-    print("-" * 50)
+    :param lat, lon: Arrays of N coordinates in degrees.
+    :param timestamp: Array of N Unix timestamps in seconds.
+    :return: Array of N - 1 step distances in miles, array of N - 1 step durations in seconds.
+    """
+    timestamp = np.asarray(timestamp, dtype=np.int64)
+    if len(timestamp) < 2:
+        return np.zeros(0), np.zeros(0, dtype=np.int64)
+    return step_distances(lat, lon) / METERS_PER_MILE, np.diff(timestamp)
+
+
+def road_statistics(lat, lon, timestamp, road_type_codes, road_types, event_starts, event_ends):
+    """
+    Vectorized calculate_road_statistics over column arrays and event bounds.
+
+    Per-step distances are measured once, road type totals are bincounts over them and
+    each event's distance is a difference of their cumulative sum.
+
+    :param lat, lon: Arrays of coordinates in degrees.
+    :param timestamp: Array of Unix timestamps in seconds.
+    :param road_type_codes: Array of indices into road_types, one per point.
+    :param road_types: List of road type names.
+    :param event_starts, event_ends: Event bounds (inclusive) as returned by speeding_event_bounds.
+    :return: Same as calculate_road_statistics.
+    """
+    step_miles, step_seconds = trip_steps(lat, lon, timestamp)
+    timestamp = np.asarray(timestamp, dtype=np.int64)
+    road_type_codes = np.asarray(road_type_codes, dtype=np.int64)
+    event_starts = np.asarray(event_starts, dtype=np.int64)
+    event_ends = np.asarray(event_ends, dtype=np.int64)
+
+    total_distance_travelled = float(step_miles.sum())
+    total_time = int(step_seconds.sum())
+
+    # Events are attributed to the road type of their first point
+    travelled_miles = np.concatenate(([0.0], np.cumsum(step_miles)))
+    event_distances = travelled_miles[event_ends] - travelled_miles[event_starts]
+    event_times = timestamp[event_ends] - timestamp[event_starts]
+    event_road_types = road_type_codes[event_starts]
+    speeding_distances = np.bincount(event_road_types, weights=event_distances, minlength=len(road_types)).tolist()
+    speeding_times = np.bincount(event_road_types, weights=event_times, minlength=len(road_types)).tolist()
+
+    # Steps belong to the road type of the point they end on, road types are listed in order of their first step
+    travelled_road_types = np.concatenate((road_type_codes[1:], event_road_types))
+    _, first_steps = np.unique(travelled_road_types, return_index=True)
+    road_percentages = {}
+    for code in travelled_road_types[np.sort(first_steps)].tolist():
+        if total_distance_travelled > 0:
+            road_percentages[road_types[code]] = {
+                'speeding_distance_percentage': (speeding_distances[code] / total_distance_travelled) * 100,
+                'speeding_time_percentage': (speeding_times[code] / total_time) * 100
+            }
+
+    minutes = total_time // 60
+    seconds = total_time % 60
 
-print(f"Total Trip Distance: {trip_distance:.2f} miles")
-print(f"Total Trip Duration: {trip_duration_minutes} minutes {trip_duration_seconds} seconds")
-print(f"Total # of Speeding Events Detected: {speeding_event_count}")
-print(f"Total Distance Speeding(Across Entire Trip): {speeding_distance:.2f} miles")
-print(f"Total Time Speeding(Across Entire Trip): {speeding_time} seconds")
-print("-" * 50)
-for road_type, percentages in road_percentages.items():
-    print(f"Road Type: {road_type}")
-    print(f"  Speeding Distance Percentage(of Entire Trip): {percentages['speeding_distance_percentage']:.2f}%")
-    print(f"  Speeding Time Percentage(of Entire Trip): {percentages['speeding_time_percentage']:.2f}%\n")
+    return road_percentages, total_distance_travelled, float(event_distances.sum()), int(event_times.sum()), (minutes, seconds)
+
+
+if __name__ == "__main__":
+    file_path = "./speed_data.txt"
+    speed_data, road_types = load_speed_data(file_path)
+    event_starts, event_ends, speeding_event_count = speeding_event_bounds(
+        speed_data['speed'], speed_data['limit'], speed_data['timestamp']
+    )
+    road_percentages, trip_distance, speeding_distance, speeding_time, (trip_duration_minutes, trip_duration_seconds) = road_statistics(
+        speed_data['lat'], speed_data['lon'], speed_data['timestamp'], speed_data['road_type'], road_types, event_starts, event_ends
+    )
+
+    for start, end in zip(event_starts.tolist(), event_ends.tolist()):
+        event = speed_data[start:end + 1].tolist()
+        print("Speeding Event Detected:")
+        print(f"Start Time: {datetime.datetime.fromtimestamp(event[0][-1])}")
+        print(f"End Time: {datetime.datetime.fromtimestamp(event[-1][-1])}")
+        print(f"Speeding Duration: {event[-1][-1] - event[0][-1]} seconds")
+        print("Details:")
+        for lat, lon, distracted, speed, limit, road_type, timestamp in event:
+            print(f"  Time: {datetime.datetime.fromtimestamp(timestamp)}, Speed: {speed} mph, Limit: {limit} mph, Road Type: {road_types[road_type]}, Location: ({lat}, {lon})")
+        print("-" * 50)
+
+    print(f"Total Trip Distance: {trip_distance:.2f} miles")
+    print(f"Total Trip Duration: {trip_duration_minutes} minutes {trip_duration_seconds} seconds")
+    print(f"Total # of Speeding Events Detected: {speeding_event_count}")
+    print(f"Total Distance Speeding(Across Entire Trip): {speeding_distance:.2f} miles")
+    print(f"Total Time Speeding(Across Entire Trip): {speeding_time} seconds")
+    print("-" * 50)
+    for road_type, percentages in road_percentages.items():
+        print(f"Road Type: {road_type}")
+        print(f"  Speeding Distance Percentage(of Entire Trip): {percentages['speeding_distance_percentage']:.2f}%")
+        print(f"  Speeding Time Percentage(of Entire Trip): {percentages['speeding_time_percentage']:.2f}%\n")
 
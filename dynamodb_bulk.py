@@ -0,0 +1,178 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+MAX_BATCH_GET_KEYS = 100 # DynamoDB limit per batch_get_item
+MAX_BATCH_WRITE_ITEMS = 25 # DynamoDB limit per batch_write_item
+MAX_BULK_WORKERS = 4
+MAX_RETRIES = 8
+BASE_BACKOFF_SECONDS = 0.05
+MAX_BACKOFF_SECONDS = 2.0
+
+# Primary key attributes of the pipeline's tables
+TABLE_KEYS = {
+    'drivenDB_road_segment_info': ('road_segment_id',),
+    'users_speeding_events': ('road_segment_id', 'timestamp#user_id'),
+}
+
+
+# A backend is any object with batch_get_item(request_items) and batch_write_item(request_items)
+# taking and returning DynamoDB's RequestItems and response shapes. See also local_store.py.
+
+class DynamoDBBackend:
+    """
+    Bulk backend over a boto3 DynamoDB service resource. Without one, the resource
+    is created on first use, so nothing connects to AWS until a table is read or written.
+    """
+
+    def __init__(self, dynamodb=None):
+        self.dynamodb = dynamodb
+        self.lock = threading.Lock()
+
+    def resource(self):
+        with self.lock:
+            if self.dynamodb is None:
+                import boto3
+                self.dynamodb = boto3.resource('dynamodb')
+        return self.dynamodb
+
+    def batch_get_item(self, request_items):
+        return self.resource().batch_get_item(RequestItems=request_items)
+
+    def batch_write_item(self, request_items):
+        return self.resource().batch_write_item(RequestItems=request_items)
+
+
+class InMemoryBackend:
+    """
+    Stand-in backend for local testing with the same request and response shapes
+    as DynamoDB. unprocessed_rate leaves that share of every request unprocessed,
+    to exercise the retry path the way throttling does.
+    """
+
+    def __init__(self, table_keys=TABLE_KEYS, unprocessed_rate=0.0):
+        self.table_keys = table_keys
+        self.unprocessed_rate = unprocessed_rate
+        self.tables = {table_name: {} for table_name in table_keys}
+        self.lock = threading.Lock()
+
+    def key_of(self, table_name, item):
+        return tuple(item[name] for name in self.table_keys[table_name])
+
+    def throttled(self):
+        return self.unprocessed_rate > 0 and random.random() < self.unprocessed_rate
+
+    def batch_get_item(self, request_items):
+        responses, unprocessed = {}, {}
+        with self.lock:
+            for table_name, request in request_items.items():
+                table = self.tables.setdefault(table_name, {})
+                for key in request['Keys']:
+                    if self.throttled():
+                        unprocessed.setdefault(table_name, {'Keys': []})['Keys'].append(key)
+                        continue
+                    item = table.get(self.key_of(table_name, key))
+                    if item is not None:
+                        responses.setdefault(table_name, []).append(dict(item))
+        return {'Responses': responses, 'UnprocessedKeys': unprocessed}
+
+    def batch_write_item(self, request_items):
+        unprocessed = {}
+        with self.lock:
+            for table_name, requests in request_items.items():
+                table = self.tables.setdefault(table_name, {})
+                for request in requests:
+                    if self.throttled():
+                        unprocessed.setdefault(table_name, []).append(request)
+                    elif 'PutRequest' in request:
+                        item = request['PutRequest']['Item']
+                        table[self.key_of(table_name, item)] = dict(item)
+                    elif 'DeleteRequest' in request:
+                        table.pop(self.key_of(table_name, request['DeleteRequest']['Key']), None)
+        return {'UnprocessedItems': unprocessed}
+
+
+def backoff(attempt):
+    """Full jitter exponential backoff."""
+    time.sleep(random.uniform(0, min(MAX_BACKOFF_SECONDS, BASE_BACKOFF_SECONDS * 2 ** attempt)))
+
+
+class BulkClient:
+    """
+    Bulk reads and writes at DynamoDB's maximum batch sizes, with batches running in
+    parallel on a bounded worker pool and unprocessed keys or items retried with
+    jittered exponential backoff.
+    """
+
+    def __init__(self, backend, max_workers=MAX_BULK_WORKERS):
+        self.backend = backend
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="dynamodb")
+
+    def get_batch(self, table_name, keys):
+        items = []
+        request = {table_name: {'Keys': keys}}
+        for attempt in range(MAX_RETRIES + 1):
+            response = self.backend.batch_get_item(request)
+            items.extend(response.get('Responses', {}).get(table_name, []))
+            request = response.get('UnprocessedKeys') or {}
+            if not request:
+                return items, []
+            if attempt < MAX_RETRIES:
+                backoff(attempt)
+        return items, request[table_name]['Keys']
+
+    def write_batch(self, table_name, write_requests):
+        request = {table_name: write_requests}
+        for attempt in range(MAX_RETRIES + 1):
+            response = self.backend.batch_write_item(request)
+            request = response.get('UnprocessedItems') or {}
+            if not request:
+                return []
+            if attempt < MAX_RETRIES:
+                backoff(attempt)
+        return request[table_name]
+
+    def batch_get(self, table_name, key_name, key_values):
+        """
+        Fetch items by a single-attribute key.
+
+        :param table_name: DynamoDB table name.
+        :param key_name: Partition key attribute, e.g. road_segment_id.
+        :param key_values: List of key values, duplicates are ignored.
+        :return: Dict key value -> item for every item found.
+        """
+        key_values = list(dict.fromkeys(key_values))
+        batches = [
+            [{key_name: value} for value in key_values[i:i + MAX_BATCH_GET_KEYS]]
+            for i in range(0, len(key_values), MAX_BATCH_GET_KEYS)
+        ]
+
+        results = {}
+        failed = 0
+        for items, unprocessed in self.executor.map(lambda batch: self.get_batch(table_name, batch), batches):
+            results.update({item[key_name]: item for item in items})
+            failed += len(unprocessed)
+        if failed:
+            print(f"Gave up reading {failed} keys from {table_name} after {MAX_RETRIES} retries")
+        return results
+
+    def batch_write(self, table_name, write_requests, parallel=True):
+        """
+        Write PutRequest/DeleteRequest entries.
+
+        :param table_name: DynamoDB table name.
+        :param write_requests: List of {"PutRequest": {"Item": ...}} or DeleteRequest entries.
+        :param parallel: Run the batches on the worker pool. False writes them one after another on the
+                         calling thread, which still works at interpreter exit after the pool has shut down.
+        :return: List of requests still unprocessed after every retry.
+        """
+        batches = [write_requests[i:i + MAX_BATCH_WRITE_ITEMS] for i in range(0, len(write_requests), MAX_BATCH_WRITE_ITEMS)]
+
+        failed = []
+        run_batches = self.executor.map if parallel else map
+        for unprocessed in run_batches(lambda batch: self.write_batch(table_name, batch), batches):
+            failed.extend(unprocessed)
+        if failed:
+            print(f"Gave up writing {len(failed)} items to {table_name} after {MAX_RETRIES} retries")
+        return failed
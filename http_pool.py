@@ -0,0 +1,57 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+
+MAX_CONCURRENT_REQUESTS = 8 # Upper bound on in-flight Overpass, Mapillary and MapQuest calls
+HTTP_TIMEOUT_SECONDS = (10, 180) # (connect, read), the read timeout covers Overpass's default 180 s query limit
+
+_session = None
+_executor = None
+_lock = threading.Lock()
+
+
+def get_session():
+    """
+    Shared requests session whose connection pool keeps one connection per concurrent
+    request alive, so repeated calls to the same API skip the TCP and TLS handshakes.
+    """
+    global _session
+    with _lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=MAX_CONCURRENT_REQUESTS, pool_maxsize=MAX_CONCURRENT_REQUESTS)
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+        return _session
+
+
+def get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_REQUESTS, thread_name_prefix="http")
+        return _executor
+
+
+def get(url, **kwargs):
+    """Drop-in for requests.get over the pooled session, with HTTP_TIMEOUT_SECONDS unless a timeout is passed."""
+    kwargs.setdefault("timeout", HTTP_TIMEOUT_SECONDS)
+    return get_session().get(url, **kwargs)
+
+
+def submit(fn, *args, **kwargs):
+    """Run fn in the background, at most MAX_CONCURRENT_REQUESTS at a time. Returns a Future."""
+    return get_executor().submit(fn, *args, **kwargs)
+
+
+def map_concurrent(fn, items):
+    """
+    Call fn on every item concurrently, bounded by MAX_CONCURRENT_REQUESTS.
+
+    :return: List of results in the order of items.
+    """
+    items = list(items)
+    if len(items) <= 1:  # Not worth a thread hop
+        return [fn(item) for item in items]
+    return list(get_executor().map(fn, items))
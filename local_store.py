@@ -0,0 +1,185 @@
+import json
+import sqlite3
+import threading
+import time
+from decimal import Decimal
+from dynamodb_bulk import TABLE_KEYS
+
+LOCAL_STORE_PATH = "./segment_store.sqlite"
+LOCAL_STORE_TTL_SECONDS = 24 * 3600 # Tiered reads go back to DynamoDB for local rows older than this
+LOCAL_CACHED_TABLES = ('drivenDB_road_segment_info',) # Tables the tiered backend keeps a local copy of
+
+
+def to_sqlite_value(value):
+    """DynamoDB numbers come back as Decimal, which neither sqlite3 nor json accept."""
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    return value
+
+
+def encode_item(item):
+    # default is called for every Decimal, nested in lists and maps too
+    return json.dumps(item, default=to_sqlite_value)
+
+
+def decode_item(data):
+    # Numbers are read back as Decimal, like boto3 does
+    return json.loads(data, parse_float=Decimal, parse_int=Decimal)
+
+
+class SQLiteBackend:
+    """
+    Embedded bulk backend with the same request and response shapes as DynamoDB.
+
+    Each table is a SQLite table keyed by its primary key attributes, with the item
+    stored as JSON. Every batch_write_item is one transaction. Used on its own to
+    run the pipeline without AWS, or as the local tier of TieredBackend.
+    """
+
+    def __init__(self, path=LOCAL_STORE_PATH, table_keys=TABLE_KEYS):
+        self.path = path
+        self.table_keys = table_keys
+        # Batches arrive from BulkClient's worker threads, so one connection is shared under a lock
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock, self.connection:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("PRAGMA synchronous=NORMAL")
+            for table_name, key_names in table_keys.items():
+                key_columns = ", ".join(f'"{name}"' for name in key_names)
+                self.connection.execute(
+                    f'CREATE TABLE IF NOT EXISTS "{table_name}" ({key_columns}, item TEXT NOT NULL, '
+                    f'stored_at REAL NOT NULL, PRIMARY KEY ({key_columns})) WITHOUT ROWID'
+                )
+
+    def key_of(self, table_name, item):
+        return tuple(to_sqlite_value(item[name]) for name in self.table_keys[table_name])
+
+    def get_items(self, table_name, keys, max_age_seconds=None):
+        """
+        :param keys: List of key dicts, e.g. [{"road_segment_id": 123}].
+        :param max_age_seconds: Skip items stored longer ago than this. None returns every item.
+        :return: List of the items found.
+        """
+        key_names = self.table_keys[table_name]
+        stored_after = time.time() - max_age_seconds if max_age_seconds is not None else float("-inf")
+        items = []
+        with self.lock:
+            if len(key_names) == 1:
+                values = [to_sqlite_value(key[key_names[0]]) for key in keys]
+                placeholders = ", ".join("?" * len(values))
+                rows = self.connection.execute(
+                    f'SELECT item FROM "{table_name}" WHERE "{key_names[0]}" IN ({placeholders}) AND stored_at >= ?',
+                    values + [stored_after],
+                ).fetchall()
+            else:
+                condition = " AND ".join(f'"{name}" = ?' for name in key_names)
+                query = f'SELECT item FROM "{table_name}" WHERE {condition} AND stored_at >= ?'
+                rows = []
+                for key in keys:
+                    rows.extend(self.connection.execute(query, self.key_of(table_name, key) + (stored_after,)).fetchall())
+        for (data,) in rows:
+            items.append(decode_item(data))
+        return items
+
+    def write_requests(self, table_name, write_requests):
+        """Apply PutRequest/DeleteRequest entries to one table in a single transaction."""
+        key_names = self.table_keys[table_name]
+        key_columns = ", ".join(f'"{name}"' for name in key_names)
+        condition = " AND ".join(f'"{name}" = ?' for name in key_names)
+        stored_at = time.time()
+        puts, deletes = [], []
+        for request in write_requests:
+            if 'PutRequest' in request:
+                item = request['PutRequest']['Item']
+                puts.append(self.key_of(table_name, item) + (encode_item(item), stored_at))
+            elif 'DeleteRequest' in request:
+                deletes.append(self.key_of(table_name, request['DeleteRequest']['Key']))
+
+        with self.lock, self.connection:
+            self.connection.executemany(
+                f'INSERT OR REPLACE INTO "{table_name}" ({key_columns}, item, stored_at) '
+                f'VALUES ({", ".join("?" * (len(key_names) + 2))})',
+                puts,
+            )
+            self.connection.executemany(f'DELETE FROM "{table_name}" WHERE {condition}', deletes)
+
+    def put_items(self, table_name, items):
+        self.write_requests(table_name, [{'PutRequest': {'Item': item}} for item in items])
+
+    def batch_get_item(self, request_items):
+        responses = {}
+        for table_name, request in request_items.items():
+            items = self.get_items(table_name, request['Keys'])
+            if items:
+                responses[table_name] = items
+        return {'Responses': responses, 'UnprocessedKeys': {}}
+
+    def batch_write_item(self, request_items):
+        for table_name, write_requests in request_items.items():
+            self.write_requests(table_name, write_requests)
+        return {'UnprocessedItems': {}}
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+
+class TieredBackend:
+    """
+    Per-worker SQLite store in front of DynamoDB, which stays the shared tier.
+
+    Reads of cached tables are served locally when the local copy is younger than
+    max_age_seconds, and only the remaining keys go to DynamoDB; what DynamoDB returns
+    is stored locally. Writes go to DynamoDB first, and only the requests it accepted
+    are applied locally, so the local tier never holds data the shared tier lacks.
+    """
+
+    def __init__(self, local, remote, cached_tables=LOCAL_CACHED_TABLES, max_age_seconds=LOCAL_STORE_TTL_SECONDS):
+        self.local = local
+        self.remote = remote
+        self.cached_tables = cached_tables
+        self.max_age_seconds = max_age_seconds
+        self.lock = threading.Lock() # Batches arrive from BulkClient's worker threads
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.local_hits = 0
+        self.remote_reads = 0
+
+    def batch_get_item(self, request_items):
+        responses, remote_request = {}, {}
+        for table_name, request in request_items.items():
+            if table_name not in self.cached_tables:
+                remote_request[table_name] = request
+                continue
+            items = self.local.get_items(table_name, request['Keys'], self.max_age_seconds)
+            found = {self.local.key_of(table_name, item) for item in items}
+            missing = [key for key in request['Keys'] if self.local.key_of(table_name, key) not in found]
+            with self.lock:
+                self.local_hits += len(items)
+            if items:
+                responses[table_name] = items
+            if missing:
+                remote_request[table_name] = {'Keys': missing}
+
+        if not remote_request:
+            return {'Responses': responses, 'UnprocessedKeys': {}}
+
+        response = self.remote.batch_get_item(remote_request)
+        for table_name, items in response.get('Responses', {}).items():
+            with self.lock:
+                self.remote_reads += len(items)
+            responses.setdefault(table_name, []).extend(items)
+            if table_name in self.cached_tables:
+                self.local.put_items(table_name, items)
+        return {'Responses': responses, 'UnprocessedKeys': response.get('UnprocessedKeys') or {}}
+
+    def batch_write_item(self, request_items):
+        response = self.remote.batch_write_item(request_items)
+        unprocessed = response.get('UnprocessedItems') or {}
+        for table_name, write_requests in request_items.items():
+            if table_name in self.cached_tables:
+                pending = unprocessed.get(table_name, [])
+                self.local.write_requests(table_name, [request for request in write_requests if request not in pending])
+        return response
@@ -0,0 +1,98 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import http_pool
+
+MAPILLARY_CACHE_DIR = "./mapillary_cache"
+MAPILLARY_TILE_SIZE_DEGREES = 0.01 # ~1.1 km tiles
+MAPILLARY_CACHE_TTL_SECONDS = 7 * 24 * 3600
+
+
+class MapillarySignCache:
+    """
+    Disk-backed cache of Mapillary speed limit signs per fixed lat/lon tile.
+
+    Trips request only the tiles along their corridor instead of one rectangle
+    over the whole session. Each tile's filtered signs are kept for
+    MAPILLARY_CACHE_TTL_SECONDS, so repeat trips through the same area make no
+    Mapillary requests.
+    """
+
+    def __init__(self, fetch, cache_dir=MAPILLARY_CACHE_DIR, tile_size=MAPILLARY_TILE_SIZE_DEGREES,
+                 ttl_seconds=MAPILLARY_CACHE_TTL_SECONDS):
+        """
+        :param fetch: Callable (lat_min, lon_min, lat_max, lon_max) returning every speed limit
+                      sign in the bbox across all pages, or None if the request failed.
+        """
+        self.fetch = fetch
+        self.cache_dir = cache_dir
+        self.tile_size = tile_size
+        self.ttl_seconds = ttl_seconds
+        os.makedirs(cache_dir, exist_ok=True)
+        self.lock = threading.Lock() # Tiles load on pool threads
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+
+    def tile_path(self, tile):
+        return os.path.join(self.cache_dir, f"{tile[0]}_{tile[1]}.json")
+
+    def load(self, tile):
+        """Returns the cached signs of a tile, or None if missing or older than the TTL."""
+        try:
+            with open(self.tile_path(tile), "r") as file:
+                cached = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if time.time() - cached["fetched_at"] > self.ttl_seconds:
+            return None
+        return cached["signs"]
+
+    def load_or_fetch(self, tile):
+        signs = self.load(tile)
+        with self.lock:
+            if signs is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if signs is not None:
+            return signs
+
+        row, col = tile
+        signs = self.fetch(row * self.tile_size, col * self.tile_size, (row + 1) * self.tile_size, (col + 1) * self.tile_size)
+        if signs is None: # Failed requests are not cached
+            return []
+
+        # Write to a temporary file of this writer's own, then rename, so neither a concurrent
+        # reader nor another thread fetching the same tile ever sees a partial file
+        path = self.tile_path(tile)
+        file = tempfile.NamedTemporaryFile("w", dir=os.path.dirname(path), suffix=".tmp", delete=False)
+        try:
+            with file:
+                json.dump({"fetched_at": time.time(), "signs": signs}, file)
+            os.replace(file.name, path)
+        except Exception:
+            os.remove(file.name)
+            raise
+        return signs
+
+    def submit(self, tiles):
+        """
+        Start loading every tile in the background over the pooled HTTP session.
+
+        :param tiles: List of (row, col) tiles, e.g. from corridor_cells.
+        :return: List of futures to pass to collect.
+        """
+        return [http_pool.submit(self.load_or_fetch, tile) for tile in tiles]
+
+    def collect(self, futures):
+        """Wait for the submitted tiles and return their signs without duplicates."""
+        speed_signs = {}
+        for future in futures:
+            for sign in future.result():
+                speed_signs.setdefault(sign["id"], sign)
+        return list(speed_signs.values())
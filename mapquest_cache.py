@@ -0,0 +1,104 @@
+import math
+import threading
+import time
+from concurrent.futures import Future
+
+MAPQUEST_CELL_SIZE_DEGREES = 0.0001 # ~11 m, small enough that a cell rarely spans two roads
+MAPQUEST_CACHE_TTL_SECONDS = 30 * 24 * 3600
+MAPQUEST_CACHE_MAX_ENTRIES = 100000
+
+
+class MapQuestCache:
+    """
+    Cache of MapQuest reverse-geocode speed limits with single-flight lookups.
+
+    Results are keyed both by road segment id and by the quantized cell of the
+    coordinate that was looked up, and expire after MAPQUEST_CACHE_TTL_SECONDS.
+    Concurrent requests for the same segment or cell wait on the one request
+    already in flight instead of paying for their own.
+    """
+
+    def __init__(self, lookup, cell_size=MAPQUEST_CELL_SIZE_DEGREES, ttl_seconds=MAPQUEST_CACHE_TTL_SECONDS):
+        """
+        :param lookup: Callable taking a (lat, lon) tuple and returning the speed limit,
+                       "Unknown", or an error message string.
+        """
+        self.lookup = lookup
+        self.cell_size = cell_size
+        self.ttl_seconds = ttl_seconds
+        self.results = {} # ("segment", id) or ("cell", row, col) -> (speed_limit, expires_at)
+        self.in_flight = {} # same keys -> Future
+        self.lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.hits = 0
+        self.api_calls = 0
+        self.coalesced = 0
+
+    def keys_for(self, segment_id, coord):
+        cell = (math.floor(coord[0] / self.cell_size), math.floor(coord[1] / self.cell_size))
+        return ("segment", segment_id), ("cell",) + cell
+
+    def cached(self, keys, now):
+        for key in keys:
+            result = self.results.get(key)
+            if result is not None and result[1] > now:
+                return result
+        return None
+
+    def evict(self):
+        """Drops the oldest entries once the cache holds more than MAPQUEST_CACHE_MAX_ENTRIES."""
+        while len(self.results) > MAPQUEST_CACHE_MAX_ENTRIES:
+            del self.results[next(iter(self.results))]
+
+    def get_speed_limit(self, segment_id, coord):
+        """
+        Speed limit of a road segment from MapQuest, using the cache where possible.
+
+        :param segment_id: OSM way id of the segment.
+        :param coord: Tuple (lat, lon) to reverse-geocode, e.g. the segment's middle vertex.
+        :return: Same value as the lookup callable.
+        """
+        keys = self.keys_for(segment_id, coord)
+
+        with self.lock:
+            result = self.cached(keys, time.time())
+            if result is not None:
+                self.hits += 1
+                return result[0]
+
+            future = next((self.in_flight[key] for key in keys if key in self.in_flight), None)
+            owner = future is None
+            if owner:
+                future = Future()
+                for key in keys:
+                    self.in_flight[key] = future
+                self.api_calls += 1
+            else:
+                self.coalesced += 1
+
+        if not owner:
+            return future.result()
+
+        try:
+            speed_limit = self.lookup(coord)
+        except Exception as e:
+            with self.lock:
+                for key in keys:
+                    self.in_flight.pop(key, None)
+            future.set_exception(e)
+            raise
+
+        with self.lock:
+            # Error messages are not cached, so the next trip tries again
+            if not isinstance(speed_limit, str) or speed_limit == "Unknown":
+                expires_at = time.time() + self.ttl_seconds
+                for key in keys:
+                    self.results.pop(key, None) # Re-insert so the dict stays in insertion-time order
+                    self.results[key] = (speed_limit, expires_at)
+                self.evict()
+            for key in keys:
+                self.in_flight.pop(key, None)
+        future.set_result(speed_limit)
+        return speed_limit
@@ -0,0 +1,189 @@
+import json
+import os
+import tempfile
+import threading
+import http_pool
+from collections import OrderedDict
+from corridor_planner import cells_to_rectangles, chunk_rectangles, rectangle_bbox, rectangle_cells, road_segments_in_cells
+from road_tile_store import tile_range
+
+OVERPASS_CACHE_DIR = "./overpass_cache"
+CACHE_CELL_SIZE_DEGREES = 0.005 # ~550 m cells
+MEMORY_BUDGET_BYTES = 64 * 1024 * 1024
+DISK_BUDGET_BYTES = 1024 * 1024 * 1024
+
+
+class OverpassCache:
+    """
+    Persistent cache of Overpass way elements keyed by grid cell.
+
+    Requested bounding boxes are quantized to fixed cells. Cached cells are served
+    from an in-memory LRU, then from disk, and only the missing cells are fetched,
+    merged into a few rectangles sent as union queries. Both tiers evict
+    the least recently used cells once their byte budget is exceeded.
+    """
+
+    def __init__(self, fetch, cache_dir=OVERPASS_CACHE_DIR, cell_size=CACHE_CELL_SIZE_DEGREES,
+                 memory_budget_bytes=MEMORY_BUDGET_BYTES, disk_budget_bytes=DISK_BUDGET_BYTES):
+        """
+        :param fetch: Callable taking a list of (lat_min, lon_min, lat_max, lon_max) bboxes and
+                      returning the Overpass "elements" of their union, or None if the request failed.
+        """
+        self.fetch = fetch
+        self.cache_dir = cache_dir
+        self.cell_size = cell_size
+        self.memory_budget_bytes = memory_budget_bytes
+        self.disk_budget_bytes = disk_budget_bytes
+
+        self.memory = OrderedDict() # cell -> (elements, size in bytes)
+        self.memory_bytes = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        self.disk_bytes = sum(entry.stat().st_size for entry in os.scandir(cache_dir) if entry.name.endswith(".json"))
+        self.lock = threading.RLock() # Guards both tiers and the counters, fetches run outside it
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.api_calls = 0
+        self.bytes_saved = 0
+
+    def cell_path(self, cell):
+        return os.path.join(self.cache_dir, f"{cell[0]}_{cell[1]}.json")
+
+    def remember(self, cell, elements, size):
+        if cell in self.memory:
+            self.memory_bytes -= self.memory.pop(cell)[1]
+        self.memory[cell] = (elements, size)
+        self.memory_bytes += size
+
+        while self.memory_bytes > self.memory_budget_bytes and len(self.memory) > 1:
+            _, (_, evicted_size) = self.memory.popitem(last=False)
+            self.memory_bytes -= evicted_size
+
+    def load(self, cell):
+        """Returns the cached elements of a cell, or None if it is not cached."""
+        if cell in self.memory:
+            self.memory.move_to_end(cell)
+            elements, size = self.memory[cell]
+            self.bytes_saved += size
+            return elements
+
+        path = self.cell_path(cell)
+        try:
+            with open(path, "r") as file:
+                raw = file.read()
+        except FileNotFoundError:
+            return None
+
+        try:
+            elements = json.loads(raw)
+        except json.JSONDecodeError: # Left truncated by a crash before writes were atomic, fetch it again
+            print(f"Dropping corrupt Overpass cache file {path}")
+            self.disk_bytes -= len(raw)
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            return None
+
+        try:
+            os.utime(path) # Last use time drives disk eviction
+        except FileNotFoundError: # Evicted by another process since the read
+            pass
+        self.remember(cell, elements, len(raw))
+        self.bytes_saved += len(raw)
+        return elements
+
+    def store(self, cell, elements):
+        raw = json.dumps(elements)
+        path = self.cell_path(cell)
+        if os.path.exists(path):
+            self.disk_bytes -= os.path.getsize(path)
+        # Write to a temporary file, then rename, so a crash or a concurrent reader never sees a partial file
+        file = tempfile.NamedTemporaryFile("w", dir=self.cache_dir, suffix=".tmp", delete=False)
+        try:
+            with file:
+                file.write(raw)
+            os.replace(file.name, path)
+        except Exception:
+            os.remove(file.name)
+            raise
+        self.disk_bytes += len(raw)
+        self.remember(cell, elements, len(raw))
+
+        if self.disk_bytes > self.disk_budget_bytes:
+            self.evict_disk()
+
+    def evict_disk(self):
+        entries = sorted(
+            (entry for entry in os.scandir(self.cache_dir) if entry.name.endswith(".json")),
+            key=lambda entry: entry.stat().st_mtime,
+        )
+        for entry in entries:
+            if self.disk_bytes <= self.disk_budget_bytes:
+                break
+            self.disk_bytes -= entry.stat().st_size
+            os.remove(entry.path)
+
+    def get_cells(self, cells):
+        """
+        Elements of every cell, fetching the ones not cached with as few Overpass queries as possible.
+
+        :return: Dict cell -> elements, missing cells are left out if the query failed.
+        """
+        cached = {}
+        missing = []
+        with self.lock:
+            for cell in cells:
+                elements = self.load(cell)
+                if elements is None:
+                    missing.append(cell)
+                else:
+                    cached[cell] = elements
+            self.hits += len(cached)
+            self.misses += len(missing)
+
+        if not missing:
+            return cached
+
+        # Union queries run concurrently over the pooled session
+        chunks = chunk_rectangles(cells_to_rectangles(missing))
+        responses = http_pool.map_concurrent(
+            lambda rectangles: self.fetch([rectangle_bbox(rectangle, self.cell_size) for rectangle in rectangles]), chunks
+        )
+        with self.lock:
+            self.api_calls += len(chunks)
+
+        for rectangles, fetched in zip(chunks, responses):
+            if fetched is None: # Failed requests are not cached
+                continue
+
+            # Split the response back into the cells of this query, a way belongs to every cell its bounds overlap
+            query_cells = {cell: [] for rectangle in rectangles for cell in rectangle_cells(rectangle)}
+            for element in fetched:
+                b = element.get("bounds")
+                if b is None:
+                    continue
+                for cell in tile_range(b["minlat"], b["minlon"], b["maxlat"], b["maxlon"], self.cell_size):
+                    if cell in query_cells:
+                        query_cells[cell].append(element)
+
+            with self.lock:
+                for cell, elements in query_cells.items():
+                    self.store(cell, elements)
+                    cached[cell] = elements
+        return cached
+
+    def get_road_segments(self, lat_min, lon_min, lat_max, lon_max):
+        """
+        Road segments within a bounding box, served from cache wherever possible.
+
+        :return: List of way elements in the shape of the Overpass response "elements".
+        """
+        cells = tile_range(lat_min, lon_min, lat_max, lon_max, self.cell_size)
+        return [
+            element for element in road_segments_in_cells(self.get_cells(cells), cells)
+            if element["bounds"]["minlat"] <= lat_max and element["bounds"]["maxlat"] >= lat_min
+            and element["bounds"]["minlon"] <= lon_max and element["bounds"]["maxlon"] >= lon_min
+        ]
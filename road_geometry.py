@@ -0,0 +1,168 @@
+import numpy as np
+
+# WGS84 ellipsoid
+WGS84_A = 6378137.0
+WGS84_E2 = 6.69437999014e-3
+
+
+def ellipsoidal_distance(lat1, lon1, lat2, lon2):
+    """
+    Distance in meters between coordinate arrays, using the WGS84 radii of curvature
+    at the mean latitude of each pair.
+
+    Agrees with geopy's geodesic to well under a millimeter for pairs a few hundred
+    meters apart, which covers every road-matching threshold in the pipeline.
+
+    :param lat1, lon1, lat2, lon2: Arrays (or scalars) of coordinates in degrees.
+    :return: Array of distances in meters.
+    """
+    mean_lat = np.radians((lat1 + lat2) / 2)
+    w = 1 - WGS84_E2 * np.sin(mean_lat) ** 2
+    meridional_radius = WGS84_A * (1 - WGS84_E2) / w ** 1.5
+    normal_radius = WGS84_A / np.sqrt(w)
+
+    north = meridional_radius * np.radians(lat2 - lat1)
+    east = normal_radius * np.cos(mean_lat) * np.radians(lon2 - lon1)
+    return np.hypot(north, east)
+
+
+def step_distances(lat, lon):
+    """
+    Distance in meters between each pair of consecutive points of a trip.
+
+    :param lat, lon: Arrays of N coordinates in degrees.
+    :return: Array of N - 1 distances, step i running from point i to point i + 1.
+    """
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    return ellipsoidal_distance(lat[:-1], lon[:-1], lat[1:], lon[1:])
+
+
+class LocalProjection:
+    """
+    Equirectangular projection of a trip's working area into a local metric frame.
+
+    The WGS84 radii of curvature are evaluated once at the center of the area, after
+    which every coordinate maps to (east, north) meters with two multiplications.
+    The relative distance error versus geodesic grows with distance from the
+    center latitude and is at most tan(|center_lat|) * half_lat_span (radians):
+    about 0.25% over a 55 km tall trip at Houston's latitude, or 2.5 cm on the
+    10 meter matching threshold.
+    """
+
+    def __init__(self, center_lat, center_lon):
+        self.center_lat = center_lat
+        self.center_lon = center_lon
+
+        phi = np.radians(center_lat)
+        w = 1 - WGS84_E2 * np.sin(phi) ** 2
+        self.meters_per_degree_lat = np.radians(WGS84_A * (1 - WGS84_E2) / w ** 1.5)
+        self.meters_per_degree_lon = np.radians(WGS84_A / np.sqrt(w) * np.cos(phi))
+
+    @classmethod
+    def from_bounds(cls, lat_min, lat_max, lon_min, lon_max):
+        return cls((lat_min + lat_max) / 2, (lon_min + lon_max) / 2)
+
+    def max_relative_error(self, lat_min, lat_max):
+        """Worst-case relative distance error versus geodesic for points between lat_min and lat_max."""
+        half_span = max(abs(lat_max - self.center_lat), abs(lat_min - self.center_lat))
+        return float(np.tan(np.radians(abs(self.center_lat))) * np.radians(half_span))
+
+    def to_xy(self, coords):
+        """
+        :param coords: Array (N, 2) of (latitude, longitude).
+        :return: Array (N, 2) of (east, north) meters from the center.
+        """
+        coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+        return np.column_stack((
+            (coords[:, 1] - self.center_lon) * self.meters_per_degree_lon,
+            (coords[:, 0] - self.center_lat) * self.meters_per_degree_lat,
+        ))
+
+    def to_lat_lon(self, xy):
+        """
+        :param xy: Array (N, 2) of (east, north) meters from the center.
+        :return: Array (N, 2) of (latitude, longitude).
+        """
+        xy = np.asarray(xy, dtype=np.float64).reshape(-1, 2)
+        return np.column_stack((
+            xy[:, 1] / self.meters_per_degree_lat + self.center_lat,
+            xy[:, 0] / self.meters_per_degree_lon + self.center_lon,
+        ))
+
+
+def project_onto_segments(points, starts, ends):
+    """
+    Project every point onto every segment in a plane.
+
+    :param points: Array (N, 2) of planar coordinates.
+    :param starts: Array (S, 2) of planar segment start points.
+    :param ends: Array (S, 2) of planar segment end points.
+    :return: Array (N, S, 2) of the closest point on each segment.
+    """
+    directions = ends - starts            # (S, 2)
+    lengths_sq = np.einsum("ij,ij->i", directions, directions)
+
+    offsets = points[:, None, :] - starts[None, :, :]  # (N, S, 2)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = np.einsum("nsk,sk->ns", offsets, directions) / lengths_sq
+    # Zero-length segments project onto their start vertex
+    t = np.clip(np.nan_to_num(t, nan=0.0), 0.0, 1.0)
+    return starts[None, :, :] + t[:, :, None] * directions[None, :, :]
+
+
+def point_to_segment_distances(points, starts, ends, projection=None):
+    """
+    Calculate the perpendicular distance from many points to each of many segments.
+
+    Without a projection each point is projected onto every segment in (lon, lat)
+    space, the same way shapely's nearest_points does, and measured with
+    ellipsoidal_distance. With a LocalProjection the projection and the distance
+    are both computed in the local metric frame.
+
+    :param points: Array (N, 2) of (latitude, longitude).
+    :param starts: Array (S, 2) of (latitude, longitude) segment start points.
+    :param ends: Array (S, 2) of (latitude, longitude) segment end points.
+    :param projection: Optional LocalProjection for the trip's working area.
+    :return: Tuple (distances, projected) with distances (N, S) in meters and
+             projected (N, S, 2) the (latitude, longitude) of the nearest point on each segment.
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    starts = np.asarray(starts, dtype=np.float64).reshape(-1, 2)
+    ends = np.asarray(ends, dtype=np.float64).reshape(-1, 2)
+
+    if projection is not None:
+        points_xy = projection.to_xy(points)
+        candidates = project_onto_segments(points_xy, projection.to_xy(starts), projection.to_xy(ends))
+        offsets = candidates - points_xy[:, None, :]
+        distances = np.hypot(offsets[..., 0], offsets[..., 1])
+        return distances, projection.to_lat_lon(candidates).reshape(candidates.shape)
+
+    # Shapely-style (lon, lat) plane, then back to (lat, lon)
+    candidates = project_onto_segments(points[:, ::-1], starts[:, ::-1], ends[:, ::-1])[..., ::-1]
+    distances = ellipsoidal_distance(points[:, None, 0], points[:, None, 1], candidates[..., 0], candidates[..., 1])
+    return distances, candidates
+
+
+def point_to_polyline_distances(points, vertices, projection=None):
+    """
+    Calculate the minimum perpendicular distance from many points to one polyline.
+
+    Measured the same way as point_to_segment_distances, keeping the closest segment.
+
+    :param points: Array (N, 2) of (latitude, longitude).
+    :param vertices: Array (M, 2) of (latitude, longitude) polyline vertices.
+    :param projection: Optional LocalProjection for the trip's working area.
+    :return: Tuple (distances, projected) with distances (N,) in meters and
+             projected (N, 2) the (latitude, longitude) of the nearest point on the polyline.
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    vertices = np.asarray(vertices, dtype=np.float64).reshape(-1, 2)
+
+    if len(vertices) < 2:  # No segment to measure against
+        return np.full(len(points), np.inf), np.full((len(points), 2), np.nan)
+
+    distances, candidates = point_to_segment_distances(points, vertices[:-1], vertices[1:], projection)
+    rows = np.arange(len(points))
+    nearest = np.argmin(distances, axis=1)
+    return distances[rows, nearest], candidates[rows, nearest]
@@ -0,0 +1,73 @@
+import numpy as np
+
+STICKY_DISTANCE_THRESHOLD = 10 # Meters, farther than this from the previous road triggers a full search
+
+
+class IncrementalRoadMatcher:
+    """
+    Map matcher that exploits the temporal locality of GPS points.
+
+    Consecutive points almost always fall on the same way or on one that shares a
+    node with it, so each point is first measured against the previously matched
+    way and its neighbours only. The full candidate search runs when none of them
+    is within the distance threshold, or when the previous way is not part of the
+    current batch of road segments.
+    """
+
+    def __init__(self, find_nearest, distance_threshold=STICKY_DISTANCE_THRESHOLD):
+        """
+        :param find_nearest: Callable (user_coords, positions, road_index) returning the
+                             closest_road dict for the nearest of the roads at those table positions, or None.
+        :param distance_threshold: Max distance in meters to keep matching the previous road.
+        """
+        self.find_nearest = find_nearest
+        self.distance_threshold = distance_threshold
+        self.road_table = None
+        self.positions = []
+        self.road_index = None
+        self.batch_order = {}
+        self.previous_road_id = None
+        self.sticky_matches = 0
+        self.full_searches = 0
+
+    def set_road_segments(self, road_table, positions, road_index=None):
+        """
+        Load the road segments of the current batch.
+
+        :param road_table: SegmentTable holding the trip's roads, shared nodes included.
+        :param positions: Table positions of the batch's roads, in batch order.
+        :param road_index: Optional RoadSegmentIndex over positions for the full search.
+        """
+        self.road_table = road_table
+        self.positions = positions
+        self.road_index = road_index
+        self.batch_order = {position: order for order, position in enumerate(np.asarray(positions).tolist())}
+
+    def neighbouring_roads(self, road_id):
+        """Returns the positions of the road with road_id and of every batch road sharing a node with it, in batch order."""
+        position = self.road_table.position_by_id.get(road_id) if self.road_table is not None else None
+        if position not in self.batch_order:
+            return []
+
+        neighbours = [p for p in self.road_table.neighbours(position) if p in self.batch_order]
+        return sorted(neighbours, key=self.batch_order.__getitem__)
+
+    def match(self, user_coords):
+        """
+        Find the road segment a GPS point travels on.
+
+        :param user_coords: Tuple (latitude, longitude) of the GPS point.
+        :return: closest_road dict as returned by find_nearest, or None.
+        """
+        candidate_roads = self.neighbouring_roads(self.previous_road_id)
+        if candidate_roads:
+            closest_road = self.find_nearest(user_coords, candidate_roads, None)
+            if closest_road and closest_road["distance_meters"] <= self.distance_threshold:
+                self.sticky_matches += 1
+                self.previous_road_id = closest_road["id"]
+                return closest_road
+
+        self.full_searches += 1
+        closest_road = self.find_nearest(user_coords, self.positions, self.road_index)
+        self.previous_road_id = closest_road["id"] if closest_road else None
+        return closest_road
@@ -0,0 +1,108 @@
+import math
+import numpy as np
+import shapely
+from shapely.geometry import Point, box
+from shapely.strtree import STRtree
+
+# Shortest ground length of one degree on the WGS84 ellipsoid. Dividing a radius
+# in meters by these gives a search box in degrees that always contains every
+# point within that radius.
+METERS_PER_DEGREE_LAT_MIN = 110574.0
+METERS_PER_DEGREE_LON_AT_EQUATOR = 111319.0
+SEARCH_BOX_SAFETY_FACTOR = 1.01
+
+
+def search_box(coords, radius_meters):
+    """
+    Build a (lon, lat) search box around a coordinate that is guaranteed to contain
+    every point within radius_meters of it.
+
+    :param coords: Tuple (latitude, longitude).
+    :param radius_meters: Search radius in meters.
+    :return: Tuple (min_lon, min_lat, max_lon, max_lat).
+    """
+    lat, lon = coords
+    radius = radius_meters * SEARCH_BOX_SAFETY_FACTOR
+    delta_lat = radius / METERS_PER_DEGREE_LAT_MIN
+    # Degrees of longitude are shortest at the box edge farthest from the equator
+    widest_lat = min(abs(lat) + delta_lat, 89.9)
+    delta_lon = radius / (METERS_PER_DEGREE_LON_AT_EQUATOR * math.cos(math.radians(widest_lat)))
+    return lon - delta_lon, lat - delta_lat, lon + delta_lon, lat + delta_lat
+
+
+def search_boxes(lat, lon, radius_meters):
+    """
+    search_box of many coordinates at once.
+
+    :param lat, lon: Arrays of coordinates in degrees.
+    :param radius_meters: Search radius in meters.
+    :return: Arrays min_lon, min_lat, max_lon, max_lat.
+    """
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    radius = radius_meters * SEARCH_BOX_SAFETY_FACTOR
+    delta_lat = radius / METERS_PER_DEGREE_LAT_MIN
+    widest_lat = np.minimum(np.abs(lat) + delta_lat, 89.9)
+    delta_lon = radius / (METERS_PER_DEGREE_LON_AT_EQUATOR * np.cos(np.radians(widest_lat)))
+    return lon - delta_lon, lat - delta_lat, lon + delta_lon, lat + delta_lat
+
+
+class RoadSegmentIndex:
+    """
+    STRtree over the way envelopes of one batch of road segments in a SegmentTable.
+
+    Lets the matcher look only at the roads whose envelope falls within a search
+    radius of a GPS point instead of measuring the distance to every road.
+    """
+
+    def __init__(self, road_table, positions):
+        """
+        :param road_table: SegmentTable holding the roads.
+        :param positions: Table positions of the batch's roads, in batch order.
+        """
+        self.positions = np.asarray(positions, dtype=np.int64)
+        # A single vertex has no segment to measure against
+        self.kept = np.flatnonzero(road_table.vertex_counts(self.positions) >= 2)
+        envelopes = road_table.envelopes[self.positions[self.kept]]
+        self.tree = STRtree(shapely.box(envelopes[:, 0], envelopes[:, 1], envelopes[:, 2], envelopes[:, 3])) if len(envelopes) else None
+
+    def query(self, user_coords, radius_meters):
+        """
+        Return the road segments that may lie within radius_meters of a point.
+
+        :param user_coords: Tuple (latitude, longitude) of the GPS point.
+        :param radius_meters: Search radius in meters.
+        :return: Array of table positions, in their original batch order.
+        """
+        if self.tree is None:
+            return self.positions[:0]
+
+        hits = self.tree.query(box(*search_box(user_coords, radius_meters)))
+        return self.positions[self.kept[np.sort(hits)]]
+
+
+class SpeedSignIndex:
+    """
+    STRtree over the locations of a trip's Mapillary speed signs, built once per trip.
+
+    Sign-to-road assignment then only measures the signs inside each road's bounds
+    instead of every sign in the session.
+    """
+
+    def __init__(self, speed_signs):
+        self.speed_signs = speed_signs
+        points = [Point(sign["geometry"]["coordinates"][0], sign["geometry"]["coordinates"][1]) for sign in speed_signs]
+        self.tree = STRtree(points) if points else None
+
+    def query(self, bounds):
+        """
+        Return the speed signs inside a road's bounds, edges included.
+
+        :param bounds: Overpass bounds dict with minlat, minlon, maxlat and maxlon.
+        :return: List of speed signs, in their original order.
+        """
+        if self.tree is None:
+            return []
+
+        hits = self.tree.query(box(bounds["minlon"], bounds["minlat"], bounds["maxlon"], bounds["maxlat"]))
+        return [self.speed_signs[hit] for hit in sorted(hits)]
@@ -0,0 +1,210 @@
+import json
+import math
+import os
+import shutil
+import numpy as np
+
+ROAD_TILE_STORE_DIR = "./road_tiles"
+TILE_SIZE_DEGREES = 0.01 # ~1.1 km tiles
+# osm_speed_response_data.json was queried with way(around:1000,29.715858,-95.745292), this is the square inside that circle
+OSM_SPEED_RESPONSE_BBOX = (29.7095, -95.7525, 29.7222, -95.7380)
+
+
+def tile_range(lat_min, lon_min, lat_max, lon_max, tile_size=TILE_SIZE_DEGREES):
+    """
+    :return: List of (row, col) tiles overlapping the bounding box.
+    """
+    row_min, row_max = math.floor(lat_min / tile_size), math.floor(lat_max / tile_size)
+    col_min, col_max = math.floor(lon_min / tile_size), math.floor(lon_max / tile_size)
+    return [(row, col) for row in range(row_min, row_max + 1) for col in range(col_min, col_max + 1)]
+
+
+def covered_tiles(lat_min, lon_min, lat_max, lon_max, tile_size=TILE_SIZE_DEGREES):
+    """
+    :return: List of (row, col) tiles lying entirely inside the bounding box.
+    """
+    row_min, row_max = math.ceil(lat_min / tile_size), math.floor(lat_max / tile_size) - 1
+    col_min, col_max = math.ceil(lon_min / tile_size), math.floor(lon_max / tile_size) - 1
+    return [(row, col) for row in range(row_min, row_max + 1) for col in range(col_min, col_max + 1)]
+
+
+def build_tile_store(overpass_dumps, store_dir=ROAD_TILE_STORE_DIR, tile_size=TILE_SIZE_DEGREES):
+    """
+    Build a tile store from Overpass "out geom" JSON dumps.
+
+    A tile is only marked as cached when it lies entirely inside the area a dump was
+    queried for, so a cached tile is guaranteed to hold every way that touches it.
+    The extent of a dump's geometry can't stand in for that area: "out geom" returns
+    whole ways, which reach past the query.
+
+    :param overpass_dumps: List of (json_path, (lat_min, lon_min, lat_max, lon_max)) tuples, each a dump
+                           in the shape of osm_speed_response_data.json and a bbox lying inside its query.
+    :param store_dir: Directory to write the store to, replaced if it exists.
+    :param tile_size: Tile edge in degrees.
+    :return: Number of (ways, cached tiles) in the store.
+    """
+    ways = {}
+    cached = set()
+
+    for dump in overpass_dumps:
+        if not isinstance(dump, tuple):
+            raise ValueError(f"Overpass dump {dump!r} needs the bbox it was queried with")
+        json_path, bbox = dump
+        with open(json_path, "r") as file:
+            elements = [e for e in json.load(file).get("elements", []) if e.get("type") == "way" and e.get("geometry")]
+
+        cached.update(covered_tiles(*bbox, tile_size=tile_size))
+        for element in elements:
+            ways.setdefault(element["id"], element)
+
+    elements = list(ways.values())
+    highway_types, names, maxspeeds = {}, {}, {}
+
+    def intern(table, value):
+        return table.setdefault(value, len(table))
+
+    way_ids = np.array([e["id"] for e in elements], dtype=np.int64)
+    highway = np.array([intern(highway_types, e.get("tags", {}).get("highway", "Unknown")) for e in elements], dtype=np.uint8)
+    name_ids = np.array([intern(names, e.get("tags", {}).get("name")) for e in elements], dtype=np.int32)
+    maxspeed_ids = np.array([intern(maxspeeds, e.get("tags", {}).get("maxspeed")) for e in elements], dtype=np.int32)
+    bounds = np.array([[e["bounds"]["minlat"], e["bounds"]["minlon"], e["bounds"]["maxlat"], e["bounds"]["maxlon"]] for e in elements], dtype=np.float64).reshape(-1, 4)
+
+    geometry_offsets = np.zeros(len(elements) + 1, dtype=np.int64)
+    geometry_offsets[1:] = np.cumsum([len(e["geometry"]) for e in elements])
+    geometry = np.array([(point["lat"], point["lon"]) for e in elements for point in e["geometry"]], dtype=np.float64).reshape(-1, 2)
+
+    node_offsets = np.zeros(len(elements) + 1, dtype=np.int64)
+    node_offsets[1:] = np.cumsum([len(e.get("nodes", [])) for e in elements])
+    nodes = np.array([node for e in elements for node in e.get("nodes", [])], dtype=np.int64)
+
+    # Ways of every cached tile, a way goes in every tile its bounds overlap
+    tile_ways = {tile: [] for tile in cached}
+    for position, (minlat, minlon, maxlat, maxlon) in enumerate(bounds):
+        for tile in tile_range(minlat, minlon, maxlat, maxlon, tile_size):
+            if tile in tile_ways:
+                tile_ways[tile].append(position)
+
+    tiles = sorted(tile_ways)
+    tile_keys = np.array(tiles, dtype=np.int32).reshape(-1, 2)
+    tile_offsets = np.zeros(len(tiles) + 1, dtype=np.int64)
+    tile_offsets[1:] = np.cumsum([len(tile_ways[tile]) for tile in tiles])
+    tile_positions = np.array([position for tile in tiles for position in tile_ways[tile]], dtype=np.int32)
+
+    # Write next to the target and swap in, so readers never see half a store
+    tmp_dir = store_dir.rstrip("/") + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    arrays = {
+        "way_ids": way_ids, "highway": highway, "name_ids": name_ids, "maxspeed_ids": maxspeed_ids,
+        "bounds": bounds, "geometry": geometry, "geometry_offsets": geometry_offsets,
+        "nodes": nodes, "node_offsets": node_offsets,
+        "tile_keys": tile_keys, "tile_offsets": tile_offsets, "tile_positions": tile_positions,
+    }
+    for name, array in arrays.items():
+        np.save(os.path.join(tmp_dir, f"{name}.npy"), array)
+    with open(os.path.join(tmp_dir, "strings.json"), "w") as file:
+        json.dump({
+            "tile_size": tile_size,
+            "highway_types": list(highway_types),
+            "names": list(names),
+            "maxspeeds": list(maxspeeds),
+        }, file)
+
+    shutil.rmtree(store_dir, ignore_errors=True)
+    os.rename(tmp_dir, store_dir)
+    return len(elements), len(tiles)
+
+
+class RoadTileStore:
+    """
+    Read-only, memory-mapped store of road segments bucketed into fixed lat/lon tiles.
+
+    Serves road segments for a bounding box without any network I/O, in the same
+    element shape as the Overpass API response.
+    """
+
+    def __init__(self, store_dir=ROAD_TILE_STORE_DIR):
+        def load(name):
+            return np.load(os.path.join(store_dir, f"{name}.npy"), mmap_mode="r")
+
+        with open(os.path.join(store_dir, "strings.json"), "r") as file:
+            strings = json.load(file)
+        self.tile_size = strings["tile_size"]
+        self.highway_types = strings["highway_types"]
+        self.names = strings["names"]
+        self.maxspeeds = strings["maxspeeds"]
+
+        self.way_ids = load("way_ids")
+        self.highway = load("highway")
+        self.name_ids = load("name_ids")
+        self.maxspeed_ids = load("maxspeed_ids")
+        self.bounds = load("bounds")
+        self.geometry = load("geometry")
+        self.geometry_offsets = load("geometry_offsets")
+        self.nodes = load("nodes")
+        self.node_offsets = load("node_offsets")
+        self.tile_offsets = load("tile_offsets")
+        self.tile_positions = load("tile_positions")
+        self.tile_lookup = {(int(row), int(col)): i for i, (row, col) in enumerate(load("tile_keys"))}
+
+    @classmethod
+    def open(cls, store_dir=ROAD_TILE_STORE_DIR):
+        """Returns the store in store_dir, or None if it has not been built."""
+        if not os.path.exists(os.path.join(store_dir, "strings.json")):
+            return None
+        return cls(store_dir)
+
+    def covers(self, lat_min, lon_min, lat_max, lon_max):
+        """Returns True if every tile overlapping the bounding box is cached."""
+        return all(tile in self.tile_lookup for tile in tile_range(lat_min, lon_min, lat_max, lon_max, self.tile_size))
+
+    def way_positions(self, lat_min, lon_min, lat_max, lon_max):
+        """Returns the sorted store positions of ways whose bounds intersect the bounding box."""
+        positions = set()
+        for tile in tile_range(lat_min, lon_min, lat_max, lon_max, self.tile_size):
+            i = self.tile_lookup.get(tile)
+            if i is not None:
+                positions.update(self.tile_positions[self.tile_offsets[i]:self.tile_offsets[i + 1]].tolist())
+
+        positions = np.array(sorted(positions), dtype=np.int64)
+        if len(positions) == 0:
+            return positions
+        b = self.bounds[positions]
+        intersects = (b[:, 0] <= lat_max) & (b[:, 2] >= lat_min) & (b[:, 1] <= lon_max) & (b[:, 3] >= lon_min)
+        return positions[intersects]
+
+    def element(self, position):
+        """Rebuilds the Overpass way element stored at a position."""
+        minlat, minlon, maxlat, maxlon = self.bounds[position].tolist()
+        start, end = self.geometry_offsets[position], self.geometry_offsets[position + 1]
+        node_start, node_end = self.node_offsets[position], self.node_offsets[position + 1]
+
+        tags = {"highway": self.highway_types[self.highway[position]]}
+        name = self.names[self.name_ids[position]]
+        maxspeed = self.maxspeeds[self.maxspeed_ids[position]]
+        if name is not None:
+            tags["name"] = name
+        if maxspeed is not None:
+            tags["maxspeed"] = maxspeed
+
+        return {
+            "type": "way",
+            "id": int(self.way_ids[position]),
+            "bounds": {"minlat": minlat, "minlon": minlon, "maxlat": maxlat, "maxlon": maxlon},
+            "nodes": self.nodes[node_start:node_end].tolist(),
+            "geometry": [{"lat": lat, "lon": lon} for lat, lon in self.geometry[start:end].tolist()],
+            "tags": tags,
+        }
+
+    def get_road_segments(self, lat_min, lon_min, lat_max, lon_max):
+        """
+        Road segments within a bounding box, read from the store instead of Overpass.
+
+        :return: List of way elements in the shape of the Overpass response "elements".
+        """
+        return [self.element(position) for position in self.way_positions(lat_min, lon_min, lat_max, lon_max)]
+
+
+if __name__ == "__main__":
+    ways_count, tiles_count = build_tile_store([("./Data_Source_JSON/osm_speed_response_data.json", OSM_SPEED_RESPONSE_BBOX)])
+    print(f"Built road tile store with {ways_count} ways over {tiles_count} tiles")
@@ -0,0 +1,112 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+from decimal import Decimal
+
+SEGMENT_CACHE_BUDGET_BYTES = 32 * 1024 * 1024
+SEGMENT_CACHE_TTL_SECONDS = 24 * 3600 # Cached records are read again after this long
+
+
+def item_size(item):
+    """
+    Approximate DynamoDB item size in bytes: attribute names plus values, with
+    numbers stored as roughly one byte per two significant digits.
+    """
+    size = 0
+    for name, value in item.items():
+        size += len(name.encode())
+        if isinstance(value, (int, float, Decimal)) and not isinstance(value, bool):
+            size += len(str(value).lstrip("-").replace(".", "")) // 2 + 1
+        else:
+            size += len(str(value).encode())
+    return size
+
+
+def read_units(item):
+    """Read capacity units of an eventually consistent read of the item, as used by batch_get_item."""
+    return 0.5 * math.ceil(item_size(item) / 4096)
+
+
+class SegmentCache:
+    """
+    Read-through cache of drivenDB_road_segment_info records keyed by road_segment_id.
+
+    Sits between the resolve loop and DynamoDB: cached records are served from
+    memory, the rest are read with one batch_get_items call. Records expire
+    SEGMENT_CACHE_TTL_SECONDS after they are cached, the least recently used are
+    evicted past the memory budget, and new records are written through. A record
+    is never replaced by one with an older updated_at.
+    """
+
+    def __init__(self, load_many, budget_bytes=SEGMENT_CACHE_BUDGET_BYTES, ttl_seconds=SEGMENT_CACHE_TTL_SECONDS):
+        """
+        :param load_many: Callable taking a list of road_segment_ids and returning a dict
+                          road_segment_id -> item for the records that exist.
+        """
+        self.load_many = load_many
+        self.budget_bytes = budget_bytes
+        self.ttl_seconds = ttl_seconds
+        self.items = OrderedDict() # road_segment_id -> (item, size, expires_at, updated_at)
+        self.size_bytes = 0
+        self.lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.read_units_saved = 0.0
+
+    def hit_ratio(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def put(self, item):
+        segment_id = item["road_segment_id"]
+        size = item_size(item)
+        updated_at = int(item.get("updated_at", 0))
+
+        with self.lock:
+            cached = self.items.get(segment_id)
+            if cached is not None:
+                if cached[3] > updated_at: # Keep the newer record
+                    return
+                self.size_bytes -= self.items.pop(segment_id)[1]
+            self.items[segment_id] = (item, size, time.time() + self.ttl_seconds, updated_at)
+            self.size_bytes += size
+
+            while self.size_bytes > self.budget_bytes and self.items:
+                evicted_size = self.items.popitem(last=False)[1][1]
+                self.size_bytes -= evicted_size
+
+    def put_many(self, items):
+        """Write-through: record items just written to DynamoDB."""
+        for item in items:
+            self.put(item)
+
+    def get_many(self, segment_ids):
+        """
+        :param segment_ids: List of road_segment_ids.
+        :return: Dict road_segment_id -> item for every record that exists.
+        """
+        results = {}
+        missing = []
+        now = time.time()
+
+        with self.lock:
+            for segment_id in segment_ids:
+                cached = self.items.get(segment_id)
+                if cached is not None and cached[2] > now:
+                    self.items.move_to_end(segment_id)
+                    results[segment_id] = cached[0]
+                    self.read_units_saved += read_units(cached[0])
+                else:
+                    missing.append(segment_id)
+            self.hits += len(results)
+            self.misses += len(missing)
+
+        if missing:
+            loaded = self.load_many(missing)
+            self.put_many(loaded.values())
+            results.update(loaded)
+        return results
@@ -0,0 +1,191 @@
+import re
+from collections import defaultdict
+import numpy as np
+from road_geometry import point_to_segment_distances
+
+UNKNOWN_SPEED_LIMIT = "Unknown"
+
+
+def extract_float(value: str) -> float:
+    """
+    Extracts the numeric value from a string and converts it to a float.
+
+    :param value: A string containing a number with possible text.
+    :return: The extracted number as a float.
+    """
+    match = re.search(r"\d+\.?\d*", value)
+    return float(match.group()) if match else None
+
+
+class SegmentTable:
+    """
+    Columnar table of Overpass road segments, built once per trip or tile.
+
+    Each way is one row position across parallel arrays: way id (int64), OSM speed
+    limit in mph (float64, NaN when it is not a parsed "NN mph" tag), highway type
+    and name as small ids into interned string lists, bounds, and its geometry as a
+    slice of one flat (lat, lon) buffer given by offsets. maxspeed is parsed once
+    here instead of on every distance check, and distances to many ways are measured
+    in a single vectorized call.
+    """
+
+    def __init__(self, elements):
+        """
+        :param elements: List of Overpass way elements with tags, geometry, bounds and nodes.
+        """
+        count = len(elements)
+        self.ids = np.empty(count, dtype=np.int64)
+        self.speed_limits = np.full(count, np.nan, dtype=np.float64) # float64 so records keep the tag's exact value
+        self.unparsed_speed_limits = {} # position -> maxspeed tag that is not "NN mph"
+        self.highway_codes = np.empty(count, dtype=np.uint8)
+        self.name_ids = np.empty(count, dtype=np.int32)
+        self.bounds = np.empty((count, 4), dtype=np.float64) # minlat, minlon, maxlat, maxlon
+        self.offsets = np.zeros(count + 1, dtype=np.int64)
+
+        self.highway_types = []
+        self.names = []
+        highway_codes = {}
+        name_ids = {}
+        coords = []
+        node_ids = []
+        self.node_offsets = np.zeros(count + 1, dtype=np.int64)
+
+        for position, element in enumerate(elements):
+            tags = element.get("tags", {})
+            self.ids[position] = element["id"]
+
+            speed_limit = tags.get("maxspeed", UNKNOWN_SPEED_LIMIT)
+            if "mph" in speed_limit and extract_float(speed_limit) is not None:
+                self.speed_limits[position] = extract_float(speed_limit)
+            elif speed_limit != UNKNOWN_SPEED_LIMIT:
+                self.unparsed_speed_limits[position] = extract_float(speed_limit) if "mph" in speed_limit else speed_limit
+
+            highway = tags.get("highway", "Unknown")
+            self.highway_codes[position] = highway_codes.setdefault(highway, len(highway_codes))
+            name = tags.get("name", "Unnamed Road")
+            self.name_ids[position] = name_ids.setdefault(name, len(name_ids))
+
+            b = element["bounds"]
+            self.bounds[position] = (b["minlat"], b["minlon"], b["maxlat"], b["maxlon"])
+            geometry = element.get("geometry", [])
+            coords.extend((point["lat"], point["lon"]) for point in geometry)
+            self.offsets[position + 1] = self.offsets[position] + len(geometry)
+            nodes = element.get("nodes", [])
+            node_ids.extend(nodes)
+            self.node_offsets[position + 1] = self.node_offsets[position] + len(nodes)
+
+        self.highway_types = list(highway_codes)
+        self.names = list(name_ids)
+        self.coords = np.array(coords, dtype=np.float64).reshape(-1, 2)
+        self.node_ids = np.array(node_ids, dtype=np.int64)
+        self.position_by_id = {int(way_id): position for position, way_id in enumerate(self.ids)}
+
+        # Segment j runs from vertex j to j + 1, skipping the gap between consecutive ways
+        vertex_counts = np.diff(self.offsets)
+        self.segment_offsets = np.concatenate(([0], np.cumsum(np.maximum(vertex_counts - 1, 0))))
+        is_last_vertex = np.zeros(len(self.coords), dtype=bool)
+        is_last_vertex[self.offsets[1:][vertex_counts > 0] - 1] = True
+        self.segment_starts = np.flatnonzero(~is_last_vertex)
+
+        # Envelope (min_lon, min_lat, max_lon, max_lat) of each way's vertices, NaN for ways without any
+        self.envelopes = np.full((count, 4), np.nan)
+        has_vertices = vertex_counts > 0
+        if has_vertices.any():
+            first_vertices = self.offsets[:-1][has_vertices]
+            self.envelopes[has_vertices] = np.column_stack((
+                np.minimum.reduceat(self.coords[:, 1], first_vertices),
+                np.minimum.reduceat(self.coords[:, 0], first_vertices),
+                np.maximum.reduceat(self.coords[:, 1], first_vertices),
+                np.maximum.reduceat(self.coords[:, 0], first_vertices),
+            ))
+
+        self.geometries = {} # position -> geometry dicts, built for matched ways only
+        self.positions_by_node = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def way_coords(self, position):
+        """View (M, 2) of a way's (lat, lon) vertices."""
+        return self.coords[self.offsets[position]:self.offsets[position + 1]]
+
+    def vertex_counts(self, positions):
+        positions = np.asarray(positions, dtype=np.int64)
+        return self.offsets[positions + 1] - self.offsets[positions]
+
+    def osm_speed_limit(self, position):
+        """Speed limit in the form the pipeline has always used: mph float, the raw tag, or "Unknown"."""
+        speed_limit = self.speed_limits[position]
+        if not np.isnan(speed_limit):
+            return float(speed_limit)
+        return self.unparsed_speed_limits.get(position, UNKNOWN_SPEED_LIMIT)
+
+    def geometry(self, position):
+        geometry = self.geometries.get(position)
+        if geometry is None:
+            geometry = [{"lat": lat, "lon": lon} for lat, lon in self.way_coords(position).tolist()]
+            self.geometries[position] = geometry
+        return geometry
+
+    def road(self, position, distance_meters=None):
+        """
+        Road segment dict of one way, in the shape used by the resolver and the output stage.
+
+        :param distance_meters: Distance from the matched point, if any.
+        """
+        minlat, minlon, maxlat, maxlon = self.bounds[position].tolist()
+        return {
+            "id": int(self.ids[position]),
+            "road_name": self.names[self.name_ids[position]],
+            "road_type": self.highway_types[self.highway_codes[position]],
+            "osm_speed_limit": self.osm_speed_limit(position),
+            "distance_meters": distance_meters,
+            "geometry": self.geometry(position),
+            "bounds": {"minlat": minlat, "minlon": minlon, "maxlat": maxlat, "maxlon": maxlon},
+            "mapillary_speed_limit": -1.0,
+            "mapquest_speed_limit": -1.0
+        }
+
+    def neighbours(self, position):
+        """Positions of the way and of every way sharing a node with it."""
+        if self.positions_by_node is None:
+            self.positions_by_node = defaultdict(list)
+            node_positions = np.repeat(np.arange(len(self)), np.diff(self.node_offsets))
+            for node_id, p in zip(self.node_ids.tolist(), node_positions.tolist()):
+                self.positions_by_node[node_id].append(p)
+
+        positions = {position}
+        for node_id in self.node_ids[self.node_offsets[position]:self.node_offsets[position + 1]].tolist():
+            positions.update(self.positions_by_node[node_id])
+        return positions
+
+    def distances(self, user_coords, positions, projection=None):
+        """
+        Minimum distance in meters from a point to each of many ways, in one vectorized pass.
+
+        Runs road_geometry.point_to_segment_distances over the segments of all
+        the ways at once.
+
+        :param user_coords: Tuple (latitude, longitude).
+        :param positions: Array of way positions.
+        :param projection: LocalProjection of the trip in "planar" mode, None for geodesic.
+        :return: Array of distances aligned with positions, inf for ways with fewer than 2 vertices.
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        segment_counts = self.segment_offsets[positions + 1] - self.segment_offsets[positions]
+        result = np.full(len(positions), np.inf)
+        total = int(segment_counts.sum())
+        if not total:
+            return result
+
+        # Segment ids of every way, way after way
+        group_starts = np.cumsum(segment_counts) - segment_counts
+        segments = np.repeat(self.segment_offsets[positions] - group_starts, segment_counts) + np.arange(total)
+
+        starts = self.coords[self.segment_starts[segments]]
+        ends = self.coords[self.segment_starts[segments] + 1]
+        segment_distances, _ = point_to_segment_distances([user_coords], starts, ends, projection)
+
+        has_segments = segment_counts > 0
+        result[has_segments] = np.minimum.reduceat(segment_distances[0], group_starts[has_segments])
+        return result
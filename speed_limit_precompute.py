@@ -0,0 +1,172 @@
+import json
+import math
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from mapillary_tiles import MAPILLARY_TILE_SIZE_DEGREES
+from road_segment_index import SpeedSignIndex
+from road_tile_store import tile_range
+from segment_table import SegmentTable
+
+PRECOMPUTE_PROGRESS_PATH = "./precompute_progress.jsonl"
+PRECOMPUTE_TILE_SIZE_DEGREES = MAPILLARY_TILE_SIZE_DEGREES # Same tiles as the Mapillary cache, so each tile's signs are fetched once
+PRECOMPUTE_WORKERS = 4
+
+# OSM highway values a car can be driven on
+DRIVABLE_HIGHWAY_TYPES = frozenset({
+    "motorway", "motorway_link", "trunk", "trunk_link", "primary", "primary_link",
+    "secondary", "secondary_link", "tertiary", "tertiary_link", "unclassified",
+    "residential", "living_street", "service", "road",
+})
+
+
+def region_tiles(lat_min, lon_min, lat_max, lon_max, tile_size=PRECOMPUTE_TILE_SIZE_DEGREES):
+    """Tiles of a region given as a bounding box."""
+    return tile_range(lat_min, lon_min, lat_max, lon_max, tile_size)
+
+
+def load_completed_tiles(progress_path=PRECOMPUTE_PROGRESS_PATH):
+    """
+    Tiles whose speed limits have been precomputed.
+
+    :return: Set of (row, col) tiles, empty if the job has never run here.
+    """
+    tiles = set()
+    try:
+        with open(progress_path, "r") as file:
+            for line in file:
+                try:
+                    tiles.add(tuple(json.loads(line)["tile"]))
+                except (json.JSONDecodeError, KeyError): # Line cut short by an interrupted run
+                    continue
+    except FileNotFoundError:
+        pass
+    return tiles
+
+
+class RegionPrecomputer:
+    """
+    Offline job resolving the speed limit of every drivable way in a region.
+
+    The region is split into tiles processed in parallel. A way belongs to the tile
+    holding its middle vertex, so ways crossing tile borders are resolved once.
+    Ways that already have a segment record are skipped, the rest go through the
+    same OSM, Mapillary, MapQuest cascade as the trip loop and are bulk-written to
+    the segment store. Each finished tile is appended to the progress file, so an
+    interrupted run picks up where it stopped. Trips through finished tiles find
+    every segment already resolved.
+    """
+
+    def __init__(self, load_cells, sign_cache, resolver, segment_store, write,
+                 cell_size, progress_path=PRECOMPUTE_PROGRESS_PATH, tile_size=PRECOMPUTE_TILE_SIZE_DEGREES):
+        """
+        :param load_cells: Callable taking a list of road cells and returning a dict cell -> way elements,
+                           e.g. load_corridor_road_segments.
+        :param sign_cache: MapillarySignCache with the same tile size.
+        :param resolver: SpeedLimitResolver.
+        :param segment_store: SegmentCache used to skip ways that already have a record.
+        :param write: Callable writing a list of PutRequests to drivenDB_road_segment_info and returning
+                      the ones that failed, e.g. BulkClient.batch_write.
+        :param cell_size: Cell size of load_cells in degrees.
+        """
+        self.load_cells = load_cells
+        self.sign_cache = sign_cache
+        self.resolver = resolver
+        self.segment_store = segment_store
+        self.write = write
+        self.cell_size = cell_size
+        self.progress_path = progress_path
+        self.tile_size = tile_size
+        self.lock = threading.Lock() # Tiles finish on worker threads
+
+    def tile_of(self, lat, lon):
+        return math.floor(lat / self.tile_size), math.floor(lon / self.tile_size)
+
+    def owned_roads(self, tile, elements):
+        """Drivable ways whose middle vertex lies in the tile, keyed by road_segment_id."""
+        road_table = SegmentTable([
+            element for element in elements
+            if element.get("tags", {}).get("highway") in DRIVABLE_HIGHWAY_TYPES and element.get("geometry")
+        ])
+        roads = {}
+        for position in range(len(road_table)):
+            way_coords = road_table.way_coords(position)
+            middle_lat, middle_lon = way_coords[len(way_coords) // 2]
+            if self.tile_of(middle_lat, middle_lon) == tile:
+                roads[str(road_table.ids[position])] = road_table.road(position)
+        return roads
+
+    def mark_done(self, tile, record_count):
+        with self.lock:
+            with open(self.progress_path, "a") as file:
+                file.write(json.dumps({"tile": list(tile), "records": record_count}) + "\n")
+
+    def run_tile(self, tile):
+        """
+        Resolve and write every new way of one tile.
+
+        :return: Number of records written.
+        """
+        row, col = tile
+        lat_min, lon_min = row * self.tile_size, col * self.tile_size
+        # Shrink by a hair so the tile's upper edges don't pull in the next row and column of cells
+        epsilon = self.tile_size * 1e-9
+        cells = tile_range(lat_min, lon_min, lat_min + self.tile_size - epsilon, lon_min + self.tile_size - epsilon, self.cell_size)
+
+        cell_elements = self.load_cells(cells)
+        if len(cell_elements) < len(cells):
+            raise RuntimeError(f"Roads of {len(cells) - len(cell_elements)} cells could not be loaded")
+
+        elements = {element["id"]: element for cell in cells for element in cell_elements[cell]}
+        roads = self.owned_roads(tile, elements.values())
+        existing = self.segment_store.get_many(list(roads))
+        new_roads = {segment_id: road for segment_id, road in roads.items() if segment_id not in existing}
+
+        if new_roads:
+            # Signs can sit on any tile a way runs through, not just the one that owns it
+            sign_tiles = set()
+            for road in new_roads.values():
+                b = road["bounds"]
+                sign_tiles.update(tile_range(b["minlat"], b["minlon"], b["maxlat"], b["maxlon"], self.sign_cache.tile_size))
+            speed_signs = {}
+            for sign_tile in sorted(sign_tiles):
+                for sign in self.sign_cache.load_or_fetch(sign_tile):
+                    speed_signs.setdefault(sign["id"], sign)
+            speed_signs = list(speed_signs.values())
+
+            records, _ = self.resolver.resolve(new_roads, speed_signs, SpeedSignIndex(speed_signs), resolved_by="precompute")
+            if records:
+                failed = self.write([{"PutRequest": {"Item": record}} for record in records])
+                if failed:
+                    raise RuntimeError(f"{len(failed)} segment records could not be written")
+                self.segment_store.put_many(records)
+            if len(records) < len(new_roads):
+                raise RuntimeError(f"{len(new_roads) - len(records)} ways could not be resolved")
+        else:
+            records = []
+
+        self.mark_done(tile, len(records))
+        return len(records)
+
+    def run(self, tiles, workers=PRECOMPUTE_WORKERS):
+        """
+        Precompute every tile not finished by an earlier run.
+
+        :param tiles: List of (row, col) tiles, e.g. from region_tiles.
+        :return: Number of records written.
+        """
+        completed = load_completed_tiles(self.progress_path)
+        pending = [tile for tile in tiles if tile not in completed]
+        print(f"Precomputing {len(pending)} tiles, {len(tiles) - len(pending)} already done")
+
+        def run_one(tile):
+            try:
+                return self.run_tile(tile)
+            except Exception as e: # Left out of the progress file, so the next run retries it
+                print(f"Tile {tile} failed: {e}")
+                return 0
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="precompute") as executor:
+            record_counts = list(executor.map(run_one, pending))
+
+        print(f"Wrote {sum(record_counts)} segment records for {len(pending)} tiles")
+        return sum(record_counts)
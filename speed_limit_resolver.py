@@ -0,0 +1,97 @@
+import time
+from decimal import Decimal
+import http_pool
+
+
+class SpeedLimitResolver:
+    """
+    Resolves the speed limit of new road segments through the OSM tag, then the
+    nearest Mapillary sign, then MapQuest, and builds their drivenDB_road_segment_info
+    records. Every record notes which source its speed limit came from
+    (speed_limit_source) and what resolved it (resolved_by).
+    """
+
+    def __init__(self, map_signs, mapquest_lookup):
+        """
+        :param map_signs: Callable (road, speed_signs, sign_index) returning the road with its
+                          "mapillary_speed_signs", e.g. map_speed_sign_to_nearest_road.
+        :param mapquest_lookup: Callable (segment_id, coord) returning the speed limit, "Unknown",
+                                or an error message, e.g. MapQuestCache.get_speed_limit.
+        """
+        self.map_signs = map_signs
+        self.mapquest_lookup = mapquest_lookup
+
+    def resolve(self, roads, speed_signs, sign_index=None, resolved_by="trip"):
+        """
+        Resolve every road and fill in its speed limits for printing.
+
+        :param roads: Dict road_segment_id -> road, as built by SegmentTable.road.
+        :param speed_signs: Mapillary speed limit signs around the roads.
+        :param sign_index: SpeedSignIndex over speed_signs.
+        :param resolved_by: Provenance, "trip" or "precompute".
+        :return: List of records to write, number of roads without an OSM speed limit.
+                 Roads whose MapQuest lookup failed get no record, so they are resolved again later.
+        """
+        records = []
+        segments_with_unknown_speeds = 0
+        updated_at_timestamp = int(time.time())
+
+        # Roads still unknown after OSM and Mapillary, looked up on MapQuest concurrently below
+        mapquest_lookups = []
+
+        for segment_id, road in roads.items():
+            speed_limit = road['osm_speed_limit']
+            road_segment_info = {
+                "road_segment_id": segment_id,
+                "osm_road_name": road['road_name'],
+                "osm_road_type": road['road_type'],
+                "osm_speed_limit": Decimal(str(speed_limit)) if isinstance(speed_limit, (int, float)) else speed_limit,
+                "mapillary_speed_limit": Decimal(0),
+                "mapquest_speed_limit": Decimal(0),
+                "avg_contextual_speed_30_day": Decimal(0),
+                "avg_contextual_speed_60_day": Decimal(0),
+                "avg_contextual_speed_180_day": Decimal(0),
+                "speed_limit_source": "osm",
+                "resolved_by": resolved_by,
+                "updated_at": updated_at_timestamp
+            }
+            records.append(road_segment_info)
+
+            if speed_limit != "Unknown":
+                continue
+
+            # Speed Limit from OSM is not present
+            road['osm_speed_limit'] = 0
+            road_segment_info['osm_speed_limit'] = Decimal(0)
+            segments_with_unknown_speeds += 1
+
+            # Check Mapillary
+            segment_with_mapillary_speed = self.map_signs(road, speed_signs, sign_index)
+            if len(segment_with_mapillary_speed['mapillary_speed_signs']) > 0: # speed sign mapped to road
+                speed_limit = segment_with_mapillary_speed['mapillary_speed_signs'][0]['speed_limit']
+                road['mapillary_speed_limit'] = speed_limit  # for printing to console
+                road_segment_info['mapillary_speed_limit'] = Decimal(speed_limit)
+                road_segment_info['speed_limit_source'] = "mapillary"
+            else:
+                # Call MapQuest if still unknown
+                mid_index = len(road['geometry']) // 2  # Get the middle index
+                middle_road_coord = (road['geometry'][mid_index]['lat'], road['geometry'][mid_index]['lon'])
+                mapquest_lookups.append((road, road_segment_info, middle_road_coord))
+
+        mapquest_speed_limits = http_pool.map_concurrent(
+            lambda lookup: self.mapquest_lookup(lookup[1]["road_segment_id"], lookup[2]), mapquest_lookups
+        )
+        failed_segment_ids = set()
+        for (road, road_segment_info, _), speed_limit in zip(mapquest_lookups, mapquest_speed_limits):
+            road['mapquest_speed_limit'] = speed_limit  # for printing to console
+            if isinstance(speed_limit, (int, float)):
+                road_segment_info['mapquest_speed_limit'] = Decimal(speed_limit)
+                road_segment_info['speed_limit_source'] = "mapquest" if speed_limit > 0 else "none"
+            elif speed_limit in ("Unknown", None):
+                road_segment_info['speed_limit_source'] = "none"
+            else:
+                print(f"MapQuest lookup for segment {road_segment_info['road_segment_id']} failed: {speed_limit}")
+                failed_segment_ids.add(road_segment_info['road_segment_id'])
+
+        records = [record for record in records if record['road_segment_id'] not in failed_segment_ids]
+        return records, segments_with_unknown_speeds
@@ -1,15 +1,27 @@
-from datetime import datetime, timezone
+from datetime import datetime
 import requests
-import re
-import json
 import time
-import pandas as pd
-from geopy.distance import geodesic
-from shapely.geometry import Point, LineString
-from shapely.ops import nearest_points
-import boto3
+import numpy as np
+import http_pool
+from dynamodb_bulk import TABLE_KEYS, BulkClient, DynamoDBBackend
+from local_store import LOCAL_STORE_PATH, SQLiteBackend, TieredBackend
 from decimal import Decimal
+from driven_speeding_definition import road_statistics, speeding_event_bounds, trip_steps
 from collections import defaultdict
+from corridor_planner import corridor_cells, rectangle_bbox, road_segments_in_cells
+from mapillary_tiles import MapillarySignCache
+from mapquest_cache import MapQuestCache
+from overpass_cache import OverpassCache
+from road_geometry import LocalProjection, point_to_polyline_distances
+from road_matching import IncrementalRoadMatcher
+from road_segment_index import RoadSegmentIndex, SpeedSignIndex
+from road_tile_store import ROAD_TILE_STORE_DIR, RoadTileStore
+from segment_cache import SegmentCache
+from speed_limit_precompute import PRECOMPUTE_WORKERS, RegionPrecomputer, load_completed_tiles, region_tiles
+from segment_table import SegmentTable
+from trip_loader import SPEED_DATA_DTYPE, TripResult, load_trip, trip_columns
+from speed_limit_resolver import SpeedLimitResolver
+from write_behind import WriteBehindBuffer
 
 
 # API Credentials
@@ -17,59 +29,60 @@ MAPILLARY_ACCESS_TOKEN = ""
 MAPQUEST_API_KEY = ""
 # OVERPASS_URL = ""
 DRIVEN_OVERPASS_URL = ""
-BATCH_SIZE = 20 # OSM Calls
-DB_BATCH_SIZE = 25 # DB Calls
-
-# Initialize the DynamoDB client
-dynamodb = boto3.resource('dynamodb')
-# table = dynamodb.Table('drivenDB_road_segment_info')
+BATCH_SIZE = 20 # Points matched against the same set of roads
+NEAREST_ROAD_SEARCH_RADIUS = 50 # Meters, roads farther than this fall back to a full scan
+DISTANCE_MODE = "geodesic" # "geodesic" (mean-latitude ellipsoidal approximation, about 1e-3 m off at 5 km and 1 m at 50 km) or "planar" (local projection around the trip)
+SEGMENT_STORE = "tiered" # "dynamodb", "local" (SQLite only, no AWS) or "tiered" (SQLite in front of DynamoDB)
+SPEED_DATA_PATH = "speed_data.txt" # Enriched trip read by driven_speeding_definition.py
+
+def create_storage_backend(mode):
+    if mode == "dynamodb":
+        return DynamoDBBackend()
+    if mode == "local":
+        return SQLiteBackend(LOCAL_STORE_PATH)
+    if mode == "tiered":
+        return TieredBackend(SQLiteBackend(LOCAL_STORE_PATH), DynamoDBBackend())
+    raise ValueError(f"Unknown SEGMENT_STORE: {mode}")
+
+# Bulk table access: max batch sizes, parallel batches, retries of unprocessed keys/items
+bulk_db = BulkClient(create_storage_backend(SEGMENT_STORE))
 
 # Function to batch fetch items from DynamoDB
 def batch_get_items(keys):
-    results = {}
-    for batch in (keys[i : i + BATCH_SIZE] for i in range(0, len(keys), BATCH_SIZE)):
-        response = dynamodb.batch_get_item(
-            RequestItems={
-                'drivenDB_road_segment_info': {
-                    'Keys': [{'road_segment_id': segment_id} for segment_id in batch]
-                }
-            }
-        )
-        items = response.get('Responses', {}).get('drivenDB_road_segment_info', [])
-        results.update({item['road_segment_id']: item for item in items})
-    return results
+    return bulk_db.batch_get('drivenDB_road_segment_info', 'road_segment_id', keys)
 
-def batch_write_all(table_name, items, batch_size=DB_BATCH_SIZE):
-    for i in range(0, len(items), batch_size):
-        batch = items[i:i + batch_size]  
-        request_items = {table_name: batch}
+# Segment records shared by every trip processed in this run, read through from DynamoDB
+segment_cache = SegmentCache(batch_get_items)
 
-        dynamodb.batch_write_item(RequestItems=request_items)
-        # response = dynamodb.batch_write_item(RequestItems=request_items)
+def batch_write_all(table_name, items):
+    return bulk_db.batch_write(table_name, items)
 
-        # while 'UnprocessedItems' in response and response['UnprocessedItems']:
-        #     unprocessed = response['UnprocessedItems'].get(table_name, [])
-        #     if unprocessed:
-        #         print(f"Retrying {len(unprocessed)} unprocessed items...")
-        #         response = dynamodb.batch_write_item(RequestItems={table_name: unprocessed})
+# Speeding events from every trip are written in the background. Whoever runs trips drains it once they
+# are done, by running them inside "with speeding_events_writer:" or calling speeding_events_writer.close()
+speeding_events_writer = WriteBehindBuffer(
+    lambda items: batch_write_all("users_speeding_events", items), TABLE_KEYS["users_speeding_events"],
+)
 
-def write_speed_data_to_file(file_path, lat, lon, distracted, traveling_speed,
-                            osm_speed_limit, mapillary_speed_limit, mapquest_speed_limit, highway_type, timestamp):
-
-    speed_limit_sources = [osm_speed_limit, mapillary_speed_limit, mapquest_speed_limit]
-    valid_speed_limit = next((speed_limit for speed_limit in speed_limit_sources if speed_limit != 0), 0)  
+def speed_data_line(lat, lon, distracted, traveling_speed, valid_speed_limit, highway_type, timestamp):
+    return f"{lat},{lon},{distracted},{traveling_speed},{valid_speed_limit},{highway_type},{timestamp}|\n"
 
+def write_speed_data_to_file(file_path, lines):
+    # One open per trip, not per point
     with open(file_path, "a") as file:
-        file.write(
-            f"{lat},{lon},{distracted},{traveling_speed},{valid_speed_limit},{highway_type},{timestamp}|\n"
-        )
+        file.writelines(lines)
 
-def count_segment_occurrences(geocode_to_segment):
+def speed_limit_value(speed_limit):
+    """Speed limit as a float for the speed data arrays, 0 (unknown) for a tag that isn't a number."""
+    try:
+        return float(speed_limit)
+    except (TypeError, ValueError):
+        return 0.0
+
+def count_segment_occurrences(segment_ids):
     segment_count = defaultdict(int)
 
-    # Count occurrences of each segment_id
-    for value in geocode_to_segment.values():
-        segment_id = value["segment_id"]
+    # Count occurrences of each segment_id, one per matched point
+    for segment_id in segment_ids:
         segment_count[segment_id] += 1
     
     # print(segment_count)
@@ -88,42 +101,55 @@ def convert_timestamp(timestamp):
 def convert_to_lat_lon(coords):
     return [(entry['lat'], entry['lon']) for entry in coords]
 
-def extract_float(value: str) -> float:
-    """
-    Extracts the numeric value from a string and converts it to a float.
-    
-    :param value: A string containing a number with possible text.
-    :return: The extracted number as a float.
-    """
-    match = re.search(r"\d+\.?\d*", value)
-    return float(match.group()) if match else None
-
 def get_bounding_box(points):
     latitudes = [p[0] for p in points]
     longitudes = [p[1] for p in points]
     return min(latitudes), max(latitudes), min(longitudes), max(longitudes)
 
-# Function to query Overpass API for road segments within bounding box
-def get_road_segments(lat_min, lon_min, lat_max, lon_max):
+# Function to query Overpass API for road segments within a union of bounding boxes, None if the request failed
+def get_road_segments(bboxes):
+    ways = "".join(f"way({lat_min},{lon_min},{lat_max},{lon_max})[highway];" for lat_min, lon_min, lat_max, lon_max in bboxes)
     query = f"""
     [out:json];
-    way({lat_min},{lon_min},{lat_max},{lon_max})[highway];
+    ({ways});
     out geom;
     """
-    response = requests.get(DRIVEN_OVERPASS_URL, params={"data": query})
+    response = http_pool.get(DRIVEN_OVERPASS_URL, params={"data": query})
     
     if response.status_code == 200:
         if not response.text.strip():  # Check if response is empty
             print("Error: Received empty response from Overpass API")
-            return []
+            return None
         try:
             return response.json().get("elements", [])
         except requests.exceptions.JSONDecodeError:
             print(f"Error decoding JSON: {response.text}")
-            return []
+            return None
     else:
         print(f"Error fetching data: {response.status_code}, {response.text}")
-        return []
+        return None
+
+# Overpass responses cached by grid cell, shared by every trip processed in this run
+overpass_cache = OverpassCache(get_road_segments)
+
+def load_corridor_road_segments(cells, tile_store):
+    """
+    Fetch the road segments of every corridor cell, from the tile store where it is cached,
+    otherwise through the Overpass cache with as few union queries as possible.
+
+    :return: Dict (row, col) -> road segments, number of cells read from the tile store.
+    """
+    cell_elements = {}
+    uncached_cells = []
+    for cell in cells:
+        cell_bbox = rectangle_bbox((cell[0], cell[0], cell[1], cell[1]), overpass_cache.cell_size)
+        if tile_store is not None and tile_store.covers(*cell_bbox):
+            cell_elements[cell] = tile_store.get_road_segments(*cell_bbox)
+        else:
+            uncached_cells.append(cell)
+
+    cell_elements.update(overpass_cache.get_cells(uncached_cells))
+    return cell_elements, len(cells) - len(uncached_cells)
 
 def get_unknown_speed_road_segments(road_segments):
     unknown_speed_road_segments = []
@@ -143,161 +169,157 @@ def parse_mapillary_speed_limit(object_value):
     except ValueError:
         return None
 
-# Function to get speed limits from Mapillary within bounding box
+# Function to get speed limits from Mapillary within bounding box, following every page, None if a request failed
 def get_mapillary_speed_limits(lat_min, lon_min, lat_max, lon_max):
     bbox = f"{lon_min},{lat_min},{lon_max},{lat_max}"
     url = f"https://graph.mapillary.com/map_features?access_token={MAPILLARY_ACCESS_TOKEN}&fields=id,object_value,geometry&bbox={bbox}&layers=trafficsigns"
+    speed_signs = []
 
     try:
-        response = requests.get(url)
-        if response.status_code == 200:
-            return [
-                item for item in response.json().get("data", [])
+        while url:
+            response = http_pool.get(url)
+            if response.status_code != 200:
+                print(f"Mapillary API Error: {response.status_code}, {response.text}")
+                return None
+            data = response.json()
+            speed_signs.extend(
+                item for item in data.get("data", [])
                 if "regulatory--maximum-speed-limit" in item.get("object_value", "")
-            ]
-        else:
-            print(f"Mapillary API Error: {response.status_code}, {response.text}")
-            return []
+            )
+            url = data.get("paging", {}).get("next")
+        return speed_signs
     except requests.RequestException as e:
         print(f"Mapillary API Request Failed: {e}")
-        return []
+        return None
+
+# Mapillary signs cached per tile along each trip's corridor
+mapillary_sign_cache = MapillarySignCache(get_mapillary_speed_limits)
 
 # Helper function to find distance between speed sign and road segment
-def calculate_distance_to_road_segment(sign_coords, road_coords):
+def calculate_distance_to_road_segment(sign_coords, road_coords, projection=None):
     """
     Calculate the minimum perpendicular distance from a speed limit sign to a road segment.
 
     :param sign_coords: Tuple (latitude, longitude) of the speed sign.
     :param road_coords: List of tuples [(lat1, lon1), (lat2, lon2), ...] representing the road segment.
+    :param projection: LocalProjection of the trip in "planar" mode, None for geodesic.
     :return: Minimum distance in meters.
     """
-    sign_location = Point(sign_coords[1], sign_coords[0])  # Convert to (lon, lat) for Shapely
-    min_distance = float('inf')
-
-    for i in range(len(road_coords) - 1):
-        segment = LineString([(road_coords[i][1], road_coords[i][0]), (road_coords[i+1][1], road_coords[i+1][0])])
-
-        nearest_point = nearest_points(segment, sign_location)[0]  
-        distance_meters = geodesic((sign_coords[0], sign_coords[1]), (nearest_point.y, nearest_point.x)).meters
+    distances, _ = point_to_polyline_distances([sign_coords], road_coords, projection)
+    return float(distances[0])
 
-        min_distance = min(min_distance, distance_meters)
+def find_speed_signs_near_road(road, speed_signs, projection=None, sign_index=None):
+    """
+    Finds the speed signs within 10 meters of a road segment and inside its bounds.
 
-    return min_distance
+    :param road: Road segment with geometry and bounds.
+    :param speed_signs: List of speed signs with latitude and longitude coordinates.
+    :param projection: LocalProjection of the trip in "planar" mode, None for geodesic.
+    :param sign_index: SpeedSignIndex over speed_signs, limits the distance checks to signs inside the road's bounds.
+    :return: List of tuples (sign, sign_coords, distance) for every matching sign.
+    """
+    minlat, maxlat = road['bounds']['minlat'], road['bounds']['maxlat']
+    minlon, maxlon = road['bounds']['minlon'], road['bounds']['maxlon']
+    if sign_index is not None:
+        speed_signs = sign_index.query(road['bounds'])
+    road_coords = [(point["lat"], point["lon"]) for point in road["geometry"]]
+    signs_coords = [(sign["geometry"]["coordinates"][1], sign["geometry"]["coordinates"][0]) for sign in speed_signs]  # (lat, lon)
+
+    # Distance from every sign to the road in one call
+    distances, _ = point_to_polyline_distances(signs_coords, road_coords, projection)
+
+    nearby_signs = []
+    for sign, sign_coords, distance in zip(speed_signs, signs_coords, distances):
+        if distance < 10 and minlat <= sign_coords[0] <= maxlat and minlon <= sign_coords[1] <= maxlon:  # Assign sign if within 10 meters
+            nearby_signs.append((sign, sign_coords, float(distance)))
+    return nearby_signs
 
-def map_speed_sign_to_nearest_road(nearest_road, speed_signs):
-    minlat, maxlat = nearest_road['bounds']['minlat'], nearest_road['bounds']['maxlat']
-    minlon, maxlon = nearest_road['bounds']['minlon'], nearest_road['bounds']['maxlon']
-    road_coords = [(point["lat"], point["lon"]) for point in nearest_road["geometry"]]
+def map_speed_sign_to_nearest_road(nearest_road, speed_signs, projection=None, sign_index=None):
     # Ensure road segment has a "speed_signs" field
     nearest_road.setdefault("mapillary_speed_signs", [])
 
-    for sign in speed_signs:
-        sign_coords = (sign["geometry"]["coordinates"][1], sign["geometry"]["coordinates"][0])  # (lat, lon)
-        distance = calculate_distance_to_road_segment(sign_coords, road_coords)
-
-        if distance < 10 and minlat <= sign_coords[0] <= maxlat and minlon <= sign_coords[1] <= maxlon:  # Assign sign if within 10 meters
-        # if distance < 20:  # Assign sign if within 10 meters
-            nearest_road["mapillary_speed_signs"].append(
-                {
-                    "sign_id": sign["id"],
-                    "object_value": sign["object_value"],
-                    "speed_limit": parse_mapillary_speed_limit(sign["object_value"]), 
-                    "sign_coords": sign_coords,
-                    "distance": distance
-                }
-            )
+    for sign, sign_coords, distance in find_speed_signs_near_road(nearest_road, speed_signs, projection, sign_index):
+        nearest_road["mapillary_speed_signs"].append(
+            {
+                "sign_id": sign["id"],
+                "object_value": sign["object_value"],
+                "speed_limit": parse_mapillary_speed_limit(sign["object_value"]), 
+                "sign_coords": sign_coords,
+                "distance": distance
+            }
+        )
 
     return nearest_road
 
-def map_speed_signs_to_unknown_segments(unknown_road_segments, speed_signs):
+def map_speed_signs_to_unknown_segments(unknown_road_segments, speed_signs, projection=None):
     """
     Assigns speed limit signs to the closest road segment if within a 10-meter threshold.
 
     :param unknown_road_segments: List of road segments with geometry data.
     :param speed_signs: List of speed signs with latitude and longitude coordinates.
+    :param projection: LocalProjection of the trip in "planar" mode, None for geodesic.
     :return: Updated unknown_road_segments with assigned speed signs.
     """
+    sign_index = SpeedSignIndex(speed_signs)
+
     for road in unknown_road_segments:
-        minlat, maxlat = road['bounds']['minlat'], road['bounds']['maxlat']
-        minlon, maxlon = road['bounds']['minlon'], road['bounds']['maxlon']
-        road_coords = [(point["lat"], point["lon"]) for point in road["geometry"]]
-        
         # Ensure road segment has a "speed_signs" field
         road.setdefault("mapillary_speed_signs", [])
 
-        for sign in speed_signs:
-            sign_coords = (sign["geometry"]["coordinates"][1], sign["geometry"]["coordinates"][0])  # (lat, lon)
-            distance = calculate_distance_to_road_segment(sign_coords, road_coords)
-
-            if distance < 10 and minlat <= sign_coords[0] <= maxlat and minlon <= sign_coords[1] <= maxlon:  # Assign sign if within 10 meters
-            # if distance < 20:  # Assign sign if within 10 meters
-                road["mapillary_speed_signs"].append(
-                    {
-                        "sign_id": sign["id"],
-                        "object_value": sign["object_value"],
-                        "speed_limit": parse_mapillary_speed_limit(sign["object_value"]), 
-                        "sign_coords": sign_coords,
-                        "distance": distance,
-                        "speed_service_used": "Mapillary"
-                    }
-                )
+        for sign, sign_coords, distance in find_speed_signs_near_road(road, speed_signs, projection, sign_index):
+            road["mapillary_speed_signs"].append(
+                {
+                    "sign_id": sign["id"],
+                    "object_value": sign["object_value"],
+                    "speed_limit": parse_mapillary_speed_limit(sign["object_value"]), 
+                    "sign_coords": sign_coords,
+                    "distance": distance,
+                    "speed_service_used": "Mapillary"
+                }
+            )
 
     return unknown_road_segments
 
 
 # Helper function to find distance between user and road segment
-def calculate_distance_user_to_road_segment(user_coords, road_coords):
+def calculate_distance_user_to_road_segment(user_coords, road_coords, projection=None):
     """
-    Calculate the minimum perpendicular distance from a speed limit sign to a road segment.
+    Calculate the minimum perpendicular distance from a user's GPS point to a road segment.
 
-    :param sign_coords: Tuple (latitude, longitude) of the speed sign.
+    :param user_coords: Tuple (latitude, longitude) of the user.
     :param road_coords: List of tuples [(lat1, lon1), (lat2, lon2), ...] representing the road segment.
+    :param projection: LocalProjection of the trip in "planar" mode, None for geodesic.
     :return: Minimum distance in meters.
     """
-    sign_location = Point(user_coords[1], user_coords[0])  # Convert to (lon, lat) for Shapely
-    min_distance = float('inf')
-
-    for i in range(len(road_coords) - 1):
-        segment = LineString([(road_coords[i][1], road_coords[i][0]), (road_coords[i+1][1], road_coords[i+1][0])])
-
-        # Convert degrees to meters using geopy
-        nearest_point = nearest_points(segment, sign_location)[0]  
-        distance_meters = geodesic((user_coords[0], user_coords[1]), (nearest_point.y, nearest_point.x)).meters
-
-        min_distance = min(min_distance, distance_meters)
-
-    return min_distance
+    distances, _ = point_to_polyline_distances([user_coords], road_coords, projection)
+    return float(distances[0])
 
 """
 Previous method has params: updated_road_segments
 """
-def find_nearest_road(user_coords, road_segments):
-    closest_road = None
-    min_distance = float("inf")
+def find_nearest_road(user_coords, road_table, positions, road_index=None, projection=None):
+    if road_index is not None:
+        # Only roads near the point can beat the search radius, if none do, scan every road
+        candidate_positions = road_index.query(user_coords, NEAREST_ROAD_SEARCH_RADIUS)
+        closest_road, min_distance = find_nearest_road_in(user_coords, road_table, candidate_positions, projection)
+        if min_distance <= NEAREST_ROAD_SEARCH_RADIUS:
+            return closest_road
+
+    closest_road, _ = find_nearest_road_in(user_coords, road_table, positions, projection)
+    return closest_road
 
-    for road in road_segments:
-        road_coords = road_coords = [(point["lat"], point["lon"]) for point in road["geometry"]]
-        distance = calculate_distance_user_to_road_segment(user_coords, road_coords)
+def find_nearest_road_in(user_coords, road_table, positions, projection=None):
+    if not len(positions):
+        return None, float("inf")
+
+    # Distance to every candidate road in one call, the first of equally near roads wins
+    distances = road_table.distances(user_coords, positions, projection)
+    nearest = int(np.argmin(distances))
+    min_distance = float(distances[nearest])
+    if min_distance == float("inf"):
+        return None, min_distance
+    return road_table.road(positions[nearest], round(min_distance, 2)), min_distance
 
-        if distance < min_distance:
-            min_distance = distance
-            speed_limit = road["tags"].get("maxspeed", "Unknown")
-            parsed_speed_limit = extract_float(speed_limit) if "mph" in speed_limit else speed_limit
-            
-            closest_road = {
-                "id": road.get("id"),
-                "road_name": road["tags"].get("name", "Unnamed Road"),
-                "road_type": road["tags"].get("highway", "Unknown"),
-                "osm_speed_limit": parsed_speed_limit,
-                "distance_meters": round(distance, 2),
-                "geometry": road["geometry"],
-                "bounds": road["bounds"],
-                "mapillary_speed_limit": -1.0,
-                "mapquest_speed_limit": -1.0   
-            }
-            
-    return closest_road
-                    
 
 def get_mapquest_speed_limit(coord):
     url = f"https://www.mapquestapi.com/geocoding/v1/reverse"
@@ -307,7 +329,7 @@ def get_mapquest_speed_limit(coord):
         "includeRoadMetadata": "true"
     }
     
-    response = requests.get(url, params=params)
+    response = http_pool.get(url, params=params)
     
     if response.status_code == 200:
         data = response.json()
@@ -327,90 +349,123 @@ def get_mapquest_speed_limit(coord):
         return f"Error: {response.status_code} - {response.text}"                    
 
 
+mapquest_cache = MapQuestCache(get_mapquest_speed_limit)
+
+
 def calculate_distance_and_duration(coords):
     """
     Calculate total distance (in miles) and duration (in seconds) from GPS data.
     
-    :param coords: List of tuples [(lat, lon, distracted, speed, timestamp), ...]
+    :param coords: Array of TRIP_DTYPE
     :return: Total distance (miles), total duration (seconds)
     """
     if len(coords) < 2:
-        return 0, 0  # Not enough data points
-
-    # Extract relevant fields and sort by timestamp
-    parsed_data = [(lat, lon, datetime.fromtimestamp(int(timestamp), tz=timezone.utc)) for lat, lon, _, _, timestamp in coords]
-    parsed_data.sort(key=lambda x: x[2])  # Sort by timestamp (if not already sorted)
+        return 0, (0, 0)  # Not enough data points
 
-    total_distance = 0
-    start_time = parsed_data[0][2]
-    end_time = parsed_data[-1][2]
+    # Sort by timestamp (if not already sorted)
+    order = np.argsort(coords['timestamp'], kind='stable')
+    step_miles, step_seconds = trip_steps(coords['lat'][order], coords['lon'][order], coords['timestamp'][order])
 
-    for i in range(1, len(parsed_data)):
-        point1 = (parsed_data[i - 1][0], parsed_data[i - 1][1])
-        point2 = (parsed_data[i][0], parsed_data[i][1])
-        total_distance += geodesic(point1, point2).miles  # Compute great-circle distance
-
-    total_seconds = int((end_time - start_time).total_seconds())  # Convert to int
+    total_distance = float(step_miles.sum())
+    total_seconds = int(step_seconds.sum())
     minutes = total_seconds // 60
     seconds = total_seconds % 60
 
     return total_distance, (minutes, seconds)
                 
 
-# Function to process the input file and detect speeding events
-def process_data_file(input_file):
+def analyze_trip(trip_source, speed_data_path=None):
+    """
+    Run the whole pipeline on one trip in memory: parsing, map matching, speed limit
+    resolution and the Driven speeding definition.
+
+    :param trip_source: Path of a raw trip file, or an array of TRIP_DTYPE.
+    :param speed_data_path: File the enriched points are appended to for driven_speeding_definition.py,
+                            None to skip writing it.
+    :return: TripResult.
+    """
     algo_start_time = time.time()
     reading_file_start_time = time.time()
 
-    with open(input_file, "r") as file:
-        data = file.read().strip().split("|")
-        points = [(float(p[0]), float(p[1]), int(p[2]), float(p[3]), p[4]) for p in (row.split(",") for row in data)]
-        latitudes = [float(p[0]) for p in points]
-        longitudes = [float(p[1]) for p in points]
-        session_lat_min, session_lat_max = min(latitudes), max(latitudes)
-        session_lon_min, session_lon_max = min(longitudes), max(longitudes)
+    # One structured array for the whole trip, every stage reads its columns
+    points = trip_source if isinstance(trip_source, np.ndarray) else load_trip(trip_source)
+    if len(points) < 2:
+        print(f"Trip has {len(points)} points, nothing to match")
+        return TripResult(
+            np.empty(0, dtype=SPEED_DATA_DTYPE), [], {}, np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), 0,
+            {}, 0.0, 0, 0, (0, 0),
+        )
+    trip = trip_columns(points)
+    session_lat_min, session_lat_max = float(trip.lat.min()), float(trip.lat.max())
+    session_lon_min, session_lon_max = float(trip.lon.min()), float(trip.lon.max())
+
+    # Planar mode projects the trip's working area once, geodesic mode measures every distance exactly
+    projection = None
+    if DISTANCE_MODE == "planar":
+        projection = LocalProjection.from_bounds(session_lat_min, session_lat_max, session_lon_min, session_lon_max)
     
     reading_file_end_time = time.time()
     elapsed_reading_file_time = reading_file_end_time - reading_file_start_time
     
-    mapillary_api_call_start_time = time.time()
-    speed_signs = get_mapillary_speed_limits(session_lat_min, session_lon_min, session_lat_max, session_lon_max)
+    # Mapillary signs are only needed once speed limits are resolved, so fetch the corridor's tiles while the roads load.
+    # Tiles whose speed limits were precomputed are only fetched if the trip turns up a segment without a record.
+    mapillary_sign_cache.reset_stats()
+    sign_tiles = corridor_cells(trip.lat, trip.lon, mapillary_sign_cache.tile_size)
+    precomputed_tiles = load_completed_tiles()
+    speed_sign_futures = mapillary_sign_cache.submit([tile for tile in sign_tiles if tile not in precomputed_tiles])
     # print(speed_signs)
     # Track unique travelled segments across all batches
     travelled_segments = {}
-    geocode_to_segment = {}
     total_points = len(points)
+    # Match of every point, aligned with points: road table position (-1 if none) and distance in meters
+    matched_positions = np.full(total_points, -1, dtype=np.int64)
+    matched_distances = np.full(total_points, np.nan)
     batch_start = 0
-    osm_api_call = 0
-
-    mapillary_api_call_end_time = time.time()
-    elapsed_mapillary_api_call_time = mapillary_api_call_end_time - mapillary_api_call_start_time
+    overpass_cache.reset_stats()
+    segment_cache.reset_stats()
+    mapquest_cache.reset_stats()
+    if isinstance(bulk_db.backend, TieredBackend):
+        bulk_db.backend.reset_stats()
 
     determine_travelled_segments_start_time = time.time()
+
+    # Fetch every road along the buffered trip polyline up front instead of one query per batch
+    trip_corridor = corridor_cells(trip.lat, trip.lon, overpass_cache.cell_size)
+    corridor_road_segments, tile_store_reads = load_corridor_road_segments(trip_corridor, RoadTileStore.open(ROAD_TILE_STORE_DIR))
+    # Columnar copy of the corridor's roads, every batch matches against positions in it
+    road_table = SegmentTable(road_segments_in_cells(corridor_road_segments, trip_corridor))
+    road_matcher = IncrementalRoadMatcher(
+        lambda user_coords, positions, road_index: find_nearest_road(user_coords, road_table, positions, road_index, projection)
+    )
+
     while batch_start < total_points:
         batch_end = min(batch_start + BATCH_SIZE, total_points)
-        batch = points[batch_start:batch_end]
-        lat_min, lat_max, lon_min, lon_max = get_bounding_box(batch)
+        batch_lat, batch_lon = trip.lat[batch_start:batch_end], trip.lon[batch_start:batch_end]
 
-        road_segments = get_road_segments(lat_min, lon_min, lat_max, lon_max)
-        osm_api_call += 1
+        # Only the corridor cells around this batch's points
+        batch_cells = corridor_cells(batch_lat, batch_lon, overpass_cache.cell_size)
+        positions = np.array(
+            [road_table.position_by_id[road["id"]] for road in road_segments_in_cells(corridor_road_segments, batch_cells)],
+            dtype=np.int64,
+        )
+        road_matcher.set_road_segments(road_table, positions, RoadSegmentIndex(road_table, positions))
         
-        for lat, lon, distracted, traveling_speed, timestamp in batch:
-            user_coords = (lat, lon)
-            nearest_road = find_nearest_road(user_coords, road_segments)
+        # Matching only needs the coordinates, the other fields are read by index in the output stage
+        for index, user_coords in enumerate(zip(batch_lat.tolist(), batch_lon.tolist()), batch_start):
+            nearest_road = road_matcher.match(user_coords)
             
             if nearest_road:
                 segment_id = str(nearest_road['id'])
                 if segment_id not in travelled_segments:
                     travelled_segments[segment_id] = nearest_road
-                geocode_to_segment[(lat, lon, timestamp)] = {
-                    "segment_id": segment_id,
-                    "distance_meters": nearest_road['distance_meters']
-                }
+                matched_positions[index] = road_table.position_by_id[nearest_road['id']]
+                matched_distances[index] = nearest_road['distance_meters']
 
         batch_start += BATCH_SIZE
 
-    filtered_geocode_to_segment, removed_segments, unique_segments_count = count_segment_occurrences(geocode_to_segment)
+    matched_points = np.flatnonzero(matched_positions >= 0)
+    matched_segment_ids = [str(segment_id) for segment_id in road_table.ids[matched_positions[matched_points]].tolist()]
+    filtered_geocode_to_segment, removed_segments, unique_segments_count = count_segment_occurrences(matched_segment_ids)
         
     determine_travelled_segments_end_time = time.time()
     elapsed_determine_travelled_segments = determine_travelled_segments_end_time - determine_travelled_segments_start_time
@@ -419,14 +474,10 @@ def process_data_file(input_file):
     resolve_speed_limits_start_time = time.time()
 
     segment_ids = list(travelled_segments.keys())
-    db_existing_segments = batch_get_items(segment_ids)
-    db_items_to_write = []
+    db_existing_segments = segment_cache.get_many(segment_ids)
 
-    mapquest_api_counter = 0
-    segments_with_unknown_speeds = 0
-    updated_at_timestamp = int(time.time())
-
-    # Resolve speed limits for all travelled segments
+    # Only segments without a record need resolving, none do on trips through precomputed tiles
+    new_segments = {}
     for segment_id, road in travelled_segments.items():
         if segment_id in filtered_geocode_to_segment:
             if segment_id in db_existing_segments:
@@ -435,58 +486,39 @@ def process_data_file(input_file):
                 road['osm_speed_limit'] = float(item.get('osm_speed_limit', Decimal(0)))
                 road['mapillary_speed_limit'] = float(item.get('mapillary_speed_limit', Decimal(0)))
                 road['mapquest_speed_limit'] = float(item.get('mapquest_speed_limit', Decimal(0)))
-                
             else:
-                speed_limit = road['osm_speed_limit']
-                road_segment_info = {
-                    "road_segment_id": segment_id,
-                    "osm_road_name": road['road_name'],
-                    "osm_road_type": road['road_type'],
-                    "osm_speed_limit": Decimal(str(speed_limit)) if isinstance(speed_limit, (int, float)) else speed_limit,
-                    "mapillary_speed_limit": Decimal(0),
-                    "mapquest_speed_limit": Decimal(0),
-                    "avg_contextual_speed_30_day": Decimal(0), 
-                    "avg_contextual_speed_60_day": Decimal(0), 
-                    "avg_contextual_speed_180_day": Decimal(0),
-                    "updated_at": updated_at_timestamp  
-                }
-                
-                if speed_limit == "Unknown": # Speed Limit from OSM is not present
-                    road['osm_speed_limit'] = 0
-                    road_segment_info['osm_speed_limit'] = Decimal(0)
-                    
-                    segments_with_unknown_speeds += 1
-                    # Check Mapillary
-                    segment_with_mapillary_speed = map_speed_sign_to_nearest_road(road, speed_signs)
-                    if len(segment_with_mapillary_speed['mapillary_speed_signs']) > 0: # speed sign mapped to road
-                        speed_limit = segment_with_mapillary_speed['mapillary_speed_signs'][0]['speed_limit']
-                        road['mapillary_speed_limit'] = speed_limit  # for printing to console
-                        road_segment_info['mapillary_speed_limit'] = Decimal(speed_limit)
-                    else:
-                        # Call MapQuest if still unknown
-                        mid_index = len(road['geometry']) // 2  # Get the middle index
-                        middle_road_coord = (road['geometry'][mid_index]['lat'], road['geometry'][mid_index]['lon'])
-                        speed_limit = get_mapquest_speed_limit(middle_road_coord)
-                        mapquest_api_counter += 1
-                        road['mapquest_speed_limit'] = speed_limit  # for printing to console
-                        if speed_limit != "Unknown":
-                            road_segment_info['mapquest_speed_limit'] = Decimal(speed_limit)
-                        else:
-                            road_segment_info['mapquest_speed_limit'] = Decimal(0)
-                    road_segment_info['osm_speed_limit'] = Decimal(0)
-
-                db_items_to_write.append({"PutRequest": {"Item": road_segment_info}})
-                # Write in batches
-                if len(db_items_to_write) == BATCH_SIZE:
-                    dynamodb.batch_write_item(RequestItems={'drivenDB_road_segment_info': db_items_to_write})
-                    db_items_to_write = []  # Reset batch
+                new_segments[segment_id] = road
         # else:
         #     # print(f"Segment ID {segment_id} not found in geocode_to_segment_counter")
+
+    mapillary_api_call_start_time = time.time()
+    speed_signs = []
+    if new_segments:
+        speed_sign_futures += mapillary_sign_cache.submit([tile for tile in sign_tiles if tile in precomputed_tiles])
+        speed_signs = mapillary_sign_cache.collect(speed_sign_futures)
+    sign_index = SpeedSignIndex(speed_signs)
+    mapillary_api_call_end_time = time.time()
+    elapsed_mapillary_api_call_time = mapillary_api_call_end_time - mapillary_api_call_start_time
+
+    resolver = SpeedLimitResolver(
+        lambda road, speed_signs, sign_index: map_speed_sign_to_nearest_road(road, speed_signs, projection, sign_index),
+        mapquest_cache.get_speed_limit,
+    )
+    new_records, segments_with_unknown_speeds = resolver.resolve(new_segments, speed_signs, sign_index)
+    db_items_to_write = [{"PutRequest": {"Item": record}} for record in new_records]
+    mapquest_api_counter = mapquest_cache.api_calls
+
     print(f"# of Items to write to DB: {len(db_items_to_write)}")
     print(f"Items Content: {db_items_to_write}")
                  
     if db_items_to_write:
-        dynamodb.batch_write_item(RequestItems={'drivenDB_road_segment_info': db_items_to_write})
+        failed_items = batch_write_all('drivenDB_road_segment_info', db_items_to_write)
+        # Only cache what the table accepted, the rest is resolved and written again by a later trip
+        failed_segment_ids = {item["PutRequest"]["Item"]["road_segment_id"] for item in failed_items}
+        segment_cache.put_many(
+            item["PutRequest"]["Item"] for item in db_items_to_write
+            if item["PutRequest"]["Item"]["road_segment_id"] not in failed_segment_ids
+        )
 
     resolve_speed_limits_end_time = time.time()
     elapsed_resolve_speed_limits = resolve_speed_limits_end_time - resolve_speed_limits_start_time
@@ -495,11 +527,18 @@ def process_data_file(input_file):
 
     speeding_events = []
     user_id = 31399 # Example user ID for testing
-
-    # Output user geocode results
-    for (lat, lon, timestamp), segment_data in geocode_to_segment.items():
-        segment_id = segment_data['segment_id']
-        distance_meters = segment_data['distance_meters']
+    speed_data_lines = []
+    speed_limits = []
+    road_type_codes = []
+    road_type_ids = {}
+
+    # Output user geocode results, one pass over the matched points in trip order
+    matched_rows = zip(
+        matched_segment_ids, matched_distances[matched_points].tolist(),
+        trip.lat[matched_points].tolist(), trip.lon[matched_points].tolist(), trip.timestamp[matched_points].tolist(),
+        trip.speed[matched_points].tolist(), trip.distracted[matched_points].tolist(),
+    )
+    for segment_id, distance_meters, lat, lon, timestamp, traveling_speed, distracted in matched_rows:
         segment = travelled_segments[segment_id]
         print(segment)
         osm_speed_limit = segment['osm_speed_limit'] if segment['osm_speed_limit'] and segment['osm_speed_limit'] != 'Unknown' else 0
@@ -510,9 +549,6 @@ def process_data_file(input_file):
             else 0
         )
 
-        traveling_speed = next((p[3] for p in points if p[0] == lat and p[1] == lon and p[4] == timestamp), 0)
-        distracted = next((p[2] for p in points if p[0] == lat and p[1] == lon and p[4] == timestamp), "Unknown")
-
         print(f"⏱️  Timestamp: {convert_timestamp(timestamp)}")
         print(f"📍 Location: {lat}, {lon}")
         print(f"📏  Distance from Driver to Nearest Road: {distance_meters} m")
@@ -539,16 +575,32 @@ def process_data_file(input_file):
                 }
             })
 
-        # Example usage
-        write_speed_data_to_file(
-            "speed_data.txt",
-            lat, lon, distracted, traveling_speed,
-            osm_speed_limit, mapillary_speed_limit, mapquest_speed_limit,
-            segment["road_type"], timestamp
-        )
+        speed_data_lines.append(speed_data_line(
+            lat, lon, distracted, traveling_speed, valid_posted_speed_limit, segment["road_type"], timestamp
+        ))
+        speed_limits.append(speed_limit_value(valid_posted_speed_limit))
+        road_type_codes.append(road_type_ids.setdefault(segment["road_type"], len(road_type_ids)))
 
     if speeding_events:
-        batch_write_all("users_speeding_events", speeding_events)
+        speeding_events_writer.put_many(speeding_events)
+
+    if speed_data_path:
+        write_speed_data_to_file(speed_data_path, speed_data_lines)
+
+    # The enriched points stay in memory for the speeding definition instead of being re-read from the file
+    speed_data = np.empty(len(matched_points), dtype=SPEED_DATA_DTYPE)
+    for name in ("lat", "lon", "distracted", "speed", "timestamp"):
+        speed_data[name] = points[name][matched_points]
+    speed_data["limit"] = speed_limits
+    speed_data["road_type"] = road_type_codes
+    road_types = list(road_type_ids)
+
+    event_starts, event_ends, speeding_event_count = speeding_event_bounds(
+        speed_data["speed"], speed_data["limit"], speed_data["timestamp"]
+    )
+    road_percentages, _, speeding_distance, speeding_time, _ = road_statistics(
+        speed_data["lat"], speed_data["lon"], speed_data["timestamp"], speed_data["road_type"], road_types, event_starts, event_ends
+    )
 
     distance, (duration_minutes, duration_seconds) = calculate_distance_and_duration(points)
 
@@ -569,17 +621,66 @@ def process_data_file(input_file):
     print(f"# of Segments Ignored (geocode < 5): {len(removed_segments)}")
     # print(f"Removed Segments: {removed_segments}")
     print(f"# of Geocodes considered for speeding: {len(speeding_events)}")
+    print(f"# of Speeding Events Detected: {speeding_event_count}, {speeding_distance:.2f} miles, {speeding_time} seconds")
     print("======= ALGO PERFORMANCE METRICS =======")
     print(f"# of segments with unknown speeds: {segments_with_unknown_speeds}")
-    print(f"# of OSM API calls: {osm_api_call}")
+    print(f"# of OSM API calls: {overpass_cache.api_calls}")
+    print(f"# of OSM cache hits: {overpass_cache.hits}, misses: {overpass_cache.misses}, bytes saved: {overpass_cache.bytes_saved}")
+    print(f"# of corridor cells: {len(trip_corridor)}, served from road tile store: {tile_store_reads}")
+    print(f"# of sticky segment matches: {road_matcher.sticky_matches}")
+    print(f"# of full road searches: {road_matcher.full_searches}")
     print(f"# of Mapillary speed signs {len(speed_signs)}")
-    print(f"# of MapQuest API calls: {mapquest_api_counter}\n")
+    print(f"# of Mapillary tile cache hits: {mapillary_sign_cache.hits}, API calls: {mapillary_sign_cache.misses}")
+    print(f"# of MapQuest API calls: {mapquest_api_counter}")
+    print(f"# of MapQuest cache hits: {mapquest_cache.hits}, coalesced lookups: {mapquest_cache.coalesced}")
+    print(f"Segment cache hit ratio: {segment_cache.hit_ratio() * 100:.1f}% ({segment_cache.hits} hits, {segment_cache.misses} misses)")
+    print(f"DynamoDB read units saved: {segment_cache.read_units_saved}\n")
+    if isinstance(bulk_db.backend, TieredBackend):
+        print(f"# of segments read from local store: {bulk_db.backend.local_hits}, from DynamoDB: {bulk_db.backend.remote_reads}")
+    print(f"Distance mode: {DISTANCE_MODE}")
+    if projection is not None:
+        print(f"Max planar distance error: {projection.max_relative_error(session_lat_min, session_lat_max) * 100:.3f}%")
     print(f"Time to complete reading file: {elapsed_reading_file_time:.4f} seconds")
-    print(f"Time to complete Mapillary API call: {elapsed_mapillary_api_call_time:.4f} seconds")
+    print(f"Time waiting on Mapillary API call after matching: {elapsed_mapillary_api_call_time:.4f} seconds")
     print(f"Time to complete determine_travelled_segments: {elapsed_determine_travelled_segments:.4f} seconds")
     print(f"Time to complete find_speed_limits: {elapsed_resolve_speed_limits:.4f} seconds")
     print(f"Time to complete final_output_functionality: {elapsed_final_output_functionality_time:.4f} seconds")
     print(f"Time to complete full algorithm: {elapsed_algo_time:.4f} seconds")
 
-# Run the script with an example file
-process_data_file("./JameyTrips/trial_5.txt")
+    return TripResult(
+        speed_data, road_types, travelled_segments, event_starts, event_ends, speeding_event_count,
+        road_percentages, speeding_distance, speeding_time, distance, (duration_minutes, duration_seconds),
+    )
+
+# Function to process the input file and detect speeding events
+def process_data_file(input_file):
+    return analyze_trip(input_file, SPEED_DATA_PATH)
+
+def precompute_region(lat_min, lon_min, lat_max, lon_max, workers=PRECOMPUTE_WORKERS):
+    """
+    Resolve and store the speed limit of every drivable way in a bounding box ahead of any trip through it.
+    Safe to run again after an interruption, finished tiles are skipped.
+
+    :return: Number of segment records written.
+    """
+    tile_store = RoadTileStore.open(ROAD_TILE_STORE_DIR)
+    resolver = SpeedLimitResolver(
+        lambda road, speed_signs, sign_index: map_speed_sign_to_nearest_road(road, speed_signs, None, sign_index),
+        mapquest_cache.get_speed_limit,
+    )
+    precomputer = RegionPrecomputer(
+        lambda cells: load_corridor_road_segments(cells, tile_store)[0],
+        mapillary_sign_cache,
+        resolver,
+        segment_cache,
+        lambda items: batch_write_all('drivenDB_road_segment_info', items),
+        overpass_cache.cell_size,
+    )
+    return precomputer.run(region_tiles(lat_min, lon_min, lat_max, lon_max), workers)
+
+if __name__ == "__main__":
+    with speeding_events_writer: # Drains the queued speeding events before exiting
+        # Run the script with an example file
+        process_data_file("./JameyTrips/trial_5.txt")
+    # Or precompute the speed limits of a region, e.g. around the example trips
+    # precompute_region(29.70, -95.75, 29.75, -95.70)
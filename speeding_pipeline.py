@@ -0,0 +1,59 @@
+import importlib.util
+import os
+import sys
+import threading
+
+# The speeding algorithm's file name has hyphens, so it is loaded by path rather than imported
+SPEEDING_ALGORITHM_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "speeding_analysis_full_mapping_final_04-15.py")
+
+_algorithm = None
+_algorithm_lock = threading.Lock()
+
+
+def speeding_algorithm():
+    """
+    The speeding algorithm module, loaded on first use. Loading it creates its caches and
+    storage clients, but doesn't run any trip.
+
+    When the script itself is running as __main__ that module is reused, loading the file
+    a second time would give it its own bulk_db, segment_cache and speeding events writer.
+    """
+    global _algorithm
+    with _algorithm_lock:
+        if _algorithm is None:
+            main = sys.modules.get("__main__")
+            main_path = getattr(main, "__file__", None)
+            if main_path and os.path.abspath(main_path) == SPEEDING_ALGORITHM_PATH:
+                _algorithm = main
+                return _algorithm
+            spec = importlib.util.spec_from_file_location("speeding_algorithm", SPEEDING_ALGORITHM_PATH)
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            _algorithm = module
+        return _algorithm
+
+
+def analyze_trip(trip_source, speed_data_path=None):
+    """
+    Run the whole pipeline on one trip in memory: parsing, map matching, speed limit
+    resolution and the Driven speeding definition.
+
+    :param trip_source: Path of a raw trip file, or an array of TRIP_DTYPE.
+    :param speed_data_path: File the enriched points are appended to for driven_speeding_definition.py,
+                            None to skip writing it.
+    :return: TripResult.
+    """
+    return speeding_algorithm().analyze_trip(trip_source, speed_data_path)
+
+
+def close():
+    """
+    Write every speeding event still queued by analyze_trip. Call once after the last trip,
+    events queued after that are rejected.
+
+    :raises RuntimeError: If some events could not be written.
+    """
+    with _algorithm_lock:
+        algorithm = _algorithm
+    if algorithm is not None:
+        algorithm.speeding_events_writer.close()
@@ -0,0 +1,128 @@
+import numpy as np
+from driven_speeding_definition import SPEEDING_EXCESS_MPH, SPEEDING_MIN_DURATION_SECONDS, trip_steps
+
+# A rule set is a dict, keys left out take these values. The defaults are the Driven definition.
+DEFAULT_RULE_SET = {
+    "name": "driven",
+    "margin_mph": SPEEDING_EXCESS_MPH, # Minimum speed over the limit, None for no margin rule
+    "road_type_margins_mph": {}, # Road type -> margin replacing margin_mph on that road type
+    "percent_over": None, # Minimum speed over the limit as a percentage of it, e.g. 20, None for no percentage rule
+    "min_duration_seconds": SPEEDING_MIN_DURATION_SECONDS,
+    "distracted_only": False, # Only points where the driver was distracted count as speeding
+}
+
+
+def compile_rule_set(rule_set, road_types):
+    """
+    Turn a declarative rule set into the arrays the engine compares against.
+
+    :param rule_set: Dict with any of the keys of DEFAULT_RULE_SET.
+    :param road_types: List of road type names the trip's road_type codes index into.
+    :return: Complete rule set with "margins", the margin of each road type code (NaN for no margin rule).
+    """
+    unknown_keys = set(rule_set) - set(DEFAULT_RULE_SET)
+    if unknown_keys:
+        raise ValueError(f"Unknown speeding rule keys: {sorted(unknown_keys)}")
+
+    compiled = {**DEFAULT_RULE_SET, **rule_set}
+    margin = compiled["margin_mph"]
+    margins = np.full(len(road_types), np.nan if margin is None else float(margin))
+    for code, road_type in enumerate(road_types):
+        if road_type in compiled["road_type_margins_mph"]:
+            margins[code] = compiled["road_type_margins_mph"][road_type]
+    compiled["margins"] = margins
+    return compiled
+
+
+class SpeedingRuleEngine:
+    """
+    Evaluates many speeding rule sets over the same trip in one pass.
+
+    Speed over the limit, the known-limit mask and the per-step distances are computed
+    once per trip. Each rule set then adds one row to a single (rule sets x points)
+    speeding mask, and the runs of every row are found with one diff over the whole mask.
+    A point is speeding under a rule set when the limit is known and every rule the set
+    gives (margin, percentage over, distracted) holds. Runs become events under the same
+    duration and end-of-trip rules as driven_defined_speeding_events, so the default rule
+    set gives exactly the events of speeding_event_bounds.
+    """
+
+    def __init__(self, rule_sets):
+        """
+        :param rule_sets: List of rule set dicts, each with a unique "name".
+        """
+        names = [rule_set.get("name", DEFAULT_RULE_SET["name"]) for rule_set in rule_sets]
+        if len(set(names)) < len(names):
+            raise ValueError(f"Speeding rule set names must be unique: {names}")
+        self.rule_sets = rule_sets
+
+    def evaluate(self, speed, limit, timestamp, road_type_codes, road_types, distracted, lat, lon):
+        """
+        Detect the speeding events of every rule set.
+
+        :param speed, limit: Arrays of traveling speeds and speed limits in mph, limit 0 when unknown.
+        :param timestamp: Array of Unix timestamps in seconds.
+        :param road_type_codes: Array of indices into road_types, one per point.
+        :param road_types: List of road type names.
+        :param distracted: Array of distracted flags.
+        :param lat, lon: Arrays of coordinates in degrees.
+        :return: Dict rule set name -> dict of event_starts, event_ends (inclusive), event_distances (miles),
+                 event_times (seconds), speeding_event_count, speeding_distance and speeding_time.
+        """
+        speed = np.asarray(speed, dtype=np.float64)
+        limit = np.asarray(limit, dtype=np.float64)
+        timestamp = np.asarray(timestamp, dtype=np.int64)
+        road_type_codes = np.asarray(road_type_codes, dtype=np.int64)
+        distracted = np.asarray(distracted).astype(bool)
+        point_count = len(speed)
+
+        # Shared by every rule set
+        excess_speed = speed - limit
+        known_limit = limit > 0
+        with np.errstate(divide="ignore", invalid="ignore"):
+            percent_over = excess_speed / limit * 100
+        step_miles, _ = trip_steps(lat, lon, timestamp)
+        travelled_miles = np.concatenate(([0.0], np.cumsum(step_miles)))
+
+        compiled = [compile_rule_set(rule_set, road_types) for rule_set in self.rule_sets]
+        # Padded with a non-speeding point on each side, so every run has both edges in its row
+        speeding = np.zeros((len(compiled), point_count + 2), dtype=bool)
+        for row, rule_set in enumerate(compiled):
+            mask = speeding[row, 1:-1]
+            mask[:] = known_limit
+            margins = rule_set["margins"][road_type_codes]
+            has_margin = ~np.isnan(margins)
+            mask &= ~has_margin | (excess_speed >= np.where(has_margin, margins, 0))
+            if rule_set["percent_over"] is not None:
+                mask &= percent_over >= rule_set["percent_over"]
+            if rule_set["distracted_only"]:
+                mask &= distracted
+
+        # +1 where a run starts, -1 just past where it ends, row by row
+        edges = np.diff(speeding.astype(np.int8), axis=1)
+        start_rows, starts = np.nonzero(edges == 1)
+        _, ends = np.nonzero(edges == -1)
+        ends -= 1
+
+        min_durations = np.array([rule_set["min_duration_seconds"] for rule_set in compiled], dtype=np.float64)
+        event_times = timestamp[ends] - timestamp[starts]
+        lasting = event_times >= min_durations[start_rows]
+        rows, starts, ends, event_times = start_rows[lasting], starts[lasting], ends[lasting], event_times[lasting]
+        event_distances = travelled_miles[ends] - travelled_miles[starts]
+        # Rows come out in order, so each rule set's events are one slice
+        row_bounds = np.searchsorted(rows, np.arange(len(compiled) + 1))
+
+        results = {}
+        for row, rule_set in enumerate(compiled):
+            events = slice(row_bounds[row], row_bounds[row + 1])
+            results[rule_set["name"]] = {
+                "event_starts": starts[events],
+                "event_ends": ends[events],
+                "event_distances": event_distances[events],
+                "event_times": event_times[events],
+                # As in driven_defined_speeding_events, an event lasting to the end of the trip is not counted
+                "speeding_event_count": int(np.count_nonzero(ends[events] < point_count - 1)),
+                "speeding_distance": float(event_distances[events].sum()),
+                "speeding_time": int(event_times[events].sum()),
+            }
+        return results
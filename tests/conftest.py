@@ -0,0 +1,17 @@
+import os
+import sys
+
+# The modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def way(way_id, coords, nodes=None, **tags):
+    """An Overpass way element with geometry, nodes numbered from way_id * 10 unless given."""
+    lats, lons = [lat for lat, _ in coords], [lon for _, lon in coords]
+    return {
+        "id": way_id,
+        "tags": tags,
+        "nodes": nodes if nodes is not None else list(range(way_id * 10, way_id * 10 + len(coords))),
+        "geometry": [{"lat": lat, "lon": lon} for lat, lon in coords],
+        "bounds": {"minlat": min(lats), "minlon": min(lons), "maxlat": max(lats), "maxlon": max(lons)},
+    }
@@ -0,0 +1,66 @@
+import math
+import numpy as np
+import pytest
+from corridor_planner import cells_to_rectangles, chunk_rectangles, corridor_cells, rectangle_bbox, rectangle_cells, road_segments_in_cells
+from road_segment_index import search_box
+from road_tile_store import tile_range
+
+LAT = np.array([29.7100, 29.7104, 29.7104, 29.7300, 29.7302])
+LON = np.array([-95.7200, -95.7203, -95.7203, -95.7450, -95.7451])
+
+
+def reference_cells(lat, lon, cell_size, buffer_meters=50):
+    # One search box per point and per half-cell sample between consecutive points
+    points = list(zip(lat.tolist(), lon.tolist()))
+    cells = set()
+    for i, (point_lat, point_lon) in enumerate(points):
+        samples = [(point_lat, point_lon)]
+        if i + 1 < len(points):
+            next_lat, next_lon = points[i + 1]
+            steps = math.ceil(max(abs(next_lat - point_lat), abs(next_lon - point_lon)) / (cell_size / 2))
+            samples += [(point_lat + (next_lat - point_lat) * k / steps, point_lon + (next_lon - point_lon) * k / steps)
+                        for k in range(1, steps)]
+        for sample in samples:
+            min_lon, min_lat, max_lon, max_lat = search_box(sample, buffer_meters)
+            cells.update(tile_range(min_lat, min_lon, max_lat, max_lon, cell_size))
+    return sorted(cells)
+
+
+def test_matches_sampling_point_by_point():
+    for cell_size in (0.01, 0.002):
+        assert corridor_cells(LAT, LON, cell_size) == reference_cells(LAT, LON, cell_size)
+
+
+def test_gap_between_points_is_covered():
+    cells = corridor_cells(LAT[2:4], LON[2:4], 0.002)
+    rows = {row for row, _ in cells}
+    assert rows == set(range(min(rows), max(rows) + 1))
+
+
+def test_column_views_and_empty_trip():
+    trip = np.zeros(3, dtype=[("lat", "f8"), ("lon", "f8")])
+    trip["lat"], trip["lon"] = LAT[:3], LON[:3]
+    assert corridor_cells(trip["lat"], trip["lon"], 0.01) == reference_cells(LAT[:3], LON[:3], 0.01)
+    assert corridor_cells(np.empty(0), np.empty(0), 0.01) == []
+
+
+def test_rectangles_cover_exactly_the_cells():
+    rng = np.random.default_rng(0)
+    for _ in range(50):
+        cells = {(int(row), int(col)) for row, col in rng.integers(0, 8, size=(rng.integers(1, 40), 2))}
+        rectangles = cells_to_rectangles(cells)
+        covered = [cell for rectangle in rectangles for cell in rectangle_cells(rectangle)]
+        assert sorted(covered) == sorted(cells) # No cell twice, none missing
+
+
+def test_stacked_strips_merge_into_one_rectangle():
+    cells = [(row, col) for row in range(5940, 5943) for col in range(-19144, -19140)] + [(5943, -19144)]
+    assert cells_to_rectangles(cells) == [(5940, 5942, -19144, -19141), (5943, 5943, -19144, -19144)]
+    assert rectangle_bbox((5940, 5942, -19144, -19141), 0.005) == pytest.approx((29.7, -95.72, 29.715, -95.7))
+    assert chunk_rectangles(list(range(7)), 3) == [[0, 1, 2], [3, 4, 5], [6]]
+
+
+def test_road_segments_in_cells_without_duplicates():
+    a, b, c = {"id": 1}, {"id": 2}, {"id": 3}
+    cell_elements = {(0, 0): [a, b], (0, 1): [b, c]}
+    assert road_segments_in_cells(cell_elements, [(0, 1), (0, 0), (5, 5)]) == [b, c, a]
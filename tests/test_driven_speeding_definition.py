@@ -0,0 +1,146 @@
+import random
+import numpy as np
+import pytest
+from geopy.distance import geodesic
+from driven_speeding_definition import (
+    StreamingSpeedingDetector, calculate_road_statistics, driven_defined_speeding_events, road_statistics, speeding_event_bounds,
+)
+
+
+def random_trace(seed, length=40):
+    """Points in parse_data's shape, dense in runs around the 11 mph and 5 second thresholds."""
+    rng = random.Random(seed)
+    timestamp = rng.randint(1738593700, 1738593800)
+    points = []
+    for i in range(rng.randint(0, length)):
+        timestamp += rng.choice([0, 1, 1, 2, 3, 7])
+        limit = rng.choice([0.0, 25.0, 45.0, 45.5])
+        points.append({
+            'lat': 29.71 + i * 1e-4 + rng.uniform(-2e-5, 2e-5),
+            'long': -95.72 + rng.uniform(-2e-5, 2e-5),
+            'distracted': rng.random() < 0.5,
+            'speed': limit + rng.choice([0, 10.9999, 11, 11.5, 20, -5]),
+            'limit': limit,
+            'road_type': rng.choice(['primary', 'residential', 'service']),
+            'timestamp': timestamp,
+        })
+    return points
+
+
+def columns(points, *names):
+    return [np.array([point[name] for point in points]) for name in names]
+
+
+def test_event_bounds_match_driven_definition():
+    for seed in range(3000):
+        points = random_trace(seed)
+        events, counter = driven_defined_speeding_events(points)
+        starts, ends, event_count = speeding_event_bounds(*columns(points, 'speed', 'limit', 'timestamp'))
+        assert [points[start:end + 1] for start, end in zip(starts.tolist(), ends.tolist())] == events, seed
+        assert event_count == counter, seed
+
+
+def test_event_lasting_to_end_of_trip_is_returned_but_not_counted():
+    points = [
+        {'speed': 70.0, 'limit': 45.0, 'timestamp': 0},
+        {'speed': 70.0, 'limit': 45.0, 'timestamp': 5},
+        {'speed': 40.0, 'limit': 45.0, 'timestamp': 6},
+        {'speed': 70.0, 'limit': 45.0, 'timestamp': 7},
+        {'speed': 70.0, 'limit': 45.0, 'timestamp': 12},
+    ]
+    starts, ends, event_count = speeding_event_bounds(*columns(points, 'speed', 'limit', 'timestamp'))
+    assert starts.tolist() == [0, 3]
+    assert ends.tolist() == [1, 4]
+    assert event_count == 1
+
+
+def test_empty_trip():
+    starts, ends, event_count = speeding_event_bounds([], [], [])
+    assert len(starts) == len(ends) == event_count == 0
+
+
+def summarize(event):
+    """What StreamingSpeedingDetector reports for an event of driven_defined_speeding_events."""
+    return {
+        'start_time': event[0]['timestamp'],
+        'end_time': event[-1]['timestamp'],
+        'road_type': event[0]['road_type'],
+        'start_location': (event[0]['lat'], event[0]['long']),
+        'end_location': (event[-1]['lat'], event[-1]['long']),
+        'points': len(event),
+        'distance': sum(geodesic((a['lat'], a['long']), (b['lat'], b['long'])).miles for a, b in zip(event, event[1:])),
+        'max_speed': max(point['speed'] for point in event),
+        'max_excess_speed': max(point['speed'] - point['limit'] for point in event),
+        'duration': event[-1]['timestamp'] - event[0]['timestamp'],
+    }
+
+
+def test_streaming_detector_matches_driven_definition():
+    for seed in range(500):
+        points = random_trace(seed)
+        events, counter = driven_defined_speeding_events(points)
+
+        # Feed the trip in batches of random size, as live telemetry arrives
+        rng = random.Random(seed)
+        detector = StreamingSpeedingDetector()
+        streamed = []
+        position = 0
+        while position < len(points):
+            batch_size = rng.randint(1, 8)
+            streamed += detector.add_many(points[position:position + batch_size])
+            position += batch_size
+        assert detector.speeding_event_counter == counter, seed
+
+        last_event = detector.finish()
+        if last_event:
+            streamed.append(last_event)
+        assert detector.speeding_event_counter == counter, seed # The end of trip flush isn't counted
+        assert len(streamed) == len(events), seed
+        for streamed_event, event in zip(streamed, events):
+            expected = summarize(event)
+            assert streamed_event['distance'] == pytest.approx(expected.pop('distance'), rel=1e-12, abs=1e-15), seed
+            assert {name: value for name, value in streamed_event.items() if name != 'distance'} == expected, seed
+
+
+def test_streaming_detector_flushes_open_event_without_counting_it():
+    detector = StreamingSpeedingDetector()
+    for timestamp in range(0, 6):
+        assert detector.add({'lat': 29.7, 'long': -95.7, 'speed': 70.0, 'limit': 45.0, 'road_type': 'primary', 'timestamp': timestamp}) is None
+    event = detector.finish()
+    assert event['duration'] == 5 and event['points'] == 6
+    assert detector.speeding_event_counter == 0
+    assert detector.finish() is None
+
+
+def test_streaming_detector_drops_short_runs():
+    detector = StreamingSpeedingDetector()
+    detector.add_many([{'lat': 29.7, 'long': -95.7, 'speed': 70.0, 'limit': 45.0, 'road_type': 'primary', 'timestamp': t} for t in range(5)])
+    assert detector.add({'lat': 29.7, 'long': -95.7, 'speed': 40.0, 'limit': 45.0, 'road_type': 'primary', 'timestamp': 5}) is None
+    assert detector.speeding_event_counter == 0
+
+
+def test_road_statistics_match_calculate_road_statistics():
+    for seed in range(500):
+        points = random_trace(seed)
+        events, _ = driven_defined_speeding_events(points)
+        lat, lon, speed, limit, timestamp = columns(points, 'lat', 'long', 'speed', 'limit', 'timestamp')
+        road_types, road_type_codes = np.unique([point['road_type'] for point in points], return_inverse=True)
+        starts, ends, _ = speeding_event_bounds(speed, limit, timestamp)
+        statistics = lambda: road_statistics(lat, lon, timestamp, road_type_codes, road_types.tolist(), starts, ends)
+
+        try:
+            expected = calculate_road_statistics(points, events)
+        except ZeroDivisionError: # Moved but no time passed
+            with pytest.raises(ZeroDivisionError):
+                statistics()
+            continue
+        road_percentages, distance, speeding_distance, speeding_time, duration = statistics()
+
+        expected_percentages, expected_distance, expected_speeding_distance, expected_speeding_time, expected_duration = expected
+        assert list(road_percentages) == list(expected_percentages), seed
+        for road_type, percentages in expected_percentages.items():
+            assert road_percentages[road_type] == pytest.approx(percentages, rel=1e-6, abs=1e-9), seed
+        assert distance == pytest.approx(expected_distance, rel=1e-6, abs=1e-12), seed
+        assert speeding_distance == pytest.approx(expected_speeding_distance, rel=1e-6, abs=1e-12), seed
+        assert speeding_time == expected_speeding_time, seed
+        assert duration == expected_duration, seed
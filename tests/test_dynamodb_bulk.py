@@ -0,0 +1,71 @@
+import random
+import pytest
+import dynamodb_bulk
+from dynamodb_bulk import MAX_BATCH_GET_KEYS, MAX_BATCH_WRITE_ITEMS, MAX_RETRIES, BulkClient, InMemoryBackend
+
+SEGMENTS = 'drivenDB_road_segment_info'
+
+
+class RecordingBackend(InMemoryBackend):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.get_sizes = []
+        self.write_sizes = []
+
+    def batch_get_item(self, request_items):
+        self.get_sizes.append(len(request_items[SEGMENTS]['Keys']))
+        return super().batch_get_item(request_items)
+
+    def batch_write_item(self, request_items):
+        self.write_sizes.append(len(request_items[SEGMENTS]))
+        return super().batch_write_item(request_items)
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(dynamodb_bulk, "backoff", lambda attempt: None)
+    random.seed(0)
+
+
+def puts(count):
+    return [{'PutRequest': {'Item': {'road_segment_id': i, 'speed_limit': 35}}} for i in range(count)]
+
+
+@pytest.mark.parametrize("parallel", [True, False])
+def test_batches_stay_within_dynamodb_limits(parallel):
+    backend = RecordingBackend()
+    client = BulkClient(backend)
+    assert client.batch_write(SEGMENTS, puts(260), parallel=parallel) == []
+    assert sorted(backend.write_sizes) == [10] + [MAX_BATCH_WRITE_ITEMS] * 10
+
+    found = client.batch_get(SEGMENTS, 'road_segment_id', list(range(250)) + list(range(50)))
+    assert sorted(backend.get_sizes) == [50, MAX_BATCH_GET_KEYS, MAX_BATCH_GET_KEYS] # Duplicates are requested once
+    assert sorted(found) == list(range(250))
+    assert found[7] == {'road_segment_id': 7, 'speed_limit': 35}
+
+
+def test_unprocessed_requests_are_retried():
+    backend = InMemoryBackend(unprocessed_rate=0.2)
+    client = BulkClient(backend)
+    assert client.batch_write(SEGMENTS, puts(200)) == []
+    assert len(backend.tables[SEGMENTS]) == 200
+    assert sorted(client.batch_get(SEGMENTS, 'road_segment_id', range(200))) == list(range(200))
+
+
+def test_gives_up_after_max_retries(capsys):
+    backend = RecordingBackend(unprocessed_rate=1.0)
+    client = BulkClient(backend)
+    requests = puts(30)
+    assert client.batch_write(SEGMENTS, requests) == requests
+    assert len(backend.write_sizes) == 2 * (MAX_RETRIES + 1)
+    assert client.batch_get(SEGMENTS, 'road_segment_id', range(30)) == {}
+    output = capsys.readouterr().out
+    assert "Gave up writing 30 items" in output and "Gave up reading 30 keys" in output
+
+
+def test_deletes():
+    backend = InMemoryBackend()
+    client = BulkClient(backend)
+    client.batch_write(SEGMENTS, puts(3))
+    client.batch_write(SEGMENTS, [{'DeleteRequest': {'Key': {'road_segment_id': 1}}}])
+    assert sorted(client.batch_get(SEGMENTS, 'road_segment_id', range(3))) == [0, 2]
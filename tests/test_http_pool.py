@@ -0,0 +1,44 @@
+import threading
+import time
+import http_pool
+
+
+def test_map_concurrent_keeps_order_and_bounds_concurrency():
+    lock = threading.Lock()
+    running = {"now": 0, "max": 0}
+
+    def call(item):
+        with lock:
+            running["now"] += 1
+            running["max"] = max(running["max"], running["now"])
+        time.sleep(0.02)
+        with lock:
+            running["now"] -= 1
+        return item * 2
+
+    assert http_pool.map_concurrent(call, range(40)) == [item * 2 for item in range(40)]
+    assert 1 < running["max"] <= http_pool.MAX_CONCURRENT_REQUESTS
+
+
+def test_single_item_runs_on_calling_thread():
+    assert http_pool.map_concurrent(lambda item: threading.current_thread(), [1]) == [threading.current_thread()]
+    assert http_pool.map_concurrent(lambda item: item, []) == []
+
+
+def test_session_is_shared_and_pooled():
+    session = http_pool.get_session()
+    assert http_pool.get_session() is session
+    adapter = session.get_adapter("https://overpass-api.de/api/interpreter")
+    assert adapter._pool_maxsize == http_pool.MAX_CONCURRENT_REQUESTS
+
+
+def test_submit_returns_future():
+    assert http_pool.submit(lambda a, b: a + b, 2, b=3).result(timeout=5) == 5
+
+
+def test_get_has_a_default_timeout(monkeypatch):
+    calls = []
+    monkeypatch.setattr(http_pool.get_session(), "get", lambda url, **kwargs: calls.append(kwargs))
+    http_pool.get("https://example.com", params={"a": 1})
+    http_pool.get("https://example.com", timeout=5)
+    assert calls == [{"params": {"a": 1}, "timeout": http_pool.HTTP_TIMEOUT_SECONDS}, {"timeout": 5}]
@@ -0,0 +1,119 @@
+from decimal import Decimal
+import pytest
+import local_store
+from dynamodb_bulk import BulkClient, InMemoryBackend
+from local_store import SQLiteBackend, TieredBackend
+
+SEGMENTS = 'drivenDB_road_segment_info'
+EVENTS = 'users_speeding_events'
+
+
+def segment(road_segment_id, speed_limit=Decimal("37.3")):
+    return {'road_segment_id': Decimal(road_segment_id), 'speed_limit': speed_limit, 'road_type': 'primary', 'nodes': [Decimal(1), Decimal(2)]}
+
+
+@pytest.fixture
+def local(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / "segment_store.sqlite"))
+    yield backend
+    backend.close()
+
+
+def test_items_round_trip_with_decimals(local):
+    items = [segment(i) for i in range(1, 150)]
+    local.put_items(SEGMENTS, items)
+    found = local.get_items(SEGMENTS, [{'road_segment_id': i} for i in range(0, 200)])
+    assert sorted(found, key=lambda item: item['road_segment_id']) == items
+    assert all(isinstance(item['speed_limit'], Decimal) for item in found)
+
+
+def test_items_persist_across_connections(tmp_path):
+    path = str(tmp_path / "segment_store.sqlite")
+    backend = SQLiteBackend(path)
+    backend.put_items(SEGMENTS, [segment(7)])
+    backend.close()
+
+    backend = SQLiteBackend(path)
+    assert backend.get_items(SEGMENTS, [{'road_segment_id': 7}]) == [segment(7)]
+    backend.close()
+
+
+def test_composite_keys_put_replace_and_delete(local):
+    event = {'road_segment_id': Decimal(5), 'timestamp#user_id': '1738593748#u1', 'speed': Decimal("61.5")}
+    other = {'road_segment_id': Decimal(5), 'timestamp#user_id': '1738593749#u1', 'speed': Decimal(60)}
+    response = local.batch_write_item({EVENTS: [{'PutRequest': {'Item': event}}, {'PutRequest': {'Item': other}}]})
+    assert response == {'UnprocessedItems': {}}
+
+    replaced = dict(event, speed=Decimal(70))
+    local.batch_write_item({EVENTS: [{'PutRequest': {'Item': replaced}}]})
+    local.batch_write_item({EVENTS: [{'DeleteRequest': {'Key': {'road_segment_id': 5, 'timestamp#user_id': '1738593749#u1'}}}]})
+    keys = [{'road_segment_id': 5, 'timestamp#user_id': '1738593748#u1'}, {'road_segment_id': 5, 'timestamp#user_id': '1738593749#u1'}]
+    assert local.batch_get_item({EVENTS: {'Keys': keys}}) == {'Responses': {EVENTS: [replaced]}, 'UnprocessedKeys': {}}
+
+
+def test_max_age_skips_old_items(local, monkeypatch):
+    now = local_store.time.time()
+    monkeypatch.setattr(local_store.time, "time", lambda: now - 100)
+    local.put_items(SEGMENTS, [segment(1)])
+    monkeypatch.setattr(local_store.time, "time", lambda: now)
+    local.put_items(SEGMENTS, [segment(2)])
+
+    keys = [{'road_segment_id': 1}, {'road_segment_id': 2}]
+    assert local.get_items(SEGMENTS, keys, max_age_seconds=50) == [segment(2)]
+    assert len(local.get_items(SEGMENTS, keys)) == 2
+
+
+def test_tiered_reads_are_served_locally_after_first_read(local):
+    remote = InMemoryBackend()
+    remote.batch_write_item({SEGMENTS: [{'PutRequest': {'Item': segment(i)}} for i in range(1, 11)]})
+    tiered = TieredBackend(local, remote)
+    keys = [{'road_segment_id': i} for i in range(1, 13)]
+
+    first = tiered.batch_get_item({SEGMENTS: {'Keys': keys}})
+    assert (tiered.local_hits, tiered.remote_reads) == (0, 10)
+    second = tiered.batch_get_item({SEGMENTS: {'Keys': keys}})
+    assert (tiered.local_hits, tiered.remote_reads) == (10, 10)
+
+    by_id = lambda response: sorted(response['Responses'][SEGMENTS], key=lambda item: item['road_segment_id'])
+    assert by_id(first) == by_id(second) == [segment(i) for i in range(1, 11)]
+
+
+def test_tiered_reads_refresh_stale_local_items(local):
+    remote = InMemoryBackend()
+    remote.batch_write_item({SEGMENTS: [{'PutRequest': {'Item': segment(1, Decimal(45))}}]})
+    local.put_items(SEGMENTS, [segment(1, Decimal(30))])
+    tiered = TieredBackend(local, remote, max_age_seconds=-1) # Everything local is stale
+
+    assert tiered.batch_get_item({SEGMENTS: {'Keys': [{'road_segment_id': 1}]}})['Responses'][SEGMENTS] == [segment(1, Decimal(45))]
+    assert local.get_items(SEGMENTS, [{'road_segment_id': 1}]) == [segment(1, Decimal(45))]
+
+
+def test_tiered_writes_apply_locally_only_what_remote_accepted(local):
+    item = segment(3)
+    rejecting = TieredBackend(local, InMemoryBackend(unprocessed_rate=1.0))
+    response = rejecting.batch_write_item({SEGMENTS: [{'PutRequest': {'Item': item}}]})
+    assert response['UnprocessedItems'] == {SEGMENTS: [{'PutRequest': {'Item': item}}]}
+    assert local.get_items(SEGMENTS, [{'road_segment_id': 3}]) == []
+
+    remote = InMemoryBackend()
+    TieredBackend(local, remote).batch_write_item({SEGMENTS: [{'PutRequest': {'Item': item}}]})
+    assert local.get_items(SEGMENTS, [{'road_segment_id': 3}]) == [item]
+    assert remote.tables[SEGMENTS][(Decimal(3),)] == item
+
+
+def test_uncached_tables_only_go_to_remote(local):
+    remote = InMemoryBackend()
+    tiered = TieredBackend(local, remote)
+    event = {'road_segment_id': Decimal(5), 'timestamp#user_id': '1738593748#u1'}
+    tiered.batch_write_item({EVENTS: [{'PutRequest': {'Item': event}}]})
+    assert local.get_items(EVENTS, [event]) == []
+    assert tiered.batch_get_item({EVENTS: {'Keys': [event]}})['Responses'] == {EVENTS: [event]}
+
+
+def test_bulk_client_over_tiered_backend(local):
+    remote = InMemoryBackend()
+    client = BulkClient(TieredBackend(local, remote))
+    assert client.batch_write(SEGMENTS, [{'PutRequest': {'Item': segment(i)}} for i in range(1, 260)]) == []
+    found = client.batch_get(SEGMENTS, 'road_segment_id', [Decimal(i) for i in range(1, 300)])
+    assert sorted(found) == list(range(1, 260))
+    assert len(remote.tables[SEGMENTS]) == 259
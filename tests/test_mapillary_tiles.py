@@ -0,0 +1,22 @@
+import os
+import threading
+from mapillary_tiles import MapillarySignCache
+
+
+def test_concurrent_fetches_of_one_tile_leave_a_whole_file(tmp_path):
+    signs = [{"id": str(i), "speed_limit": 45, "geometry": {"coordinates": [-95.7, 29.7]}} for i in range(2000)]
+    barrier = threading.Barrier(8)
+
+    def fetch(lat_min, lon_min, lat_max, lon_max):
+        barrier.wait() # Every thread writes the tile at the same time
+        return signs
+
+    cache = MapillarySignCache(fetch, cache_dir=str(tmp_path))
+    threads = [threading.Thread(target=cache.load_or_fetch, args=((2970, -9570),)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert os.listdir(tmp_path) == ["2970_-9570.json"]
+    assert cache.load((2970, -9570)) == signs
@@ -0,0 +1,99 @@
+import threading
+import time
+import pytest
+import mapquest_cache
+from mapquest_cache import MapQuestCache
+
+
+class CountingLookup:
+    def __init__(self, result=35, delay=0):
+        self.result = result
+        self.delay = delay
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def __call__(self, coord):
+        with self.lock:
+            self.calls.append(coord)
+        time.sleep(self.delay)
+        if isinstance(self.result, Exception):
+            raise self.result
+        return self.result
+
+
+def test_hits_by_segment_and_by_cell():
+    lookup = CountingLookup()
+    cache = MapQuestCache(lookup)
+    assert cache.get_speed_limit(1, (29.71001, -95.72001)) == 35
+    assert cache.get_speed_limit(1, (29.8, -95.8)) == 35 # Same segment elsewhere
+    assert cache.get_speed_limit(2, (29.71004, -95.72004)) == 35 # Same cell, other segment
+    assert len(lookup.calls) == 1
+    assert (cache.api_calls, cache.hits) == (1, 2)
+
+    assert cache.get_speed_limit(3, (29.7102, -95.7202)) == 35
+    assert len(lookup.calls) == 2
+
+
+def test_concurrent_requests_share_one_lookup():
+    lookup = CountingLookup(delay=0.2)
+    cache = MapQuestCache(lookup)
+    barrier = threading.Barrier(8)
+    results = []
+
+    def request():
+        barrier.wait()
+        results.append(cache.get_speed_limit(1, (29.71, -95.72)))
+
+    threads = [threading.Thread(target=request) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [35] * 8
+    assert len(lookup.calls) == 1
+    assert cache.api_calls + cache.hits + cache.coalesced == 8
+
+
+@pytest.mark.parametrize("result", ["Error: 403", "Request failed"])
+def test_error_messages_are_not_cached(result):
+    lookup = CountingLookup(result)
+    cache = MapQuestCache(lookup)
+    assert cache.get_speed_limit(1, (29.71, -95.72)) == result
+    assert cache.get_speed_limit(1, (29.71, -95.72)) == result
+    assert len(lookup.calls) == 2
+
+
+def test_unknown_is_cached():
+    lookup = CountingLookup("Unknown")
+    cache = MapQuestCache(lookup)
+    cache.get_speed_limit(1, (29.71, -95.72))
+    assert cache.get_speed_limit(1, (29.71, -95.72)) == "Unknown"
+    assert len(lookup.calls) == 1
+
+
+def test_lookup_exceptions_propagate_and_are_not_cached():
+    lookup = CountingLookup(ConnectionError("timed out"))
+    cache = MapQuestCache(lookup)
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            cache.get_speed_limit(1, (29.71, -95.72))
+    assert len(lookup.calls) == 2
+    assert not cache.in_flight
+
+
+def test_results_expire():
+    lookup = CountingLookup()
+    cache = MapQuestCache(lookup, ttl_seconds=-1)
+    cache.get_speed_limit(1, (29.71, -95.72))
+    cache.get_speed_limit(1, (29.71, -95.72))
+    assert len(lookup.calls) == 2
+
+
+def test_oldest_entries_are_evicted(monkeypatch):
+    monkeypatch.setattr(mapquest_cache, "MAPQUEST_CACHE_MAX_ENTRIES", 4)
+    lookup = CountingLookup()
+    cache = MapQuestCache(lookup)
+    for segment_id in range(3): # Two entries each, segment and cell
+        cache.get_speed_limit(segment_id, (29.71 + segment_id * 0.01, -95.72))
+    assert len(cache.results) == 4
+    assert ("segment", 0) not in cache.results and ("segment", 2) in cache.results
@@ -0,0 +1,112 @@
+import json
+import os
+import threading
+import numpy as np
+from overpass_cache import OverpassCache
+
+
+def world(seed=0, count=300):
+    rng = np.random.default_rng(seed)
+    elements = []
+    for way_id in range(count):
+        lat, lon = 29.70 + rng.uniform(0, 0.03), -95.73 + rng.uniform(0, 0.03)
+        size = rng.uniform(0, 0.004, size=2)
+        elements.append({"id": way_id, "bounds": {"minlat": lat, "minlon": lon, "maxlat": lat + size[0], "maxlon": lon + size[1]}})
+    return elements
+
+
+def overlaps(element, lat_min, lon_min, lat_max, lon_max):
+    b = element["bounds"]
+    return b["minlat"] <= lat_max and b["maxlat"] >= lat_min and b["minlon"] <= lon_max and b["maxlon"] >= lon_min
+
+
+class Overpass:
+    def __init__(self, elements, fail=False):
+        self.elements = elements
+        self.fail = fail
+        self.queries = []
+        self.lock = threading.Lock()
+
+    def __call__(self, bboxes):
+        with self.lock:
+            self.queries.append(bboxes)
+        if self.fail:
+            return None
+        return [element for element in self.elements if any(overlaps(element, *bbox) for bbox in bboxes)]
+
+
+BBOX = (29.705, -95.725, 29.718, -95.712)
+
+
+def ids(elements):
+    return sorted(element["id"] for element in elements)
+
+
+def test_matches_direct_query_and_is_served_from_memory_then_disk(tmp_path):
+    elements = world()
+    overpass = Overpass(elements)
+    cache = OverpassCache(overpass, str(tmp_path))
+    expected = ids(element for element in elements if overlaps(element, *BBOX))
+
+    assert ids(cache.get_road_segments(*BBOX)) == expected
+    api_calls = len(overpass.queries)
+    assert api_calls == cache.api_calls > 0
+    assert ids(cache.get_road_segments(*BBOX)) == expected
+    assert len(overpass.queries) == api_calls
+    assert cache.hits == cache.misses
+
+    reopened = OverpassCache(overpass, str(tmp_path))
+    assert ids(reopened.get_road_segments(*BBOX)) == expected
+    assert len(overpass.queries) == api_calls
+    assert reopened.disk_bytes == cache.disk_bytes
+
+
+def test_only_missing_cells_are_fetched(tmp_path):
+    overpass = Overpass(world())
+    cache = OverpassCache(overpass, str(tmp_path))
+    cache.get_road_segments(29.705, -95.725, 29.709, -95.721) # Inside BBOX
+    first_cells = set(cache.memory)
+    cache.reset_stats()
+    cache.get_road_segments(*BBOX)
+    assert cache.hits == len(first_cells) > 0
+    assert cache.misses == len(cache.memory) - len(first_cells) > 0
+
+
+def test_failed_queries_are_not_cached(tmp_path):
+    overpass = Overpass(world(), fail=True)
+    cache = OverpassCache(overpass, str(tmp_path))
+    assert cache.get_road_segments(*BBOX) == []
+    assert os.listdir(tmp_path) == []
+    overpass.fail = False
+    assert cache.get_road_segments(*BBOX)
+
+
+def test_budgets_evict_least_recently_used(tmp_path):
+    cache = OverpassCache(Overpass(world()), str(tmp_path), memory_budget_bytes=2000, disk_budget_bytes=6000)
+    cache.get_road_segments(*BBOX)
+    assert cache.memory_bytes <= 2000 or len(cache.memory) == 1
+    disk_bytes = sum(entry.stat().st_size for entry in os.scandir(tmp_path))
+    assert disk_bytes == cache.disk_bytes <= 6000
+
+
+def test_truncated_cell_files_are_refetched(tmp_path):
+    overpass = Overpass(world())
+    cache = OverpassCache(overpass, str(tmp_path))
+    expected = ids(cache.get_road_segments(*BBOX))
+    api_calls = len(overpass.queries)
+
+    # A cell file cut short, as a crash mid-write used to leave behind
+    path = sorted(tmp_path.glob("*.json"))[0]
+    path.write_text(path.read_text()[:10])
+    reopened = OverpassCache(overpass, str(tmp_path))
+    assert ids(reopened.get_road_segments(*BBOX)) == expected
+    assert len(overpass.queries) > api_calls
+    assert reopened.misses == 1
+    json.loads(path.read_text()) # Stored again, whole
+    assert reopened.disk_bytes == sum(entry.stat().st_size for entry in os.scandir(tmp_path))
+
+
+def test_writes_leave_no_temporary_files(tmp_path):
+    cache = OverpassCache(Overpass(world()), str(tmp_path))
+    cache.get_road_segments(*BBOX)
+    assert all(name.endswith(".json") for name in os.listdir(tmp_path))
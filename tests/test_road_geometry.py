@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+from geopy.distance import geodesic
+from shapely.geometry import LineString, Point
+from shapely.ops import nearest_points
+from road_geometry import LocalProjection, ellipsoidal_distance, point_to_polyline_distances, step_distances
+
+
+def shapely_distance(point, road_coords):
+    """The per-segment shapely and geodesic loop the kernel replaced."""
+    location = Point(point[1], point[0])
+    min_distance = float('inf')
+    for i in range(len(road_coords) - 1):
+        segment = LineString([(road_coords[i][1], road_coords[i][0]), (road_coords[i + 1][1], road_coords[i + 1][0])])
+        nearest_point = nearest_points(segment, location)[0]
+        min_distance = min(min_distance, geodesic((point[0], point[1]), (nearest_point.y, nearest_point.x)).meters)
+    return min_distance
+
+
+def random_road(rng, center=(29.71, -95.72)):
+    vertices = np.array(center) + np.cumsum(rng.uniform(-3e-4, 3e-4, size=(rng.integers(2, 8), 2)), axis=0)
+    points = vertices.mean(axis=0) + rng.uniform(-5e-4, 5e-4, size=(20, 2))
+    return points, vertices
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_distances_match_shapely_and_geodesic(seed):
+    points, vertices = random_road(np.random.default_rng(seed))
+    distances, projected = point_to_polyline_distances(points, vertices)
+    expected = [shapely_distance(point, vertices) for point in points]
+    assert distances == pytest.approx(expected, abs=1e-3)
+    # The reported nearest point is the one the distance was measured to
+    assert ellipsoidal_distance(points[:, 0], points[:, 1], projected[:, 0], projected[:, 1]) == pytest.approx(distances)
+
+
+def test_ellipsoidal_distance_matches_geodesic():
+    rng = np.random.default_rng(0)
+    start = np.array([29.71, -95.72]) + rng.uniform(-1, 1, size=(200, 2))
+    end = start + rng.uniform(-3e-3, 3e-3, size=(200, 2))
+    expected = [geodesic(a, b).meters for a, b in zip(start, end)]
+    assert ellipsoidal_distance(start[:, 0], start[:, 1], end[:, 0], end[:, 1]) == pytest.approx(expected, abs=1e-3)
+
+
+def test_step_distances():
+    lat, lon = np.array([29.71, 29.711, 29.711, 29.7125]), np.array([-95.72, -95.72, -95.7215, -95.7215])
+    expected = [geodesic((lat[i], lon[i]), (lat[i + 1], lon[i + 1])).meters for i in range(3)]
+    assert step_distances(lat, lon) == pytest.approx(expected, abs=1e-3)
+    assert len(step_distances(lat[:1], lon[:1])) == 0
+
+
+def test_degenerate_polylines():
+    points = np.array([[29.71, -95.72], [29.7105, -95.7201]])
+    distances, projected = point_to_polyline_distances(points, [[29.7101, -95.7201]])
+    assert np.isinf(distances).all() and np.isnan(projected).all()
+
+    # A zero-length segment measures to its vertex
+    distances, _ = point_to_polyline_distances(points, [[29.7101, -95.7201], [29.7101, -95.7201]])
+    assert distances == pytest.approx([geodesic(point, (29.7101, -95.7201)).meters for point in points], abs=1e-3)
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_planar_distances_stay_within_projection_error(seed):
+    rng = np.random.default_rng(seed)
+    points, vertices = random_road(rng, center=(29.71 + rng.uniform(-0.25, 0.25), -95.72))
+    projection = LocalProjection(29.71, -95.72)
+    everything = np.vstack((points, vertices))
+    relative_error = projection.max_relative_error(everything[:, 0].min(), everything[:, 0].max())
+
+    planar, projected = point_to_polyline_distances(points, vertices, projection)
+    # True distance to the polyline, measured to points every few centimeters along it
+    t = np.linspace(0, 1, 2001)[:, None]
+    samples = np.vstack([start + t * (end - start) for start, end in zip(vertices[:-1], vertices[1:])])
+    true_distances = ellipsoidal_distance(points[:, None, 0], points[:, None, 1], samples[:, 0], samples[:, 1]).min(axis=1)
+    assert np.all(np.abs(planar - true_distances) <= relative_error * true_distances + 2e-3)
+    assert np.all(np.isfinite(projected))
+
+
+def test_projection_round_trip():
+    projection = LocalProjection.from_bounds(29.5, 30.0, -96.0, -95.5)
+    coords = np.array([[29.75, -95.75], [29.5, -96.0], [30.0, -95.5]])
+    assert projection.to_lat_lon(projection.to_xy(coords)) == pytest.approx(coords, abs=1e-12)
+    assert projection.to_xy(coords[0])[0] == pytest.approx([0, 0])
@@ -0,0 +1,65 @@
+import numpy as np
+from conftest import way
+from road_matching import IncrementalRoadMatcher
+from segment_table import SegmentTable
+
+
+# Ways 1 and 2 meet at node 2, way 3 runs parallel to them 100 m north
+ELEMENTS = [
+    way(1, [(29.7100, -95.7200), (29.7100, -95.7190)], [1, 2], highway="residential"),
+    way(2, [(29.7100, -95.7190), (29.7100, -95.7180)], [2, 3], highway="residential"),
+    way(3, [(29.7109, -95.7200), (29.7109, -95.7180)], [4, 5], highway="residential"),
+]
+
+
+class NearestRoad:
+    def __init__(self, table):
+        self.table = table
+        self.calls = []
+
+    def __call__(self, user_coords, positions, road_index):
+        self.calls.append(list(np.asarray(positions).tolist()))
+        distances = self.table.distances(user_coords, positions)
+        nearest = int(np.argmin(distances))
+        return self.table.road(positions[nearest], float(distances[nearest]))
+
+
+def matcher():
+    table = SegmentTable(ELEMENTS)
+    find_nearest = NearestRoad(table)
+    road_matcher = IncrementalRoadMatcher(find_nearest)
+    road_matcher.set_road_segments(table, [2, 1, 0])
+    return road_matcher, find_nearest
+
+
+def test_follows_the_road_and_its_neighbours():
+    road_matcher, find_nearest = matcher()
+    trace = [(29.71002, -95.7198), (29.71002, -95.7192), (29.71002, -95.7185), (29.71002, -95.7182)]
+    assert [road_matcher.match(point)["id"] for point in trace] == [1, 1, 2, 2]
+    assert (road_matcher.full_searches, road_matcher.sticky_matches) == (1, 3)
+    # After the first full search, only the previous road and the ones sharing a node with it, in batch order
+    assert find_nearest.calls == [[2, 1, 0], [1, 0], [1, 0], [1, 0]]
+
+
+def test_full_search_past_threshold():
+    road_matcher, find_nearest = matcher()
+    assert road_matcher.match((29.71002, -95.7195))["id"] == 1
+    assert road_matcher.match((29.71088, -95.7195))["id"] == 3
+    assert road_matcher.full_searches == 2
+    assert find_nearest.calls[-1] == [2, 1, 0]
+
+
+def test_full_search_when_previous_road_left_the_batch():
+    road_matcher, find_nearest = matcher()
+    road_matcher.match((29.71002, -95.7195))
+    road_matcher.set_road_segments(road_matcher.road_table, [2, 1])
+    assert road_matcher.match((29.71002, -95.7185))["id"] == 2
+    assert road_matcher.full_searches == 2
+    assert find_nearest.calls[-1] == [2, 1]
+
+
+def test_no_match_resets_previous_road():
+    road_matcher = IncrementalRoadMatcher(lambda user_coords, positions, road_index: None)
+    road_matcher.set_road_segments(SegmentTable(ELEMENTS), [0, 1, 2])
+    assert road_matcher.match((29.71, -95.72)) is None
+    assert road_matcher.previous_road_id is None
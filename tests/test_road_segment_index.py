@@ -0,0 +1,89 @@
+import json
+import os
+import numpy as np
+import pytest
+from conftest import way
+from geopy.distance import geodesic
+from road_geometry import point_to_polyline_distances
+from road_segment_index import RoadSegmentIndex, SpeedSignIndex, search_box, search_boxes
+from road_tile_store import OSM_SPEED_RESPONSE_BBOX
+from segment_table import SegmentTable
+
+OSM_SPEED_RESPONSE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Data_Source_JSON", "osm_speed_response_data.json")
+
+
+
+@pytest.mark.parametrize("lat", [0.0, 29.71, -45.0, 60.0, 80.0])
+def test_search_box_contains_the_whole_radius(lat):
+    min_lon, min_lat, max_lon, max_lat = search_box((lat, -95.72), 50)
+    for bearing in range(0, 360, 5):
+        destination = geodesic(meters=50).destination((lat, -95.72), bearing)
+        assert min_lat <= destination.latitude <= max_lat
+        assert min_lon <= destination.longitude <= max_lon
+
+
+def test_search_boxes_match_search_box():
+    lat, lon = np.array([0.0, 29.71, -45.0, 60.0]), np.array([-95.72, -95.71, 12.0, 0.0])
+    boxes = np.column_stack(search_boxes(lat, lon, 30))
+    assert boxes.tolist() == [list(search_box(coords, 30)) for coords in zip(lat, lon)]
+
+
+def test_query_finds_every_road_within_radius():
+    rng = np.random.default_rng(0)
+    elements = []
+    for way_id in range(1, 201):
+        start = np.array([29.71, -95.72]) + rng.uniform(0, 0.01, size=2)
+        elements.append(way(way_id, [tuple(point) for point in start + np.cumsum(rng.uniform(-2e-4, 2e-4, size=(rng.integers(1, 5), 2)), axis=0)], highway="residential"))
+    table = SegmentTable(elements)
+    positions = rng.permutation(len(elements))[:150]
+    index = RoadSegmentIndex(table, positions)
+
+    roads_within_radius = 0
+    for user_coords in np.array([29.71, -95.72]) + rng.uniform(0, 0.01, size=(100, 2)):
+        user_coords = tuple(user_coords)
+        found = index.query(user_coords, 30)
+        within_radius = positions[table.distances(user_coords, positions) <= 30]
+        roads_within_radius += len(within_radius)
+        assert set(within_radius.tolist()) <= set(found.tolist())
+        # Batch order is kept, single vertex roads are left out
+        order = {position: i for i, position in enumerate(positions.tolist())}
+        assert [order[position] for position in found.tolist()] == sorted(order[position] for position in found.tolist())
+        assert all(len(elements[position]["geometry"]) >= 2 for position in found.tolist())
+    assert roads_within_radius > 0
+
+
+def test_query_matches_brute_force_on_the_bundled_dump():
+    with open(OSM_SPEED_RESPONSE_PATH) as file:
+        elements = json.load(file)["elements"]
+    table = SegmentTable(elements)
+    positions = np.arange(len(elements))
+    index = RoadSegmentIndex(table, positions)
+
+    rng = np.random.default_rng(0)
+    lat_min, lon_min, lat_max, lon_max = OSM_SPEED_RESPONSE_BBOX
+    roads_within_radius = 0
+    for user_coords in zip(rng.uniform(lat_min, lat_max, 100), rng.uniform(lon_min, lon_max, 100)):
+        # Every way measured on its own, no index and no SegmentTable batching
+        brute_force = np.array([point_to_polyline_distances([user_coords], table.way_coords(position))[0][0] for position in positions])
+        found = index.query(user_coords, 30)
+        roads_within_radius += int((brute_force <= 30).sum())
+        assert set(np.flatnonzero(brute_force <= 30).tolist()) <= set(found.tolist())
+        # The nearest road is found whenever it is within the radius
+        if brute_force.min() <= 30:
+            assert brute_force[found].min() == brute_force.min()
+    assert roads_within_radius > 0
+
+
+def test_empty_index():
+    table = SegmentTable([way(1, [(29.71, -95.72)], highway="residential")])
+    assert len(RoadSegmentIndex(table, [0]).query((29.71, -95.72), 30)) == 0
+    assert len(RoadSegmentIndex(table, []).query((29.71, -95.72), 30)) == 0
+
+
+def test_speed_signs_inside_bounds():
+    signs = [{"id": i, "geometry": {"coordinates": [lon, lat]}} for i, (lat, lon) in enumerate(
+        [(29.71, -95.72), (29.7105, -95.7205), (29.72, -95.72), (29.711, -95.721)]
+    )]
+    bounds = {"minlat": 29.71, "minlon": -95.721, "maxlat": 29.711, "maxlon": -95.72}
+    assert [sign["id"] for sign in SpeedSignIndex(signs).query(bounds)] == [0, 1, 3]
+    assert SpeedSignIndex([]).query(bounds) == []
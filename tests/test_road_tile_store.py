@@ -0,0 +1,85 @@
+import json
+import os
+import numpy as np
+import pytest
+from road_tile_store import OSM_SPEED_RESPONSE_BBOX, RoadTileStore, build_tile_store, covered_tiles, tile_range
+
+OSM_DUMP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Data_Source_JSON", "osm_speed_response_data.json")
+
+DUMP_BBOX = (29.70, -95.74, 29.74, -95.70)
+
+
+def dump_elements(seed=0, count=200):
+    rng = np.random.default_rng(seed)
+    elements = []
+    for way_id in range(1, count + 1):
+        start = np.array([29.702, -95.738]) + rng.uniform(0, 0.035, size=2)
+        coords = start + np.cumsum(rng.uniform(-0.002, 0.002, size=(rng.integers(1, 6), 2)), axis=0)
+        tags = {"highway": str(rng.choice(["primary", "residential"]))}
+        if rng.random() < 0.5:
+            tags["maxspeed"] = f"{rng.integers(2, 7) * 5} mph"
+        if rng.random() < 0.5:
+            tags["name"] = f"Street {way_id % 7}"
+        elements.append({
+            "type": "way",
+            "id": way_id,
+            "bounds": {"minlat": coords[:, 0].min(), "minlon": coords[:, 1].min(), "maxlat": coords[:, 0].max(), "maxlon": coords[:, 1].max()},
+            "nodes": [way_id * 100 + i for i in range(len(coords))],
+            "geometry": [{"lat": lat, "lon": lon} for lat, lon in coords.tolist()],
+            "tags": tags,
+        })
+    return elements
+
+
+@pytest.fixture
+def store(tmp_path):
+    elements = dump_elements()
+    dump_path = tmp_path / "dump.json"
+    dump_path.write_text(json.dumps({"elements": elements + [{"type": "node", "id": 1}]}))
+    ways_count, tiles_count = build_tile_store([(str(dump_path), DUMP_BBOX)], str(tmp_path / "road_tiles"))
+    assert ways_count == len(elements)
+    assert tiles_count == len(covered_tiles(*DUMP_BBOX))
+    return RoadTileStore.open(str(tmp_path / "road_tiles")), elements
+
+
+def intersects(element, lat_min, lon_min, lat_max, lon_max):
+    b = element["bounds"]
+    return b["minlat"] <= lat_max and b["maxlat"] >= lat_min and b["minlon"] <= lon_max and b["maxlon"] >= lon_min
+
+
+@pytest.mark.parametrize("bbox", [(29.705, -95.735, 29.712, -95.721), (29.71, -95.73, 29.73, -95.71), DUMP_BBOX])
+def test_segments_match_the_dump(store, bbox):
+    road_tile_store, elements = store
+    expected = [element for element in elements if intersects(element, *bbox)]
+    assert road_tile_store.covers(*bbox) == all(tile in covered_tiles(*DUMP_BBOX) for tile in tile_range(*bbox))
+    if road_tile_store.covers(*bbox):
+        assert sorted(road_tile_store.get_road_segments(*bbox), key=lambda element: element["id"]) == expected
+
+
+def test_partially_covered_tiles_are_not_cached(store):
+    road_tile_store, _ = store
+    assert road_tile_store.covers(29.705, -95.735, 29.712, -95.721)
+    assert not road_tile_store.covers(29.699, -95.735, 29.712, -95.721)
+
+
+def test_open_without_store(tmp_path):
+    assert RoadTileStore.open(str(tmp_path / "missing")) is None
+
+
+def test_tile_ranges():
+    assert tile_range(29.705, -95.715, 29.715, -95.705) == [(2970, -9572), (2970, -9571), (2971, -9572), (2971, -9571)]
+    assert covered_tiles(29.705, -95.715, 29.725, -95.695) == [(2971, -9571)] # -95.70..-95.69 sticks out
+
+
+def test_only_tiles_inside_the_query_are_cached(tmp_path):
+    build_tile_store([(OSM_DUMP_PATH, OSM_SPEED_RESPONSE_BBOX)], str(tmp_path / "road_tiles"))
+    road_tile_store = RoadTileStore.open(str(tmp_path / "road_tiles"))
+    assert list(road_tile_store.tile_lookup) == [(2971, -9575)]
+    # Whole ways reach up to 29.738 and -95.7165, far past the 1 km query around the dump's center
+    assert not road_tile_store.covers(29.73, -95.73, 29.735, -95.72)
+
+
+def test_dumps_need_their_query_bbox(tmp_path):
+    with pytest.raises(ValueError):
+        build_tile_store([OSM_DUMP_PATH], str(tmp_path / "road_tiles"))
+    assert RoadTileStore.open(str(tmp_path / "road_tiles")) is None
@@ -0,0 +1,61 @@
+from decimal import Decimal
+from segment_cache import SegmentCache, item_size, read_units
+
+
+def record(segment_id, updated_at=0, speed_limit=35):
+    return {'road_segment_id': segment_id, 'osm_speed_limit': Decimal(speed_limit), 'road_type': 'primary', 'updated_at': updated_at}
+
+
+class Table:
+    def __init__(self, records):
+        self.records = {item['road_segment_id']: item for item in records}
+        self.requests = []
+
+    def __call__(self, segment_ids):
+        self.requests.append(list(segment_ids))
+        return {segment_id: self.records[segment_id] for segment_id in segment_ids if segment_id in self.records}
+
+
+def test_reads_through_once():
+    table = Table([record(i) for i in range(5)])
+    cache = SegmentCache(table)
+    assert cache.get_many([1, 2, 9]) == {1: record(1), 2: record(2)}
+    assert cache.get_many([1, 2, 3]) == {1: record(1), 2: record(2), 3: record(3)}
+    assert table.requests == [[1, 2, 9], [3]]
+    assert (cache.hits, cache.misses) == (2, 4)
+    assert cache.read_units_saved == 2 * read_units(record(1))
+
+
+def test_write_through_keeps_the_newer_record():
+    table = Table([])
+    cache = SegmentCache(table)
+    cache.put_many([record(1, updated_at=10, speed_limit=45)])
+    cache.put(record(1, updated_at=5, speed_limit=30))
+    assert cache.get_many([1]) == {1: record(1, updated_at=10, speed_limit=45)}
+    cache.put(record(1, updated_at=11, speed_limit=50))
+    assert cache.get_many([1])[1]['osm_speed_limit'] == 50
+    assert table.requests == []
+
+
+def test_expired_records_are_read_again():
+    table = Table([record(1)])
+    cache = SegmentCache(table, ttl_seconds=-1)
+    cache.get_many([1])
+    cache.get_many([1])
+    assert table.requests == [[1], [1]]
+
+
+def test_least_recently_used_are_evicted_past_budget():
+    table = Table([record(i) for i in range(4)])
+    cache = SegmentCache(table, budget_bytes=3 * item_size(record(0)))
+    cache.get_many([0, 1, 2])
+    cache.get_many([0]) # 1 is now the least recently used
+    cache.get_many([3])
+    assert list(cache.items) == [2, 0, 3]
+    assert cache.size_bytes == 3 * item_size(record(0))
+
+
+def test_item_size_counts_number_digits():
+    assert item_size({'a': Decimal("12345")}) == 1 + 3
+    assert item_size({'name': 'abc'}) == 4 + 3
+    assert read_units({'a': 'x' * 5000}) == 1.0
@@ -0,0 +1,50 @@
+from decimal import Decimal
+import numpy as np
+from conftest import way
+from road_geometry import LocalProjection, point_to_polyline_distances
+from segment_table import UNKNOWN_SPEED_LIMIT, SegmentTable
+
+
+ELEMENTS = [
+    way(1, [(29.7100, -95.7200), (29.7105, -95.7210), (29.7110, -95.7215)], maxspeed="37.3 mph", highway="primary", name="Main"),
+    way(2, [(29.7120, -95.7190), (29.7125, -95.7180)], maxspeed="50", highway="residential"),
+    way(3, [(29.7130, -95.7170), (29.7130, -95.7170), (29.7140, -95.7160)], highway="service"),
+    way(4, [(29.7150, -95.7150)], maxspeed="25 mph"),
+]
+
+
+def test_osm_speed_limits_keep_their_exact_value():
+    table = SegmentTable(ELEMENTS)
+    assert table.osm_speed_limit(0) == 37.3
+    assert Decimal(str(table.road(0)["osm_speed_limit"])) == Decimal("37.3")
+    assert table.osm_speed_limit(1) == "50"
+    assert table.osm_speed_limit(2) == UNKNOWN_SPEED_LIMIT
+
+
+def test_road_matches_element():
+    road = SegmentTable(ELEMENTS).road(0, 1.5)
+    assert road["id"] == 1
+    assert road["road_name"] == "Main"
+    assert road["road_type"] == "primary"
+    assert road["distance_meters"] == 1.5
+    assert road["geometry"] == ELEMENTS[0]["geometry"]
+    assert road["bounds"] == ELEMENTS[0]["bounds"]
+
+
+def test_distances_match_point_to_polyline_distances():
+    table = SegmentTable(ELEMENTS)
+    positions = np.arange(len(ELEMENTS))
+    user_coords = (29.7118, -95.7195)
+    projection = LocalProjection(29.712, -95.718)
+    for mode in (None, projection):
+        distances = table.distances(user_coords, positions, mode)
+        for position in positions[:3]:
+            expected, _ = point_to_polyline_distances([user_coords], table.way_coords(position).tolist(), mode)
+            assert distances[position] == expected[0]
+        assert distances[3] == np.inf # A single vertex has no segment
+
+
+def test_neighbours_share_nodes():
+    elements = [way(1, [(29.71, -95.72), (29.72, -95.72)]), way(2, [(29.72, -95.72), (29.73, -95.72)])]
+    elements[1]["nodes"][0] = elements[0]["nodes"][-1]
+    assert SegmentTable(elements).neighbours(0) == {0, 1}
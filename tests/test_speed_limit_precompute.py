@@ -0,0 +1,115 @@
+import threading
+import numpy as np
+from road_tile_store import tile_range
+from segment_cache import SegmentCache
+from speed_limit_precompute import RegionPrecomputer, load_completed_tiles, region_tiles
+from speed_limit_resolver import SpeedLimitResolver
+
+CELL_SIZE = 0.005
+REGION = (29.70, -95.73, 29.7299, -95.7001) # 3 x 3 tiles
+
+
+def world(seed=0, count=150):
+    rng = np.random.default_rng(seed)
+    elements = []
+    for way_id in range(1, count + 1):
+        start = np.array([29.69, -95.74]) + rng.uniform(0, 0.05, size=2)
+        coords = start + np.cumsum(rng.uniform(-0.004, 0.004, size=(rng.integers(2, 5), 2)), axis=0)
+        tags = {"highway": "footway" if way_id % 10 == 0 else "residential"}
+        if way_id % 3 == 0:
+            tags["maxspeed"] = "30 mph"
+        elements.append({
+            "type": "way",
+            "id": way_id,
+            "bounds": {"minlat": coords[:, 0].min(), "minlon": coords[:, 1].min(), "maxlat": coords[:, 0].max(), "maxlon": coords[:, 1].max()},
+            "nodes": [way_id * 100 + i for i in range(len(coords))],
+            "geometry": [{"lat": lat, "lon": lon} for lat, lon in coords.tolist()],
+            "tags": tags,
+        })
+    return elements
+
+
+class Store:
+    """drivenDB_road_segment_info stand-in."""
+
+    def __init__(self):
+        self.records = {}
+        self.lock = threading.Lock()
+
+    def load_many(self, segment_ids):
+        with self.lock:
+            return {segment_id: self.records[segment_id] for segment_id in segment_ids if segment_id in self.records}
+
+    def write(self, requests):
+        with self.lock:
+            for request in requests:
+                item = request["PutRequest"]["Item"]
+                assert item["road_segment_id"] not in self.records # Every way is resolved once
+                self.records[item["road_segment_id"]] = item
+        return []
+
+
+class SignCache:
+    tile_size = 0.01
+
+    def load_or_fetch(self, tile):
+        return []
+
+
+def precomputer(tmp_path, store, mapquest_lookup):
+    elements = world()
+
+    def load_cells(cells):
+        return {
+            cell: [e for e in elements if cell in tile_range(e["bounds"]["minlat"], e["bounds"]["minlon"], e["bounds"]["maxlat"], e["bounds"]["maxlon"], CELL_SIZE)]
+            for cell in cells
+        }
+
+    resolver = SpeedLimitResolver(lambda road, speed_signs, sign_index: dict(road, mapillary_speed_signs=[]), mapquest_lookup)
+    return RegionPrecomputer(
+        load_cells, SignCache(), resolver, SegmentCache(store.load_many), store.write, CELL_SIZE,
+        progress_path=str(tmp_path / "progress.jsonl"),
+    ), elements
+
+
+def test_every_drivable_way_is_resolved_once_and_runs_resume(tmp_path):
+    store = Store()
+    job, elements = precomputer(tmp_path, store, lambda segment_id, coord: 35)
+    tiles = region_tiles(*REGION)
+    assert len(tiles) == 9
+    written = job.run(tiles)
+
+    def owned(element):
+        middle = element["geometry"][len(element["geometry"]) // 2]
+        return job.tile_of(middle["lat"], middle["lon"]) in tiles and element["tags"]["highway"] != "footway"
+
+    expected = sorted(str(e["id"]) for e in elements if owned(e))
+    assert written == len(expected) > 0
+    assert sorted(store.records) == expected
+    assert all(record["resolved_by"] == "precompute" for record in store.records.values())
+    assert {record["speed_limit_source"] for record in store.records.values()} == {"osm", "mapquest"}
+    assert load_completed_tiles(job.progress_path) == set(tiles)
+
+    # A second run has nothing left to do
+    assert job.run(tiles) == 0
+
+
+def test_failed_tiles_are_retried(tmp_path):
+    store = Store()
+    failing = {"on": True}
+    job, _ = precomputer(tmp_path, store, lambda segment_id, coord: "Error: 429" if failing["on"] else 35)
+    tiles = region_tiles(*REGION)
+    job.run(tiles)
+    done = load_completed_tiles(job.progress_path)
+    assert done < set(tiles)
+
+    failing["on"] = False
+    job.run(tiles)
+    assert load_completed_tiles(job.progress_path) == set(tiles)
+
+
+def test_interrupted_progress_lines_are_ignored(tmp_path):
+    path = tmp_path / "progress.jsonl"
+    path.write_text('{"tile": [2970, -9573], "records": 4}\n{"tile": [29')
+    assert load_completed_tiles(str(path)) == {(2970, -9573)}
+    assert load_completed_tiles(str(tmp_path / "missing.jsonl")) == set()
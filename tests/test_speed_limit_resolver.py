@@ -0,0 +1,56 @@
+from decimal import Decimal
+from speed_limit_resolver import SpeedLimitResolver
+
+
+def road(segment_id, osm_speed_limit="Unknown", signs=()):
+    return {
+        "id": segment_id,
+        "road_name": f"Road {segment_id}",
+        "road_type": "residential",
+        "osm_speed_limit": osm_speed_limit,
+        "geometry": [{"lat": 29.71, "lon": -95.72}, {"lat": 29.711 + segment_id, "lon": -95.721}, {"lat": 29.712, "lon": -95.722}],
+        "signs": list(signs),
+    }
+
+
+def map_signs(road, speed_signs, sign_index):
+    road["mapillary_speed_signs"] = [{"speed_limit": speed_limit} for speed_limit in road["signs"]]
+    return road
+
+
+def resolve(roads, mapquest_results, resolved_by="trip"):
+    lookups = []
+
+    def mapquest_lookup(segment_id, coord):
+        lookups.append((segment_id, coord))
+        return mapquest_results[segment_id]
+
+    records, unknown = SpeedLimitResolver(map_signs, mapquest_lookup).resolve(
+        {r["id"]: r for r in roads}, [], resolved_by=resolved_by
+    )
+    return {record["road_segment_id"]: record for record in records}, unknown, lookups
+
+
+def test_sources_in_order_of_preference():
+    records, unknown, lookups = resolve(
+        [road(1, 37.3), road(2, signs=[30, 45]), road(3), road(4), road(5)],
+        {3: 40, 4: "Unknown", 5: 0},
+    )
+    assert unknown == 4
+    assert [(segment_id, record["speed_limit_source"]) for segment_id, record in records.items()] == [
+        (1, "osm"), (2, "mapillary"), (3, "mapquest"), (4, "none"), (5, "none"),
+    ]
+    assert records[1]["osm_speed_limit"] == Decimal("37.3")
+    assert records[2]["osm_speed_limit"] == 0 and records[2]["mapillary_speed_limit"] == 30
+    assert records[3]["mapquest_speed_limit"] == 40
+    # MapQuest is asked about the middle vertex, only for roads no sign was mapped to
+    assert sorted(lookups) == [(3, (29.711 + 3, -95.721)), (4, (29.711 + 4, -95.721)), (5, (29.711 + 5, -95.721))]
+    assert all(record["resolved_by"] == "trip" for record in records.values())
+
+
+def test_failed_mapquest_lookups_get_no_record(capsys):
+    records, unknown, _ = resolve([road(1, 25), road(2)], {2: "Error: 403"}, resolved_by="precompute")
+    assert list(records) == [1]
+    assert records[1]["resolved_by"] == "precompute"
+    assert unknown == 1
+    assert "MapQuest lookup for segment 2 failed: Error: 403" in capsys.readouterr().out
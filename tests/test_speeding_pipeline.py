@@ -0,0 +1,150 @@
+import importlib.util
+import json
+import os
+import re
+import sys
+import types
+import numpy as np
+import pytest
+import dynamodb_bulk
+import http_pool
+import speeding_pipeline
+from dynamodb_bulk import BulkClient, InMemoryBackend
+from trip_loader import TRIP_DTYPE, TripResult
+
+OSM_ELEMENTS = json.load(open(os.path.join(os.path.dirname(speeding_pipeline.SPEEDING_ALGORITHM_PATH), "Data_Source_JSON", "osm_speed_response_data.json")))["elements"]
+
+
+@pytest.fixture
+def algorithm(tmp_path, monkeypatch):
+    # Loading the algorithm creates its caches and local store in the working directory
+    monkeypatch.chdir(tmp_path)
+    return speeding_pipeline.speeding_algorithm()
+
+
+class Response:
+    status_code = 200
+
+    def __init__(self, data):
+        self.data = data
+        self.text = json.dumps(data)
+
+    def json(self):
+        return self.data
+
+
+def fake_get(url, params=None, **kwargs):
+    """Overpass answers from the bundled dump, Mapillary has no signs, MapQuest says 40 mph."""
+    if "mapillary" in url:
+        return Response({"data": []})
+    if "mapquest" in url:
+        return Response({"results": [{"locations": [{"roadMetadata": {"speedLimit": 40}}]}]})
+    bboxes = [tuple(map(float, bbox)) for bbox in re.findall(r"way\(([-\d.]+),([-\d.]+),([-\d.]+),([-\d.]+)\)", params["data"])]
+    return Response({"elements": [
+        element for element in OSM_ELEMENTS
+        if any(element["bounds"]["minlat"] <= lat_max and element["bounds"]["maxlat"] >= lat_min
+               and element["bounds"]["minlon"] <= lon_max and element["bounds"]["maxlon"] >= lon_min
+               for lat_min, lon_min, lat_max, lon_max in bboxes)
+    ]})
+
+
+@pytest.fixture
+def offline_algorithm(tmp_path, monkeypatch):
+    """A private copy of the algorithm, so no cache carries over between tests, with fake HTTP and tables."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(http_pool, "get", fake_get)
+    monkeypatch.setattr(dynamodb_bulk, "backoff", lambda attempt: None)
+    spec = importlib.util.spec_from_file_location("offline_speeding_algorithm", speeding_pipeline.SPEEDING_ALGORITHM_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module.bulk_db = BulkClient(InMemoryBackend())
+    yield module
+    module.speeding_events_writer.close()
+
+
+def trip_along_roads(ways=8):
+    """One fix per vertex of the first ways of the dump, two seconds apart."""
+    points = [(point["lat"], point["lon"]) for element in OSM_ELEMENTS[:ways] for point in element["geometry"]]
+    trip = np.zeros(len(points), dtype=TRIP_DTYPE)
+    trip["lat"], trip["lon"] = np.array(points).T
+    trip["speed"] = 30
+    trip["timestamp"] = 1738593715 + 2 * np.arange(len(points))
+    return trip
+
+
+def test_script_running_as_main_is_not_loaded_again(monkeypatch):
+    main = types.ModuleType("__main__")
+    main.__file__ = speeding_pipeline.SPEEDING_ALGORITHM_PATH
+    monkeypatch.setitem(sys.modules, "__main__", main)
+    monkeypatch.setattr(speeding_pipeline, "_algorithm", None)
+    assert speeding_pipeline.speeding_algorithm() is main
+
+
+def test_loading_runs_no_trip(algorithm, tmp_path):
+    assert not (tmp_path / "speed_data.txt").exists()
+
+
+@pytest.mark.parametrize("point_count", [0, 1])
+def test_trip_too_short_to_match(algorithm, tmp_path, point_count):
+    points = np.zeros(point_count, dtype=TRIP_DTYPE)
+    result = speeding_pipeline.analyze_trip(points, str(tmp_path / "speed_data.txt"))
+    assert isinstance(result, TripResult)
+    assert len(result.speed_data) == 0
+    assert result.speeding_event_count == 0
+    assert result.duration == (0, 0)
+
+
+def test_empty_trip_file(algorithm, tmp_path):
+    trip_file = tmp_path / "trip.txt"
+    trip_file.write_text("")
+    assert speeding_pipeline.analyze_trip(str(trip_file)).distance == 0
+
+
+def test_distance_and_duration_of_one_point(algorithm):
+    assert algorithm.calculate_distance_and_duration(np.zeros(1, dtype=TRIP_DTYPE)) == (0, (0, 0))
+
+
+class RejectingSegmentWrites(InMemoryBackend):
+    """Leaves every drivenDB_road_segment_info write unprocessed until healed."""
+
+    def __init__(self):
+        super().__init__()
+        self.healed = False
+        self.attempted = set()
+
+    def batch_write_item(self, request_items):
+        for request in request_items.get("drivenDB_road_segment_info", []):
+            self.attempted.add(request["PutRequest"]["Item"]["road_segment_id"])
+        if self.healed:
+            return super().batch_write_item(request_items)
+        rejected = {table: requests for table, requests in request_items.items() if table == "drivenDB_road_segment_info"}
+        response = super().batch_write_item({table: requests for table, requests in request_items.items() if table not in rejected})
+        return {"UnprocessedItems": {**response["UnprocessedItems"], **rejected}}
+
+
+def test_rejected_segment_records_are_not_cached(offline_algorithm):
+    backend = RejectingSegmentWrites()
+    offline_algorithm.bulk_db = BulkClient(backend)
+    offline_algorithm.analyze_trip(trip_along_roads())
+    rejected = set(backend.attempted)
+    assert rejected and not backend.tables["drivenDB_road_segment_info"]
+    assert not offline_algorithm.segment_cache.items
+
+    # The next trip resolves them again and this time they are stored
+    backend.healed = True
+    offline_algorithm.analyze_trip(trip_along_roads())
+    stored = {key[0] for key in backend.tables["drivenDB_road_segment_info"]}
+    assert stored == rejected == set(offline_algorithm.segment_cache.items)
+
+
+def test_duplicate_fixes_stay_aligned_with_the_trip(offline_algorithm):
+    trip = np.repeat(trip_along_roads(), 2)  # Every fix twice, same place and timestamp
+    trip["speed"] = np.arange(len(trip))  # Distinct speeds so each row can be traced back
+    trip["distracted"] = np.arange(len(trip)) % 2
+    speed_data = offline_algorithm.analyze_trip(trip).speed_data
+    assert len(speed_data) == len(trip)
+    assert speed_data["speed"].tolist() == trip["speed"].tolist()
+    assert speed_data["distracted"].tolist() == trip["distracted"].tolist()
+    assert speed_data["lat"].tolist() == trip["lat"].tolist()
+    assert speed_data["lon"].tolist() == trip["lon"].tolist()
+    assert speed_data["timestamp"].tolist() == trip["timestamp"].tolist()
@@ -0,0 +1,103 @@
+import random
+import numpy as np
+import pytest
+from geopy.distance import geodesic
+from driven_speeding_definition import speeding_event_bounds
+from speeding_rules import DEFAULT_RULE_SET, SpeedingRuleEngine, compile_rule_set
+
+ROAD_TYPES = ["primary", "residential", "service"]
+
+RULE_SETS = [
+    {"name": "driven"},
+    {"name": "strict", "margin_mph": 5, "min_duration_seconds": 2},
+    {"name": "percent", "margin_mph": None, "percent_over": 20},
+    {"name": "both", "percent_over": 25, "min_duration_seconds": 0},
+    {"name": "distracted", "distracted_only": True},
+    {"name": "residential", "road_type_margins_mph": {"residential": 5, "service": 0}},
+    {"name": "anything", "margin_mph": None, "min_duration_seconds": 3},
+]
+
+
+def random_trip(seed, length=40):
+    rng = random.Random(seed)
+    n = rng.randint(0, length)
+    limit = np.array([rng.choice([0.0, 25.0, 45.0]) for _ in range(n)])
+    return {
+        "speed": limit + np.array([rng.choice([-5, 0, 5, 6.25, 11, 20]) for _ in range(n)]),
+        "limit": limit,
+        "timestamp": 1738593700 + np.cumsum([rng.choice([0, 1, 1, 2, 4]) for _ in range(n)]).astype(np.int64),
+        "road_type_codes": np.array([rng.randrange(len(ROAD_TYPES)) for _ in range(n)], dtype=np.int64),
+        "road_types": ROAD_TYPES,
+        "distracted": np.array([rng.random() < 0.5 for _ in range(n)]),
+        "lat": 29.71 + np.arange(n) * 1e-4,
+        "lon": np.full(n, -95.72) + np.array([rng.uniform(-2e-5, 2e-5) for _ in range(n)]),
+    }
+
+
+def reference_events(trip, rule_set):
+    """Point by point rule set, in the shape of driven_defined_speeding_events."""
+    rule_set = {**DEFAULT_RULE_SET, **rule_set}
+    events, counter, run = [], 0, []
+    n = len(trip["speed"])
+    for i in range(n + 1):
+        speeding = False
+        if i < n and trip["limit"][i] > 0:
+            excess = trip["speed"][i] - trip["limit"][i]
+            margin = rule_set["road_type_margins_mph"].get(ROAD_TYPES[trip["road_type_codes"][i]], rule_set["margin_mph"])
+            speeding = (margin is None or excess >= margin) \
+                and (rule_set["percent_over"] is None or excess / trip["limit"][i] * 100 >= rule_set["percent_over"]) \
+                and (not rule_set["distracted_only"] or trip["distracted"][i])
+        if speeding:
+            run.append(i)
+            continue
+        if run and trip["timestamp"][run[-1]] - trip["timestamp"][run[0]] >= rule_set["min_duration_seconds"]:
+            events.append((run[0], run[-1]))
+            counter += i < n
+        run = []
+    return events, counter
+
+
+def test_rule_sets_match_point_by_point_reference():
+    for seed in range(300):
+        trip = random_trip(seed)
+        results = SpeedingRuleEngine(RULE_SETS).evaluate(**trip)
+        assert list(results) == [rule_set["name"] for rule_set in RULE_SETS], seed
+
+        for rule_set in RULE_SETS:
+            result = results[rule_set["name"]]
+            events, counter = reference_events(trip, rule_set)
+            assert list(zip(result["event_starts"].tolist(), result["event_ends"].tolist())) == events, seed
+            assert result["speeding_event_count"] == counter, seed
+
+            times = [int(trip["timestamp"][end] - trip["timestamp"][start]) for start, end in events]
+            distances = [
+                sum(geodesic((trip["lat"][i], trip["lon"][i]), (trip["lat"][i + 1], trip["lon"][i + 1])).miles for i in range(start, end))
+                for start, end in events
+            ]
+            assert result["event_times"].tolist() == times, seed
+            assert result["speeding_time"] == sum(times), seed
+            assert result["event_distances"].tolist() == pytest.approx(distances, rel=1e-6, abs=1e-12), seed
+            assert result["speeding_distance"] == pytest.approx(sum(distances), rel=1e-6, abs=1e-12), seed
+
+
+def test_default_rule_set_matches_speeding_event_bounds():
+    for seed in range(300):
+        trip = random_trip(seed)
+        result = SpeedingRuleEngine([{}]).evaluate(**trip)["driven"]
+        starts, ends, counter = speeding_event_bounds(trip["speed"], trip["limit"], trip["timestamp"])
+        assert result["event_starts"].tolist() == starts.tolist(), seed
+        assert result["event_ends"].tolist() == ends.tolist(), seed
+        assert result["speeding_event_count"] == counter, seed
+
+
+def test_road_type_margins_replace_margin():
+    rule_set = compile_rule_set({"margin_mph": None, "road_type_margins_mph": {"service": 3}}, ROAD_TYPES)
+    assert np.isnan(rule_set["margins"][0]) and np.isnan(rule_set["margins"][1])
+    assert rule_set["margins"][2] == 3
+
+
+def test_unknown_keys_and_duplicate_names_are_rejected():
+    with pytest.raises(ValueError):
+        compile_rule_set({"margin": 5}, ROAD_TYPES)
+    with pytest.raises(ValueError):
+        SpeedingRuleEngine([{"name": "a"}, {"name": "a"}])
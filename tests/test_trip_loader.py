@@ -0,0 +1,92 @@
+import os
+import numpy as np
+import pytest
+from trip_loader import TRIP_DTYPE, iter_trip_blocks, load_speed_data, load_trip, parse_trip_block, read_records, trip_columns
+
+TRIP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "JameyTrips", "trial_1.txt")
+
+
+def reference_trip(file_path):
+    """Record by record, the way the pipeline parsed trips before trip_loader."""
+    trip = []
+    for record in read_records(file_path):
+        lat, lon, distracted, speed, timestamp = record.split(",")
+        trip.append((float(lat), float(lon), int(distracted), float(speed), int(timestamp)))
+    return np.array(trip, dtype=TRIP_DTYPE)
+
+
+def assert_trips_equal(trip, expected):
+    assert trip.dtype == TRIP_DTYPE
+    assert len(trip) == len(expected)
+    for name in TRIP_DTYPE.names: # Field by field, the padding bytes of aligned rows are undefined
+        assert np.array_equal(trip[name], expected[name])
+
+
+def test_load_trip_matches_record_by_record_parse():
+    assert_trips_equal(load_trip(TRIP_PATH), reference_trip(TRIP_PATH))
+
+
+@pytest.mark.parametrize("chunk_bytes", [1, 7, 50, 4096])
+def test_records_straddling_chunks_are_carried_over(chunk_bytes):
+    blocks = list(iter_trip_blocks(TRIP_PATH, chunk_bytes))
+    assert all(len(block) for block in blocks)
+    assert_trips_equal(np.concatenate(blocks), reference_trip(TRIP_PATH))
+
+
+def test_malformed_records_are_skipped():
+    block = (
+        b"29.71,-95.72,0,30.5,1738593700|"
+        b"29.72,-95.73,1,not a speed,1738593701|"
+        b"29.73,-95.74,0,31.5|"
+        b"29.74,-95.75,1,32.5,1738593703,9|"
+        b" 29.75 ,-95.76,0,33.5,1738593704 \n|"
+        b"29.76,-95"
+    )
+    trip = parse_trip_block(block)
+    assert trip.dtype == TRIP_DTYPE
+    assert trip["lat"].tolist() == [29.71, 29.75]
+    assert trip["distracted"].tolist() == [0, 0]
+    assert trip["speed"].tolist() == [30.5, 33.5]
+    assert trip["timestamp"].tolist() == [1738593700, 1738593704]
+
+
+def test_recording_cut_short_keeps_complete_records(tmp_path):
+    path = tmp_path / "trip.txt"
+    path.write_bytes(b"29.71,-95.72,0,30.5,1738593700|29.72,-95.73,1,31.5,1738593701|29.73,-95.7")
+    for chunk_bytes in (5, 1 << 20):
+        trip = np.concatenate(list(iter_trip_blocks(str(path), chunk_bytes)))
+        assert trip["timestamp"].tolist() == [1738593700, 1738593701]
+
+
+def test_last_record_without_separator(tmp_path):
+    path = tmp_path / "trip.txt"
+    path.write_bytes(b"29.71,-95.72,0,30.5,1738593700|29.72,-95.73,1,31.5,1738593701")
+    assert load_trip(str(path))["timestamp"].tolist() == [1738593700, 1738593701]
+
+
+@pytest.mark.parametrize("content", [b"", b"|", b"\n", b" | |\n"])
+def test_empty_files(tmp_path, content):
+    path = tmp_path / "trip.txt"
+    path.write_bytes(content)
+    trip = load_trip(str(path))
+    assert trip.dtype == TRIP_DTYPE and len(trip) == 0
+    assert len(parse_trip_block(content)) == 0
+
+
+def test_trip_columns_are_views():
+    trip = load_trip(TRIP_PATH)
+    columns = trip_columns(trip)
+    assert np.shares_memory(columns.lon, trip)
+    columns.speed[0] = -1
+    assert trip["speed"][0] == -1
+
+
+def test_load_speed_data(tmp_path):
+    path = tmp_path / "speed_data.txt"
+    path.write_text("29.71,-95.72,0,30.5,25,residential,1738593700|29.72,-95.73,1,41.0,45.5,primary,1738593701|")
+    speed_data, road_types = load_speed_data(str(path))
+    assert road_types == ["primary", "residential"]
+    assert [road_types[code] for code in speed_data["road_type"]] == ["residential", "primary"]
+    assert speed_data["limit"].tolist() == [25.0, 45.5]
+    assert speed_data["distracted"].tolist() == [0, 1]
+    assert speed_data["timestamp"].tolist() == [1738593700, 1738593701]
@@ -0,0 +1,130 @@
+import pytest
+from dynamodb_bulk import TABLE_KEYS, BulkClient, InMemoryBackend
+from write_behind import WriteBehindBuffer
+
+
+def speeding_event(segment_id, timestamp):
+    return {"PutRequest": {"Item": {"road_segment_id": segment_id, "timestamp#user_id": f"{timestamp}#1"}}}
+
+
+def test_close_writes_everything_pending():
+    written = []
+    buffer = WriteBehindBuffer(lambda items: written.extend(items) or [], ("road_segment_id", "timestamp#user_id"),
+                               flush_seconds=3600)
+    buffer.put_many([speeding_event("1", timestamp) for timestamp in range(30)])
+    buffer.close()
+    assert len(written) == 30
+    assert buffer.items_flushed == 30
+
+
+def test_close_uses_close_write():
+    background, drained = [], []
+    buffer = WriteBehindBuffer(lambda items: background.extend(items) or [], ("road_segment_id", "timestamp#user_id"),
+                               flush_seconds=3600, close_write=lambda items: drained.extend(items) or [])
+    buffer.put_many([speeding_event("1", timestamp) for timestamp in range(3)])
+    buffer.close()
+    assert background == []
+    assert len(drained) == 3
+
+
+def test_close_raises_on_unwritten_items():
+    buffer = WriteBehindBuffer(lambda items: list(items), ("road_segment_id", "timestamp#user_id"), flush_seconds=3600)
+    buffer.put_many([speeding_event("1", 0)])
+    with pytest.raises(RuntimeError):
+        buffer.close()
+
+
+def test_close_raises_on_write_error():
+    def write(items):
+        raise ConnectionError("unreachable")
+    buffer = WriteBehindBuffer(write, ("road_segment_id", "timestamp#user_id"), flush_seconds=3600)
+    buffer.put_many([speeding_event("1", 0)])
+    with pytest.raises(RuntimeError):
+        buffer.close()
+
+
+def test_flush_writes_through_bulk_client():
+    backend = InMemoryBackend()
+    bulk = BulkClient(backend)
+    buffer = WriteBehindBuffer(lambda items: bulk.batch_write("users_speeding_events", items),
+                               TABLE_KEYS["users_speeding_events"], flush_seconds=3600)
+    buffer.put_many([speeding_event(str(segment), 0) for segment in range(60)])
+    buffer.flush()
+    assert len(backend.tables["users_speeding_events"]) == 60
+    buffer.close()
+
+
+def test_context_manager_drains_on_exit():
+    backend = InMemoryBackend()
+    bulk = BulkClient(backend)
+    with WriteBehindBuffer(lambda items: bulk.batch_write("users_speeding_events", items),
+                           TABLE_KEYS["users_speeding_events"], flush_seconds=3600) as buffer:
+        buffer.put_many([speeding_event("1", timestamp) for timestamp in range(30)])
+    assert len(backend.tables["users_speeding_events"]) == 30
+    with pytest.raises(RuntimeError):
+        buffer.put_many([speeding_event("1", 0)])
+
+
+class FlakyWrite:
+    """Gives up on the events of segment "bad" until healed."""
+
+    def __init__(self):
+        self.healed = False
+        self.written = {}
+
+    def __call__(self, items):
+        failed = [item for item in items if item["PutRequest"]["Item"]["road_segment_id"] == "bad" and not self.healed]
+        for item in items:
+            if item not in failed:
+                self.written[item["PutRequest"]["Item"]["timestamp#user_id"]] = item
+        return failed
+
+
+def test_background_failures_are_retried_at_close():
+    write = FlakyWrite()
+    buffer = WriteBehindBuffer(write, ("road_segment_id", "timestamp#user_id"), batch_size=2, flush_seconds=3600)
+    buffer.put_many([speeding_event("bad", 0), speeding_event("1", 1)])
+    buffer.flush()
+    assert list(write.written) == ["1#1"]
+    assert len(buffer.failed) == 1
+
+    write.healed = True
+    buffer.close()
+    assert sorted(write.written) == ["0#1", "1#1"]
+    assert buffer.items_flushed == 2
+
+
+def test_background_failures_raise_at_close():
+    buffer = WriteBehindBuffer(FlakyWrite(), ("road_segment_id", "timestamp#user_id"), batch_size=2, flush_seconds=3600)
+    buffer.put_many([speeding_event("bad", 0), speeding_event("1", 1)])
+    buffer.flush()
+    with pytest.raises(RuntimeError, match="1 of 1 items unwritten"):
+        buffer.close()
+
+
+def test_background_errors_are_retried_at_close():
+    calls = []
+
+    def write(items):
+        calls.append(len(items))
+        if len(calls) == 1:
+            raise ConnectionError("unreachable")
+        return []
+
+    buffer = WriteBehindBuffer(write, ("road_segment_id", "timestamp#user_id"), batch_size=2, flush_seconds=3600)
+    buffer.put_many([speeding_event("1", 0), speeding_event("1", 1)])
+    buffer.flush()
+    buffer.close()
+    assert calls == [2, 2]
+
+
+def test_newer_request_supersedes_failed_one():
+    write = FlakyWrite()
+    buffer = WriteBehindBuffer(write, ("road_segment_id", "timestamp#user_id"), batch_size=1, flush_seconds=3600)
+    buffer.put_many([speeding_event("bad", 0)])
+    buffer.flush()
+    write.healed = True
+    newer = {"PutRequest": {"Item": {"road_segment_id": "bad", "timestamp#user_id": "0#1", "traveling_speed": 70}}}
+    buffer.put_many([newer])
+    buffer.close()
+    assert write.written == {"0#1": newer}
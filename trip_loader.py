@@ -0,0 +1,155 @@
+import io
+from collections import namedtuple
+import numpy as np
+
+# One GPS fix of a raw trip file: lat,lon,distracted,speed,timestamp|
+TRIP_DTYPE = np.dtype([
+    ("lat", np.float64),
+    ("lon", np.float64),
+    ("distracted", np.int8),
+    ("speed", np.float64),
+    ("timestamp", np.int64),
+], align=True)
+
+# One fix of speed_data.txt, the enriched output: lat,lon,distracted,speed,limit,road_type,timestamp|
+SPEED_DATA_DTYPE = np.dtype([
+    ("lat", np.float64),
+    ("lon", np.float64),
+    ("distracted", np.int8),
+    ("speed", np.float64),
+    ("limit", np.float64),
+    ("road_type", np.uint8), # Index into the road type list returned with the array
+    ("timestamp", np.int64),
+], align=True)
+
+TRIP_FIELDS = ("lat", "lon", "distracted", "speed", "timestamp") # Field order in the file
+TRIP_CHUNK_BYTES = 1 << 20 # About 27k fixes per chunk
+
+TripColumns = namedtuple("TripColumns", TRIP_FIELDS)
+
+# Everything analyze_trip found out about one trip
+TripResult = namedtuple("TripResult", [
+    "speed_data", # Array of SPEED_DATA_DTYPE, one row per matched point, what speed_data.txt holds
+    "road_types", # Road type names indexed by speed_data's road_type field
+    "travelled_segments", # road_segment_id -> road with its resolved speed limits
+    "event_starts", "event_ends", # Speeding events as inclusive row ranges of speed_data
+    "speeding_event_count",
+    "road_percentages",
+    "speeding_distance", # Miles
+    "speeding_time", # Seconds
+    "distance", # Miles driven over the whole trip
+    "duration", # (minutes, seconds)
+])
+
+
+def read_records(file_path):
+    with open(file_path, "r") as file:
+        return [record for record in file.read().strip().split("|") if record]
+
+
+def parse_trip_block(block):
+    """
+    Parse complete trip records into one structured array with NumPy's C parser.
+
+    :param block: Bytes of whole lat,lon,distracted,speed,timestamp records separated by "|".
+    :return: Array of TRIP_DTYPE. Records that don't parse are left out.
+    """
+    records = block.translate(None, b" \t\r\n").replace(b"|", b"\n")
+    if not records.strip(b"\n"):
+        return np.empty(0, dtype=TRIP_DTYPE)
+    try:
+        return np.loadtxt(io.BytesIO(records), delimiter=",", dtype=TRIP_DTYPE, ndmin=1)
+    except ValueError:
+        pass
+
+    # Some record is malformed, parse one by one and skip the bad ones
+    trip = []
+    for record in records.split(b"\n"):
+        if not record:
+            continue
+        fields = record.split(b",")
+        try:
+            if len(fields) != len(TRIP_FIELDS):
+                raise ValueError(f"{len(fields)} fields")
+            trip.append((float(fields[0]), float(fields[1]), int(fields[2]), float(fields[3]), int(fields[4])))
+        except ValueError as e:
+            print(f"Skipping malformed trip record {record[:80]!r}: {e}")
+    return np.array(trip, dtype=TRIP_DTYPE)
+
+
+def iter_trip_blocks(file_path, chunk_bytes=TRIP_CHUNK_BYTES):
+    """
+    Stream a raw trip file as typed blocks, reading a fixed number of bytes at a time.
+
+    A record cut by the end of a chunk is carried over to the next one, so memory
+    stays bounded by the chunk size however long the recording is. A malformed
+    record, such as one cut short when the recording stopped, is skipped.
+
+    :param file_path: File of lat,lon,distracted,speed,timestamp records separated by "|".
+    :param chunk_bytes: Bytes read per chunk.
+    :return: Generator of TRIP_DTYPE arrays in file order, none of them empty.
+    """
+    with open(file_path, "rb") as file:
+        carry = b""
+        while True:
+            chunk = file.read(chunk_bytes)
+            if not chunk:
+                break
+            chunk = carry + chunk
+            last_separator = chunk.rfind(b"|")
+            if last_separator < 0: # No record ends in this chunk yet
+                carry = chunk
+                continue
+            carry = chunk[last_separator + 1:]
+            block = parse_trip_block(chunk[:last_separator])
+            if len(block):
+                yield block
+
+        # The file doesn't end with "|"
+        block = parse_trip_block(carry)
+        if len(block):
+            yield block
+
+
+def load_trip(file_path):
+    """
+    Read a raw trip file into one structured array.
+
+    :param file_path: File of lat,lon,distracted,speed,timestamp records separated by "|".
+    :return: Array of TRIP_DTYPE in file order.
+    """
+    blocks = list(iter_trip_blocks(file_path))
+    if not blocks:
+        return np.empty(0, dtype=TRIP_DTYPE)
+    return np.concatenate(blocks)
+
+
+def load_speed_data(file_path):
+    """
+    Read an enriched speed_data.txt file into one structured array.
+
+    :param file_path: File of lat,lon,distracted,speed,limit,road_type,timestamp records separated by "|".
+    :return: Array of SPEED_DATA_DTYPE in file order, list of road types indexed by its road_type field.
+    """
+    records = read_records(file_path)
+    speed_data = np.empty(len(records), dtype=SPEED_DATA_DTYPE)
+    if not records:
+        return speed_data, []
+
+    fields = np.array([record.split(",") for record in records])
+    for column, name in enumerate(("lat", "lon", "distracted", "speed", "limit")):
+        speed_data[name] = fields[:, column]
+    road_types, road_type_codes = np.unique(fields[:, 5], return_inverse=True)
+    speed_data["road_type"] = road_type_codes
+    speed_data["timestamp"] = fields[:, 6]
+    return speed_data, road_types.tolist()
+
+
+def trip_columns(trip):
+    """
+    Named views of a trip's fields. No data is copied, writing to a column writes to the trip.
+
+    :param trip: Array of TRIP_DTYPE or SPEED_DATA_DTYPE.
+    :return: TripColumns of lat, lon, distracted, speed and timestamp arrays.
+    """
+    return TripColumns(*(trip[name] for name in TRIP_FIELDS))
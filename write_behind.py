@@ -0,0 +1,149 @@
+import threading
+import time
+from collections import OrderedDict
+
+WRITE_BEHIND_BATCH_SIZE = 25 # Items per DynamoDB batch_write_item
+WRITE_BEHIND_FLUSH_SECONDS = 2.0 # Oldest pending item waits at most this long
+WRITE_BEHIND_MAX_PENDING = 10000 # Producers block past this many pending items
+
+
+class WriteBehindBuffer:
+    """
+    Asynchronous write-behind queue for DynamoDB PutRequests.
+
+    Trips hand over their writes and move on. A background worker coalesces the
+    pending requests from every trip into full batches and writes them once a
+    full batch is ready, or once the oldest request has waited flush_seconds.
+    Requests for the same key are coalesced, last write wins. Requests a background
+    write gives up on are kept aside. close() stops the worker and writes them along
+    with everything still pending on the calling thread, raising if any still fail.
+    Use the buffer as a context manager, or call close() once the run is done.
+    """
+
+    def __init__(self, write, key_names, batch_size=WRITE_BEHIND_BATCH_SIZE,
+                 flush_seconds=WRITE_BEHIND_FLUSH_SECONDS, max_pending=WRITE_BEHIND_MAX_PENDING, close_write=None):
+        """
+        :param write: Callable taking a list of write requests, writing them and returning the ones that
+                      failed, e.g. BulkClient.batch_write.
+        :param key_names: Primary key attributes of the table, used to coalesce requests.
+        :param close_write: Same as write, used by close(). Give one that doesn't rely on a worker pool
+                            when close() runs at exit. Defaults to write.
+        """
+        self.write = write
+        self.close_write = close_write or write
+        self.key_names = key_names
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.max_pending = max_pending
+
+        self.pending = OrderedDict() # key -> write request
+        self.failed = OrderedDict() # key -> write request a background write gave up on
+        self.oldest_pending_at = None
+        self.in_flight = 0
+        self.closed = False
+        self.items_flushed = 0
+        self.condition = threading.Condition()
+        self.worker = threading.Thread(target=self.run, name="write-behind", daemon=True)
+        self.worker.start()
+
+    def key_of(self, request):
+        item = request["PutRequest"]["Item"]
+        return tuple(item[name] for name in self.key_names)
+
+    def put_many(self, requests):
+        """Queue write requests, blocking only while max_pending requests are already waiting."""
+        with self.condition:
+            if self.closed:
+                raise RuntimeError("WriteBehindBuffer is closed")
+            for request in requests:
+                while len(self.pending) >= self.max_pending:
+                    self.condition.wait()
+                key = self.key_of(request)
+                self.pending[key] = request
+                self.failed.pop(key, None) # Superseded
+                if self.oldest_pending_at is None:
+                    self.oldest_pending_at = time.monotonic()
+            self.condition.notify_all()
+
+    def take_batches(self, force):
+        """Pops the requests to write now: full batches only, or everything when forced or overdue."""
+        overdue = self.oldest_pending_at is not None and time.monotonic() - self.oldest_pending_at >= self.flush_seconds
+        count = len(self.pending) if force or overdue else len(self.pending) - len(self.pending) % self.batch_size
+        requests = [self.pending.popitem(last=False)[1] for _ in range(count)]
+        if not self.pending:
+            self.oldest_pending_at = None
+        return requests
+
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.closed and len(self.pending) < self.batch_size and not (
+                    self.oldest_pending_at is not None and time.monotonic() - self.oldest_pending_at >= self.flush_seconds
+                ):
+                    timeout = None if self.oldest_pending_at is None else self.flush_seconds - (time.monotonic() - self.oldest_pending_at)
+                    self.condition.wait(timeout)
+                if self.closed: # close() writes what is left
+                    return
+                requests = self.take_batches(force=False)
+                self.in_flight += len(requests)
+                self.condition.notify_all() # Wake producers waiting on max_pending
+
+            failed = requests
+            try:
+                failed = self.write(requests) or []
+            except Exception as e:
+                print(f"Write-behind flush of {len(requests)} items failed: {e}")
+            finally:
+                with self.condition:
+                    for request in failed:
+                        key = self.key_of(request)
+                        if key not in self.pending: # A newer request for the key is already queued
+                            self.failed[key] = request
+                    if failed:
+                        print(f"Write-behind flush left {len(failed)} of {len(requests)} items unwritten, retrying at close")
+                    self.in_flight -= len(requests)
+                    self.items_flushed += len(requests) - len(failed)
+                    self.condition.notify_all()
+
+    def flush(self):
+        """Block until everything queued so far has been written."""
+        with self.condition:
+            if self.pending: # Mark pending as overdue
+                self.oldest_pending_at = time.monotonic() - self.flush_seconds
+            self.condition.notify_all()
+            while self.pending or self.in_flight:
+                self.condition.wait()
+
+    def close(self):
+        """
+        Stop the worker and write every pending request, and every request a background
+        write gave up on, on the calling thread.
+
+        :raises RuntimeError: If some requests could not be written.
+        """
+        with self.condition:
+            if self.closed:
+                return
+            self.closed = True
+            self.condition.notify_all()
+        self.worker.join()
+
+        with self.condition:
+            requests = list(self.failed.values()) + self.take_batches(force=True)
+            self.failed.clear()
+            self.condition.notify_all()
+        if not requests:
+            return
+        try:
+            failed = self.close_write(requests)
+        except Exception as e:
+            raise RuntimeError(f"Write-behind drain of {len(requests)} items failed: {e}") from e
+        self.items_flushed += len(requests) - len(failed or [])
+        if failed:
+            raise RuntimeError(f"Write-behind drain left {len(failed)} of {len(requests)} items unwritten")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.close()